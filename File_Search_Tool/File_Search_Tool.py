@@ -4,6 +4,9 @@ from tkinter import filedialog, ttk, messagebox
 from datetime import datetime
 import stat
 import sys
+import threading
+import time
+from multiprocessing import freeze_support
 
 # 直接使用本地tkcalendar库
 from tkcalendar import DateEntry
@@ -11,9 +14,80 @@ from tkcalendar import DateEntry
 # 导入历史记录管理模块
 from history_manager import HistoryManager
 
+# 导入与界面无关的搜索引擎模块
+from search_engine import (SearchCriteria, SearchLimits, search_roots, split_roots, normalize_roots, refine,
+                           criteria_from_dict, ROOT_SEPARATOR, DATE_SOURCE_CTIME, DATE_SOURCE_EXIF, DATE_SOURCE_NAMES, STOP_REASON_NAMES)
+
+# 导入文件名查询模块
+from name_query import NameQuery, NAME_MODE_NAMES, NAME_MODE_SUBSTRING
+
+# 导入监视搜索结果变化的模块
+from search_watcher import SearchWatcher
+
+# 导入后台搜索执行模块
+from search_runner import SearchRunner
+
+# 导入文件元数据索引模块
+from metadata_index import MetadataIndex
+
+# 导入列式元数据快照模块（需要NumPy，未安装时自动跳过）
+from metadata_snapshot import SnapshotStore
+
+# 导入文件类型定义和预编译的文件类型匹配器
+from file_types import FILE_TYPES, FILE_TYPE_CODES, compile_file_type, load_custom_file_types
+
+# 导入只渲染可见行的结果列表
+from result_view import ResultStore, VirtualResultView
+
+# 导入EXIF拍摄时间读取模块
+from exif_date import CaptureDateReader
+
+# 导入重复文件查找模块
+from duplicate_finder import DuplicateFinder
+
+# 导入搜索结果缓存模块
+from query_cache import QueryCache
+
+# 导入搜索结果导出模块
+from result_export import export_records
+
+# 导入追加写入的搜索日志模块
+from search_log import SearchLog, migrate_legacy_logs
+
+# 导入搜索分阶段耗时统计模块
+from search_stats import SearchStats
+
 # 获取程序所在目录的绝对路径
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# 后台搜索结果的轮询间隔（毫秒）和每次追加到结果列表的最大行数
+# 结果列表只渲染可见行，追加结果只是写入列数据，因此每批可以较大
+SEARCH_POLL_INTERVAL = 50
+RESULT_BATCH_SIZE = 5000
+
+# 监视模式下取出文件变化的间隔（毫秒）
+WATCH_POLL_INTERVAL = 500
+
+# 搜索日志设置：单个日志文件的大小上限、保留的轮转文件数和fsync策略（always/interval/never）
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_FSYNC_POLICY = "interval"
+
+# 并行遍历的最大线程数，网络共享目录可适当调高
+MAX_SCAN_WORKERS = 32
+
+# 保留的历史搜索记录数量
+MAX_HISTORY = 20
+
+# 查找重复文件时计算哈希的线程数
+DUPLICATE_HASH_WORKERS = 4
+
+# 按拍摄时间搜索时读取EXIF的进程数
+EXIF_PARSE_WORKERS = 4
+
+# 不使用索引时缓存最近搜索结果的内存上限（估算值）
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 class FileSearchTool:
     def __init__(self, root):
         self.root = root
@@ -25,32 +99,11 @@ class FileSearchTool:
         
         self.folder_path = ""
         # 定义中文到英文的筛选条件映射
-        self.criteria_mapping = {
-            "所有文件": "all_files",
-            "所有图片": "all_images",
-            "JPEG格式": "jpeg",
-            "PNG格式": "png",
-            "TIFF格式": "tiff",
-            "RAW格式": "raw",
-            "PSD格式": "psd",
-            "DNG格式": "dng",
-            "视频文件": "video",
-            "压缩文件": "archive"
-        }
+        self.criteria_mapping = dict(FILE_TYPE_CODES)
         
-        # 定义摄影常用文件类型映射
-        self.file_types = {
-            "所有文件": "*.*",
-            "所有图片": "*.jpg;*.jpeg;*.png;*.gif;*.bmp;*.tiff;*.tif",
-            "JPEG格式": "*.jpg;*.jpeg",
-            "PNG格式": "*.png",
-            "TIFF格式": "*.tiff;*.tif",
-            "RAW格式": "*.cr2;*.cr3;*.nef;*.arw;*.dng;*.rw2;*.orf;*.pef;*.srw;*.raf;*.mos",
-            "PSD格式": "*.psd",
-            "DNG格式": "*.dng",
-            "视频文件": "*.mp4;*.avi;*.mkv;*.mov;*.wmv;*.m4v",
-            "压缩文件": "*.zip;*.rar;*.7z;*.tar;*.gz"
-        }
+        # 定义摄影常用文件类型映射，并合并用户自定义的文件类型分组
+        self.file_types = dict(FILE_TYPES)
+        self.file_types.update(load_custom_file_types(os.path.join(APP_DIR, "custom_file_types.json")))
         
         # 文件大小单位映射（KB为基准单位）
         self.size_units = {
@@ -67,14 +120,61 @@ class FileSearchTool:
         self.log_folder = os.path.join(APP_DIR, "search_logs")
         # 确保日志文件夹存在
         self.ensure_log_folder_exists()
+        # 所有搜索日志追加写入同一个JSON Lines文件，按大小轮转
+        self.search_log = SearchLog(self.log_folder, max_bytes=LOG_MAX_BYTES,
+                                    backup_count=LOG_BACKUP_COUNT, fsync_policy=LOG_FSYNC_POLICY)
         
         # 历史记录文件路径，使用程序所在目录
         history_file = os.path.join(APP_DIR, "search_history.json")
         # 初始化历史记录管理器，传递日志文件夹路径和历史记录文件路径
-        self.history_manager = HistoryManager(history_file=history_file, log_folder=self.log_folder)
+        self.history_manager = HistoryManager(history_file=history_file, log_folder=self.log_folder,
+                                              max_history=MAX_HISTORY)
+        # 旧日志迁移和新增日志的导入在后台进行，不阻塞启动
+        threading.Thread(target=self.import_logs, name="log-import", daemon=True).start()
+        
+        # 文件元数据索引，与历史记录文件放在同一目录
+        self.metadata_index = MetadataIndex(os.path.join(APP_DIR, "search_index.db"))
+        # 索引数据的列式快照，已安装NumPy时用于向量化筛选；索引变化后在后台重新生成，期间直接查询索引
+        self.metadata_snapshots = SnapshotStore(os.path.join(APP_DIR, "search_snapshots"), background=True)
+        # EXIF拍摄时间缓存，文件大小和修改时间不变时不再读取文件
+        self.capture_dates = CaptureDateReader(os.path.join(APP_DIR, "search_exif_cache.db"), EXIF_PARSE_WORKERS)
+        
+        # 不使用索引时缓存最近的搜索结果，重复搜索只重新枚举有变化的目录
+        self.query_cache = QueryCache(QUERY_CACHE_MAX_BYTES)
+        
+        # 当前正在执行的后台搜索
+        self.search_runner = None
+        self.search_state = {}
+        
+        # 上一次完整搜索的文件夹和条件，条件收窄时在其结果中筛选
+        self.result_state = {}
+        
+        # 监视上一次搜索的文件夹，结果随文件变化更新
+        self.watch_runner = None
+        self.watch_state = {}
         
         self.create_widgets()
         
+        # 关闭窗口时保存尚未写入的历史记录
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+    def on_close(self):
+        """关闭窗口：取消正在进行的搜索，保存历史记录后退出"""
+        if self.search_runner is not None:
+            self.search_runner.cancel()
+        self.stop_watch()
+        self.history_manager.flush()
+        self.capture_dates.close()
+        self.root.destroy()
+    
+    def import_logs(self):
+        """一次性导入旧版本每次搜索一个的.txt日志，再把上次启动后新增的日志合并到历史记录"""
+        try:
+            migrate_legacy_logs(self.log_folder, self.search_log)
+        except Exception as e:
+            print(f"迁移旧日志失败: {e}")
+        self.history_manager.load_history_from_logs()
+    
     def ensure_log_folder_exists(self):
         """确保日志文件夹存在，不存在则创建"""
         try:
@@ -83,44 +183,57 @@ class FileSearchTool:
         except Exception as e:
             print(f"创建日志文件夹失败: {e}")
     
-    def write_search_log(self, search_criteria, file_count=0, search_time=0.0, error_message=None):
-        """写入搜索日志到文件，支持记录错误信息，优化空间使用"""
+    def write_search_log(self, search_criteria, file_count=0, search_time=0.0, error_message=None,
+                         stop_reason=None, refined=False, stats=None):
+        """追加一条搜索日志，支持记录错误信息、提前结束的原因和各阶段的耗时，字段说明见log_abbreviations.md"""
         try:
-            # 生成日志文件名，使用当前时间戳确保唯一性
-            log_filename = f"search_log_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}.txt"
-            log_path = os.path.join(self.log_folder, log_filename)
-            
-            # 获取文件类型，转换为英文变量
+            # 获取文件类型，使用映射将中文文件类型转换为英文缩写，没有映射则使用原中文
             file_type = search_criteria.get('file_type', '')
-            # 使用映射将中文文件类型转换为英文变量，没有映射则使用原中文
             file_type_en = self.criteria_mapping.get(file_type, file_type)
             
-            # 优化1: 使用更紧凑的时间格式
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # 优化2: 更紧凑的字段名和值
-            folder = search_criteria.get('folder', '')
-            date_from = search_criteria.get('date_from', '')
-            date_to = search_criteria.get('date_to', '')
-            size_min = search_criteria.get('size_min', 0)
-            # 不限制文件大小时记录为空字符，而不是空格
-            size_max = search_criteria.get('size_max', '') if search_criteria.get('size_max', '') != float("inf") else ''
+            # 不限制文件大小时记录为null
+            size_max = search_criteria.get('size_max', '')
+            if size_max in ('', float("inf"), "不限制"):
+                size_max = None
             
-            # 优化3: 简化状态表示
+            record = {
+                'ts': datetime.now().strftime("%Y%m%d_%H%M%S"),
+                'st': "F" if error_message else "S",
+                'folder': search_criteria.get('folder', ''),
+                'date_from': search_criteria.get('date_from', ''),
+                'date_to': search_criteria.get('date_to', ''),
+                'date_source': search_criteria.get('date_source', DATE_SOURCE_CTIME),
+                'type': file_type_en,
+                'size_min': search_criteria.get('size_min', 0),
+                'size_max': size_max
+            }
+            # 只记录设置了的文件名查询
+            if search_criteria.get('name_query'):
+                record['name'] = search_criteria['name_query']
+                record['name_mode'] = search_criteria.get('name_mode') or NAME_MODE_SUBSTRING
+            # 同时搜索多个文件夹时记录去掉重复和嵌套后的文件夹列表
+            if search_criteria.get('roots'):
+                record['roots'] = search_criteria['roots']
+            # 只记录设置了的搜索限制
+            for key in ('max_results', 'time_budget', 'max_depth'):
+                if search_criteria.get(key) is not None:
+                    record[key] = search_criteria[key]
             if error_message:
-                status = "F"
-                result = error_message
+                record['error'] = error_message
             else:
-                status = "S"
-                result = f"{file_count},{search_time:.2f}"
-            
-            # 优化4: 单行CSV格式，减少换行符和分隔符空间
-            # 格式: 时间戳,状态,文件夹,日期范围,文件类型,最小大小,最大大小,结果
-            log_line = f"{timestamp},{status},{folder},{date_from},{date_to},{file_type_en},{size_min},{size_max},{result}"
+                record['count'] = file_count
+                record['time'] = round(search_time, 2)
+                if stop_reason:
+                    record['stop'] = stop_reason
+                if refined:
+                    record['refined'] = True
+            # 出错和取消的搜索也记录已经完成部分的统计
+            if stats is not None:
+                record['stats'] = stats.to_record()
             
-            # 写入日志文件
-            with open(log_path, 'w', encoding='utf-8') as f:
-                f.write(log_line)
+            self.search_log.append(record)
+            # 这次搜索已经在历史记录中（失败的搜索不需要导入），下次启动时跳过这条日志
+            self.history_manager.log_written()
                 
         except Exception as e:
             print(f"Failed to write log: {e}")
@@ -132,39 +245,63 @@ class FileSearchTool:
             self.folder_entry.delete(0, tk.END)
             self.folder_entry.insert(0, folder)
     
+    def add_folder(self):
+        """把选择的文件夹追加到文件夹输入框，同时搜索多个文件夹"""
+        folder = filedialog.askdirectory()
+        if folder:
+            current = self.folder_entry.get().strip()
+            if current:
+                folder = f"{current}{ROOT_SEPARATOR}{folder}"
+            self.folder_path = folder
+            self.folder_entry.delete(0, tk.END)
+            self.folder_entry.insert(0, folder)
+    
     def search_files(self):
+        # 上一次搜索尚未结束时不重复启动
+        if self.search_runner is not None:
+            return
+        
         # 记录搜索开始时间
         start_time = datetime.now()
         
-        # 清除之前的结果
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # 获取基本搜索条件
         folder = self.folder_entry.get()
         date_from_val = self.date_from_entry.get()
         date_to_val = self.date_to_entry.get()
+        date_source = self.date_sources.get(self.date_source_var.get(), DATE_SOURCE_CTIME)
         selected_type_desc = self.file_type_entry.get()
+        name_text = self.name_entry.get().strip()
+        name_mode = self.name_modes.get(self.name_mode_var.get(), NAME_MODE_SUBSTRING)
         size_min_str = self.size_min_entry.get()
         size_max_str = self.size_max_entry.get()
+        max_results_str = self.max_results_entry.get().strip()
+        time_budget_str = self.time_budget_entry.get().strip()
+        max_depth_str = self.max_depth_entry.get().strip()
         
         # 构建基本搜索条件字典（用于日志）
         base_criteria = {
             'folder': folder,
             'date_from': date_from_val,
             'date_to': date_to_val,
+            'date_source': date_source,
             'file_type': selected_type_desc,
+            'name_query': name_text,
+            'name_mode': name_mode,
             'size_min': size_min_str if size_min_str else 0,
             'size_max': size_max_str if size_max_str else "不限制"
         }
         
-        # 检查文件夹是否有效
-        if not folder or not os.path.exists(folder):
-            error_msg = "请选择有效的文件夹"
+        # 检查文件夹是否有效，多个文件夹用分号分隔
+        roots = split_roots(folder)
+        missing = [root for root in roots if not os.path.isdir(root)]
+        if not roots or missing:
+            error_msg = f"文件夹不存在: {missing[0]}" if missing else "请选择有效的文件夹"
             messagebox.showerror("错误", error_msg)
             # 写入错误日志
             self.write_search_log(base_criteria, error_message=error_msg)
             return
+        # 重复和嵌套的文件夹只搜索一次
+        roots, dropped_roots = normalize_roots(roots)
         
         # 获取日期对象
         try:
@@ -218,110 +355,612 @@ class FileSearchTool:
             self.write_search_log(base_criteria, error_message=error_msg)
             return
         
-        # 开始搜索
-        file_count = 0
-        for root, dirs, files in os.walk(folder):
-            for file in files:
-                # 检查文件类型
-                if not self.match_file_type(file, file_type):
-                    continue
-                
-                file_path = os.path.join(root, file)
-                try:
-                    # 获取文件属性
-                    stat_info = os.stat(file_path)
-                    
-                    # 获取文件大小（KB）
-                    size_kb = stat_info.st_size / 1024
-                    
-                    # 检查文件大小
-                    if not (size_min <= size_kb <= size_max):
-                        continue
-                    
-                    # 获取创建时间
-                    created_time = datetime.fromtimestamp(stat_info.st_ctime)
-                    
-                    # 检查创建时间
-                    if date_from and created_time < date_from:
-                        continue
-                    if date_to and created_time > date_to:
-                        continue
-                    
-                    # 获取修改时间
-                    modified_time = datetime.fromtimestamp(stat_info.st_mtime)
-                    
-                    # 获取当前选择的单位
-                    current_unit = self.selected_unit.get()
-                    # 获取单位转换系数
-                    unit_factor = self.size_units.get(current_unit, 1)
-                    
-                    # 将文件大小转换为当前选择的单位
-                    converted_size = size_kb / unit_factor
-                    
-                    # 添加到结果列表
-                    self.tree.insert("", tk.END, values=(
-                        file,
-                        file_path,
-                        f"{converted_size:.2f}",
-                        created_time.strftime("%Y-%m-%d %H:%M:%S"),
-                        modified_time.strftime("%Y-%m-%d %H:%M:%S")
-                    ))
-                    
-                    file_count += 1
-                except Exception as e:
-                    continue
+        # 获取遍历线程数，输入无效时退回单线程遍历
+        try:
+            workers = max(1, min(MAX_SCAN_WORKERS, int(self.workers_var.get())))
+        except (ValueError, tk.TclError):
+            workers = 1
         
-        # 计算搜索耗时
-        search_time = (datetime.now() - start_time).total_seconds()
+        # 解析搜索限制，留空表示不限制
+        try:
+            limits = SearchLimits(
+                int(max_results_str) if max_results_str else None,
+                float(time_budget_str) if time_budget_str else None,
+                int(max_depth_str) if max_depth_str else None
+            )
+            if any(value is not None and value < 0
+                   for value in (limits.max_results, limits.time_budget, limits.max_depth)):
+                raise ValueError
+        except ValueError:
+            error_msg = "结果上限和目录深度必须是非负整数，时间限制必须是非负数字"
+            messagebox.showerror("错误", error_msg)
+            # 写入错误日志
+            self.write_search_log(base_criteria, error_message=error_msg)
+            return
         
-        # 获取当前选择的单位
-        current_unit = self.selected_unit.get()
-        # 获取单位转换系数
-        unit_factor = self.size_units.get(current_unit, 1)
+        # 解析文件名查询，留空表示不限制
+        try:
+            name_query = NameQuery(name_text, name_mode) if name_text else None
+        except ValueError as e:
+            error_msg = str(e)
+            messagebox.showerror("错误", error_msg)
+            # 写入错误日志
+            self.write_search_log(base_criteria, error_message=error_msg)
+            return
         
-        # 构建完整搜索条件（用于历史记录）
-        history_criteria = {
+        # 是否通过元数据索引搜索，以及遍历时是否按层遍历
+        use_index = self.use_index_var.get()
+        breadth_first = self.breadth_first_var.get()
+        
+        # 界面使用的KB大小和日期转换为字节数和时间戳
+        criteria = self.build_criteria(file_type, size_min, size_max, date_from, date_to, date_source, name_query)
+        
+        # 同一组文件夹的条件比上一次完整搜索更严格时，直接在其结果中筛选，不重新遍历；
+        # 条件放宽或设置了搜索限制时重新搜索
+        previous = self.result_state
+        refine_results = (previous and previous['roots'] == roots and limits.unlimited
+                          and criteria.narrows(previous['criteria'])
+                          and not previous['criteria'].narrows(criteria))
+        
+        # 停止监视上一次搜索的结果
+        self.stop_watch()
+        self.watch_state = {}
+        self.watch_button['state'] = tk.DISABLED
+        
+        # 清除之前的结果和排序状态（同时退出重复文件显示），筛选时保留结果
+        if not refine_results:
+            self.result_view.clear()
+            self.result_state = {}
+        self.result_frame['text'] = "搜索结果"
+        self.duplicate_button['text'] = "查找重复"
+        self.sort_column = ""
+        self.sort_order = False
+        self.update_sort_headings()
+        
+        # 搜索过程中的状态，供后台结果轮询和搜索结束时使用；stats记录各阶段的耗时，写入搜索日志
+        stats = SearchStats()
+        self.search_state = {
+            'start_time': start_time,
             'folder': folder,
-            'date_from': date_from.strftime("%Y-%m-%d"),
-            'date_to': date_to.strftime("%Y-%m-%d"),
+            'roots': roots,
+            'dropped_roots': dropped_roots,
+            'date_from': date_from,
+            'date_to': date_to,
+            'date_source': date_source,
             'file_type': selected_type_desc,
+            'name_query': name_text,
+            'name_mode': name_mode,
             'size_min': size_min,
-            'size_max': size_max  # 历史记录中保留原始的float('inf')
+            'size_max': size_max,
+            'unit': current_unit,
+            'use_index': use_index,
+            'limits': limits,
+            'criteria': criteria,
+            'refine': refine_results,
+            'stats': stats,
+            'file_count': 0
         }
+
+        # 结果列表按本次搜索选择的单位显示大小
+        self.result_view.unit_factor = unit_factor
+        
+        self.search_button['state'] = tk.DISABLED
+        self.duplicate_button['state'] = tk.DISABLED
+        self.export_button['state'] = tk.DISABLED
+        self.cancel_button['state'] = tk.NORMAL
+        
+        if refine_results:
+            # 在后台线程中筛选上一次搜索的全部结果，结束后一次显示筛选出的行
+            self.refined_rows = []
+            self.search_runner = SearchRunner(
+                lambda runner: self.iter_refined_rows(runner, criteria, previous['criteria'], stats))
+            self.progress_var.set("正在筛选当前结果...")
+            self.search_runner.start()
+            self.root.after(SEARCH_POLL_INTERVAL, self.poll_refine_results)
+            return
         
-        # 保存搜索条件到历史记录（仅当搜索成功时）
-        self.history_manager.add_search_history(history_criteria)
-        
+        # 在后台线程中执行目录遍历，结果通过队列分批显示到结果列表
+        self.search_runner = SearchRunner(
+            lambda runner: self.iter_search_results(runner, roots, criteria, workers, use_index, limits,
+                                                    breadth_first, stats))
+        self.progress_var.set("正在搜索...")
+        self.search_runner.start()
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_search_results)
+
+    def build_criteria(self, file_type, size_min, size_max, date_from, date_to, date_source=DATE_SOURCE_CTIME,
+                       name_query=None):
+        """把界面使用的KB大小和日期转换为以字节数和时间戳表示的SearchCriteria
+
+        date_source为拍摄时间时，日期条件比较EXIF拍摄时间而不是创建时间；name_query为NameQuery或None。
+        """
+        date_range = (date_from.timestamp(), date_to.timestamp())
+        ctime_range = date_range if date_source == DATE_SOURCE_CTIME else (None, None)
+        capture_range = date_range if date_source == DATE_SOURCE_EXIF else (None, None)
+        return SearchCriteria(
+            file_type,
+            size_min * 1024,
+            size_max * 1024,
+            *ctime_range,
+            *capture_range,
+            name_query
+        )
+
+    def iter_search_results(self, runner, roots, criteria, workers=1, use_index=False, limits=None,
+                            breadth_first=False, stats=None):
+        """在后台线程中通过搜索引擎逐个生成匹配的文件，不能访问任何Tk控件
+
+        生成的FileRecord交给结果列表显示，多个文件夹的结果合并显示。limits为SearchLimits时，
+        达到结果数量、时间或深度限制后停止；breadth_first为True时按层遍历，浅层目录中的文件先显示。
+        stats为SearchStats时记录各阶段的耗时和计数。
+        """
+        return search_roots(roots, criteria, workers,
+                            index=self.metadata_index if use_index else None,
+                            snapshots=self.metadata_snapshots if use_index else None,
+                            capture_dates=self.capture_dates,
+                            cancel_event=runner.cancel_event,
+                            on_scanned=runner.add_scanned,
+                            limits=limits,
+                            breadth_first=breadth_first,
+                            cache=self.query_cache,
+                            stats=stats)
+
+    def poll_search_results(self):
+        """在界面线程中定时取出后台搜索结果，分批追加到结果列表"""
+        runner = self.search_runner
+        if runner is None:
+            return
+
+        rows = runner.drain(RESULT_BATCH_SIZE)
+        if rows:
+            render_start = time.perf_counter()
+            self.result_view.append_rows(rows)
+            self.search_state['stats'].add_time("render", time.perf_counter() - render_start)
+        self.search_state['file_count'] = len(self.result_store)
+
+        if runner.is_finished():
+            self.finish_search(runner)
+            return
+
+        self.progress_var.set(f"已扫描 {runner.scanned} 个文件，找到 {self.search_state['file_count']} 个")
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_search_results)
+
+    def iter_refined_rows(self, runner, criteria, previous, stats=None):
+        """在后台线程中逐个生成上一次搜索结果中满足criteria的行号，不能访问任何Tk控件
+
+        筛选期间监视已停止，结果不会变化；需要按拍摄时间筛选时读取（或从缓存取得）拍摄时间。
+        """
+        store = self.result_store
+        if stats is not None:
+            # 筛选不枚举目录，检查的文件就是当前的全部结果
+            stats.files = store.live_count()
+        return refine(store.live_rows(), store.row, criteria, previous,
+                      capture_dates=self.capture_dates, cancel_event=runner.cancel_event, stats=stats)
+
+    def poll_refine_results(self):
+        """在界面线程中定时取出筛选出的行号"""
+        runner = self.search_runner
+        if runner is None:
+            return
+
+        self.refined_rows.extend(runner.drain(RESULT_BATCH_SIZE))
+        self.search_state['file_count'] = len(self.refined_rows)
+
+        if runner.is_finished():
+            self.finish_search(runner)
+            return
+
+        self.progress_var.set(f"正在筛选当前结果，已找到 {self.search_state['file_count']} 个")
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_refine_results)
+
+    def cancel_search(self):
+        """取消正在进行的搜索"""
+        if self.search_runner is not None:
+            self.search_runner.cancel()
+            self.cancel_button['state'] = tk.DISABLED
+            self.progress_var.set("正在取消...")
+
+    def finish_search(self, runner):
+        """后台搜索结束后记录历史和日志，并恢复界面状态"""
+        self.search_runner = None
+        self.search_button['state'] = tk.NORMAL
+        self.duplicate_button['state'] = tk.NORMAL
+        self.export_button['state'] = tk.NORMAL
+        self.cancel_button['state'] = tk.DISABLED
+
+        state = self.search_state
+        file_count = state['file_count']
+        stats = state['stats']
+        stats.matches = file_count
+        # 只有一个文件夹时保持原来的记录格式
+        roots = state['roots'] if len(state['roots']) > 1 else None
+        date_from = state['date_from']
+        date_to = state['date_to']
+        size_min = state['size_min']
+        size_max = state['size_max']
+        limits = state['limits']
+
+        # 计算搜索耗时
+        search_time = (datetime.now() - state['start_time']).total_seconds()
+
         # 构建日志专用的搜索条件
         log_criteria = {
-            'folder': folder,
+            'folder': state['folder'],
+            'roots': roots,
             'date_from': date_from.strftime("%Y-%m-%d"),
             'date_to': date_to.strftime("%Y-%m-%d"),
-            'file_type': selected_type_desc,
+            'date_source': state['date_source'],
+            'file_type': state['file_type'],
+            'name_query': state['name_query'],
+            'name_mode': state['name_mode'],
             'size_min': size_min,
-            'size_max': size_max if size_max != float("inf") else ''  # 日志中用空字符表示不限制
+            'size_max': size_max if size_max != float("inf") else '',  # 日志中用空字符表示不限制
+            'max_results': limits.max_results,
+            'time_budget': limits.time_budget,
+            'max_depth': limits.max_depth
         }
+
+        # 更新结果列标题中的单位（保留排序指示器）
+        self.update_sort_headings()
+
+        if runner.error is not None:
+            error_msg = f"搜索出错: {runner.error}"
+            self.progress_var.set(error_msg)
+            self.write_search_log(log_criteria, error_message=error_msg, stats=stats)
+            messagebox.showerror("错误", error_msg)
+            return
+
+        if runner.cancelled:
+            if state['refine']:
+                # 取消筛选时保留原来显示的结果
+                self.progress_var.set("已取消筛选")
+            else:
+                self.progress_var.set(f"搜索已取消，已找到 {file_count} 个文件")
+            self.write_search_log(log_criteria, error_message="用户取消搜索", stats=stats)
+            return
+
+        if state['refine']:
+            render_start = time.perf_counter()
+            self.result_view.show_filtered(self.refined_rows)
+            stats.add_time("render", time.perf_counter() - render_start)
+
+        # 构建完整搜索条件（用于历史记录）
+        history_criteria = {
+            'folder': state['folder'],
+            'date_from': date_from.strftime("%Y-%m-%d"),
+            'date_to': date_to.strftime("%Y-%m-%d"),
+            'date_source': state['date_source'],
+            'file_type': state['file_type'],
+            'size_min': size_min,
+            'size_max': size_max  # 历史记录中保留原始的float('inf')
+        }
+        if state['name_query']:
+            history_criteria['name_query'] = state['name_query']
+            history_criteria['name_mode'] = state['name_mode']
+        if roots:
+            history_criteria['roots'] = roots
+
+        # 保存搜索条件到历史记录（仅当搜索成功时）
+        self.history_manager.add_search_history(history_criteria)
         
+        # 记录可以监视的搜索：索引查询得到的路径以绝对路径开头，监视时使用相同的形式
+        # 提前结束或限制了深度的结果不完整，监视时无法判断哪些文件应该显示，不提供监视
+        # 筛选出的结果不能监视，但之后仍可以在完整的结果中继续筛选；监视只支持一个文件夹
+        stop_reason = limits.stop_reason
+        if stop_reason is None and limits.max_depth is None and not state['refine']:
+            # 完整的搜索结果可以用于之后的筛选
+            self.result_state = {'roots': state['roots'], 'criteria': state['criteria']}
+            if roots is None:
+                root = state['roots'][0]
+                self.watch_state = {
+                    'criteria': dict(history_criteria),
+                    'root': os.path.abspath(root) if state['use_index'] else root,
+                    'since': state['start_time'].timestamp()
+                }
+                self.watch_button['state'] = tk.NORMAL
+
         # 写入搜索日志（成功情况）
-        self.write_search_log(log_criteria, file_count, search_time)
+        self.write_search_log(log_criteria, file_count, search_time, stop_reason=stop_reason,
+                              refined=state['refine'], stats=stats)
+
+        if state['refine']:
+            self.progress_var.set(f"在 {self.result_store.live_count()} 个结果中筛选出 {file_count} 个，"
+                                  f"耗时 {search_time:.2f} 秒")
+            messagebox.showinfo("筛选完成", f"在当前结果中筛选出 {file_count} 个文件")
+            return
+
+        # 说明没有单独搜索的重复或嵌套文件夹
+        dropped_text = "".join(f"\n已忽略 {root}（{reason}）" for root, reason in state['dropped_roots'])
+
+        if stop_reason is not None:
+            # 在结果列表标题和进度中说明结果不完整的原因
+            stop_text = f"{STOP_REASON_NAMES[stop_reason]}，搜索提前结束"
+            self.result_frame['text'] = f"搜索结果（{stop_text}，结果不完整）"
+            self.progress_var.set(f"已扫描 {runner.scanned} 个文件，找到 {file_count} 个，"
+                                  f"耗时 {search_time:.2f} 秒（{stop_text}）")
+            messagebox.showinfo("搜索完成", f"{stop_text}，共找到 {file_count} 个文件{dropped_text}")
+            return
+
+        self.progress_var.set(f"已扫描 {runner.scanned} 个文件，找到 {file_count} 个，耗时 {search_time:.2f} 秒")
+        messagebox.showinfo("搜索完成", f"共找到 {file_count} 个文件{dropped_text}")
+    
+    def find_duplicates(self):
+        """在当前搜索结果中查找内容完全相同的文件，再次点击时恢复显示全部结果"""
+        if self.search_runner is not None:
+            return
+        
+        # 正在显示重复文件时切换回全部结果（筛选过时为筛选出的结果）
+        if self.result_view.showing_duplicates:
+            self.result_view.show_all()
+            self.sort_column = ""
+            self.sort_order = False
+            self.update_sort_headings()
+            self.duplicate_button['text'] = "查找重复"
+            self.progress_var.set(f"共 {len(self.result_view.base_rows())} 个文件")
+            return
+        
+        store = self.result_store
+        rows = self.result_view.base_rows()
+        if len(rows) < 2:
+            messagebox.showinfo("提示", "没有可以比较的搜索结果")
+            return
+        
+        # 在后台线程中计算哈希，分组通过队列交给界面线程
+        items = [(index, store.path(index), store.sizes[index]) for index in rows]
+        self.duplicate_groups = []
+        self.duplicate_state = {'start_time': datetime.now(), 'finder': None}
+        
+        def run(runner):
+            finder = DuplicateFinder(DUPLICATE_HASH_WORKERS, cancel_event=runner.cancel_event,
+                                     on_hashed=runner.add_scanned)
+            self.duplicate_state['finder'] = finder
+            return finder.find(items)
+        
+        self.search_runner = SearchRunner(run)
+        self.search_button['state'] = tk.DISABLED
+        self.duplicate_button['state'] = tk.DISABLED
+        self.export_button['state'] = tk.DISABLED
+        self.cancel_button['state'] = tk.NORMAL
+        self.progress_var.set("正在查找重复文件...")
+        self.search_runner.start()
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_duplicate_results)
+    
+    def poll_duplicate_results(self):
+        """在界面线程中定时取出查找到的重复文件分组"""
+        runner = self.search_runner
+        if runner is None:
+            return
+        
+        self.duplicate_groups.extend(runner.drain(RESULT_BATCH_SIZE))
+        if runner.is_finished():
+            self.finish_duplicates(runner)
+            return
+        
+        finder = self.duplicate_state['finder']
+        full_hashed = finder.full_hashed if finder is not None else 0
+        self.progress_var.set(f"已检查 {runner.scanned} 个文件，其中 {full_hashed} 个计算了完整哈希，"
+                              f"找到 {len(self.duplicate_groups)} 组重复文件")
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_duplicate_results)
+    
+    def finish_duplicates(self, runner):
+        """查找重复文件结束后显示分组，并恢复界面状态"""
+        self.search_runner = None
+        self.search_button['state'] = tk.NORMAL
+        self.duplicate_button['state'] = tk.NORMAL
+        self.export_button['state'] = tk.NORMAL
+        self.cancel_button['state'] = tk.DISABLED
+        
+        if runner.error is not None:
+            error_msg = f"查找重复文件出错: {runner.error}"
+            self.progress_var.set(error_msg)
+            messagebox.showerror("错误", error_msg)
+            return
+        if runner.cancelled:
+            self.progress_var.set("已取消查找重复文件")
+            return
         
-        messagebox.showinfo("搜索完成", f"共找到 {file_count} 个文件")
+        groups = self.duplicate_groups
+        if not groups:
+            self.progress_var.set("没有找到重复文件")
+            messagebox.showinfo("查找完成", "没有找到内容相同的文件")
+            return
         
-        # 更新结果列标题中的单位
-        self.tree.heading("size", text=f"大小({current_unit})")
+        # 占用空间最大的分组排在前面
+        store = self.result_store
+        groups.sort(key=lambda rows: store.sizes[rows[0]] * (len(rows) - 1), reverse=True)
+        self.result_view.show_duplicates(groups)
+        self.sort_column = ""
+        self.sort_order = False
+        self.update_sort_headings()
+        self.duplicate_button['text'] = "显示全部结果"
+        
+        finder = self.duplicate_state['finder']
+        file_count = sum(len(rows) for rows in groups)
+        search_time = (datetime.now() - self.duplicate_state['start_time']).total_seconds()
+        self.progress_var.set(f"找到 {len(groups)} 组重复文件，共 {file_count} 个，"
+                              f"读取 {finder.bytes_read / 1024 / 1024:.1f} MB，耗时 {search_time:.2f} 秒")
+    
+    def export_results(self):
+        """把当前显示的结果按显示顺序（排序、重复文件分组）导出为CSV或JSON Lines文件"""
+        if self.search_runner is not None:
+            return
+        
+        view = self.result_view
+        if view.row_count() == 0:
+            messagebox.showinfo("提示", "没有可以导出的搜索结果")
+            return
+        path = self.ask_export_path(self.root)
+        if not path:
+            return
+        
+        # 在界面线程中复制当前的显示顺序，后台线程只按行号读取结果，导出期间结果列表可以继续更新
+        store = self.result_store
+        rows = view.order[:] if view.order is not None else range(len(store))
+        self.start_export(path, lambda runner: (store.row(index) for index in rows))
+    
+    def ask_export_path(self, parent):
+        """选择导出文件，格式由扩展名决定，取消时返回空字符串"""
+        return filedialog.asksaveasfilename(
+            parent=parent,
+            title="导出搜索结果",
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("JSON Lines文件", "*.jsonl")]
+        )
+    
+    def start_export(self, path, records_func, count_scanned=False):
+        """在后台线程中把records_func(runner)生成的结果逐条写入path
+        
+        count_scanned为True时records_func自己通过runner.add_scanned()报告已扫描的文件数，
+        否则进度显示为已导出的行数。
+        """
+        def run(runner):
+            yield export_records(records_func(runner), path, cancel_event=runner.cancel_event,
+                                 on_written=None if count_scanned else runner.add_scanned)
+        
+        self.export_state = {'path': path, 'start_time': datetime.now(), 'count_scanned': count_scanned}
+        self.search_runner = SearchRunner(run)
+        self.search_button['state'] = tk.DISABLED
+        self.duplicate_button['state'] = tk.DISABLED
+        self.export_button['state'] = tk.DISABLED
+        self.cancel_button['state'] = tk.NORMAL
+        self.progress_var.set("正在导出...")
+        self.search_runner.start()
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_export)
+    
+    def poll_export(self):
+        """在界面线程中定时显示导出进度"""
+        runner = self.search_runner
+        if runner is None:
+            return
+        
+        if runner.is_done():
+            self.finish_export(runner)
+            return
+        
+        if self.export_state['count_scanned']:
+            self.progress_var.set(f"已扫描 {runner.scanned} 个文件，正在导出...")
+        else:
+            self.progress_var.set(f"已导出 {runner.scanned} 个文件...")
+        self.root.after(SEARCH_POLL_INTERVAL, self.poll_export)
+    
+    def finish_export(self, runner):
+        """导出结束后显示结果，并恢复界面状态"""
+        self.search_runner = None
+        self.search_button['state'] = tk.NORMAL
+        self.duplicate_button['state'] = tk.NORMAL
+        self.export_button['state'] = tk.NORMAL
+        self.cancel_button['state'] = tk.DISABLED
+        
+        if runner.error is not None:
+            error_msg = f"导出失败: {runner.error}"
+            self.progress_var.set(error_msg)
+            messagebox.showerror("错误", error_msg)
+            return
+        if runner.cancelled:
+            self.progress_var.set("已取消导出")
+            return
+        
+        file_count = runner.drain(1)[0]
+        export_time = (datetime.now() - self.export_state['start_time']).total_seconds()
+        self.progress_var.set(f"已导出 {file_count} 个文件，耗时 {export_time:.2f} 秒")
+        messagebox.showinfo("导出完成", f"共导出 {file_count} 个文件到\n{self.export_state['path']}")
+    
+    def toggle_watch(self):
+        """开始或停止监视上一次搜索的文件夹"""
+        if self.watch_runner is not None:
+            self.stop_watch()
+            self.progress_var.set(f"已停止监视，共 {self.result_store.live_count()} 个文件")
+            return
+        if not self.watch_state:
+            return
+        
+        # 使用保存到历史记录的搜索条件，与完成的搜索完全一致
+        try:
+            criteria = criteria_from_dict(self.watch_state['criteria'], self.file_types)
+        except ValueError as e:
+            messagebox.showerror("错误", f"搜索条件格式不正确: {e}")
+            return
+        
+        # 路径 -> 行号，用于更新和删除已显示的结果
+        store = self.result_store
+        rows = store.live_rows()
+        self.watch_state['rows'] = {store.path(index): index for index in rows}
+        self.watch_state['counts'] = {'add': 0, 'update': 0, 'remove': 0}
+        watcher = SearchWatcher(self.watch_state['root'], criteria, [store.row(index) for index in rows],
+                                capture_dates=self.capture_dates, since=self.watch_state['since'])
+        self.watch_state['watcher'] = watcher
+        
+        self.watch_runner = SearchRunner(lambda runner: watcher.watch(runner.cancel_event))
+        self.watch_runner.start()
+        self.watch_button['text'] = "停止监视"
+        self.progress_var.set("正在监视文件夹变化...")
+        self.root.after(WATCH_POLL_INTERVAL, self.poll_watch_changes)
+    
+    def stop_watch(self):
+        """停止监视，已更新的结果保持不变"""
+        if self.watch_runner is not None:
+            self.watch_runner.cancel()
+            self.watch_runner = None
+        self.watch_button['text'] = "监视变化"
+    
+    def poll_watch_changes(self):
+        """在界面线程中定时取出文件变化，只新增、更新或删除受影响的行"""
+        runner = self.watch_runner
+        if runner is None:
+            return
+        
+        changes = runner.drain(RESULT_BATCH_SIZE)
+        if changes:
+            self.apply_watch_changes(changes)
+        
+        if runner.is_finished():
+            self.watch_runner = None
+            self.watch_button['text'] = "监视变化"
+            if runner.error is not None:
+                error_msg = f"监视出错: {runner.error}"
+                self.progress_var.set(error_msg)
+                messagebox.showerror("错误", error_msg)
+            return
+        
+        counts = self.watch_state['counts']
+        mode = "inotify" if self.watch_state['watcher'].mode == "inotify" else "轮询"
+        self.progress_var.set(f"正在监视({mode})：新增 {counts['add']}，更新 {counts['update']}，"
+                              f"删除 {counts['remove']}，共 {self.result_store.live_count()} 个文件")
+        self.root.after(WATCH_POLL_INTERVAL, self.poll_watch_changes)
+    
+    def apply_watch_changes(self, changes):
+        """把一批 ("add"/"update", 文件元组) 或 ("remove", 路径) 变化应用到结果列表"""
+        rows = self.watch_state['rows']
+        counts = self.watch_state['counts']
+        next_index = len(self.result_store)
+        added, updated, removed = [], [], []
+        for kind, value in changes:
+            if kind == "remove":
+                index = rows.pop(value, None)
+                if index is not None:
+                    removed.append(index)
+                    counts['remove'] += 1
+                continue
+            index = rows.get(value[1])
+            if index is None:
+                # 新增的行在这一批中依次追加到末尾
+                rows[value[1]] = next_index + len(added)
+                added.append(value)
+                counts['add'] += 1
+            else:
+                updated.append((index, value[2], value[3], value[4]))
+                counts['update'] += 1
+        
+        # 先追加新行，同一批中对新行的更新和删除才能找到对应的行号
+        if added:
+            self.result_view.append_rows(added)
+        if updated:
+            self.result_view.update_rows(updated)
+        if removed:
+            self.result_view.remove_rows(removed)
     
     def match_file_type(self, filename, file_type):
-        """检查文件名是否匹配文件类型，支持分号分隔的多个文件类型"""
-        if file_type == "*.*" or file_type == "":
-            return True
-        
-        # 处理分号分隔的多个文件类型
-        file_type_list = file_type.split(";")
-        import fnmatch
-        for ft in file_type_list:
-            if fnmatch.fnmatch(filename, ft):
-                return True
-        return False
+        """检查文件名是否匹配文件类型，支持分号分隔的多个文件类型（忽略大小写）"""
+        return compile_file_type(file_type)(filename)
     
     def open_file(self, event):
         """双击事件处理：双击path列打开文件资源管理器，双击其他列打开文件"""
@@ -334,10 +973,11 @@ class FileSearchTool:
         region = self.tree.identify_region(event.x, event.y)
         
         if region == "cell":
-            column = self.tree.identify_column(event.x)
+            # 显示重复文件时列的位置会变化，按列名判断
+            column = self.tree.column(self.tree.identify_column(event.x), "id")
             file_path = self.tree.item(item, "values")[1]
             
-            if column == "#2":  # path列
+            if column == "path":  # path列
                 # 打开文件资源管理器
                 try:
                     # Windows: 打开文件所在目录
@@ -369,9 +1009,6 @@ class FileSearchTool:
     
     def sort_result(self, col):
         """根据列名对搜索结果进行排序，自动切换升降序"""
-        # 获取当前选择的单位，用于大小列的标题显示
-        current_unit = getattr(self, 'selected_unit', tk.StringVar(value='KB')).get()
-        
         # 判断是否是当前排序列
         if self.sort_column == col:
             # 切换排序顺序
@@ -381,37 +1018,24 @@ class FileSearchTool:
             self.sort_column = col
             self.sort_order = False
         
-        # 获取所有结果项
-        items = [(self.tree.set(k, col), k) for k in self.tree.get_children('')]
+        # 在结果数据上排序，只刷新可见行
+        self.result_view.sort(col, self.sort_order)
         
-        # 根据列类型进行排序
-        try:
-            if col in ['name', 'path']:
-                # 字符串列，直接比较
-                items.sort(key=lambda x: x[0].lower(), reverse=self.sort_order)
-            elif col == 'size':
-                # 大小列，转换为数字
-                items.sort(key=lambda x: float(x[0]), reverse=self.sort_order)
-            elif col in ['created', 'modified']:
-                # 日期列，转换为datetime对象
-                items.sort(key=lambda x: datetime.strptime(x[0], "%Y-%m-%d %H:%M:%S"), reverse=self.sort_order)
-        except Exception as e:
-            # 处理排序错误
-            print(f"排序失败: {e}")
-            return
-        
-        # 重新排列项目
-        for index, (val, k) in enumerate(items):
-            self.tree.move(k, '', index)
+        self.update_sort_headings()
+    
+    def update_sort_headings(self):
+        """更新所有列标题，只在当前排序列显示指示器"""
+        # 获取当前选择的单位，用于大小列的标题显示
+        current_unit = self.search_state.get('unit') or self.selected_unit.get()
         
-        # 更新所有列标题，只在当前排序列显示指示器
         # 重置所有列标题
         headers = {
             'name': '文件名',
             'path': '路径',
             'size': f'大小({current_unit})',
             'created': '创建时间',
-            'modified': '修改时间'
+            'modified': '修改时间',
+            'group': '重复组'
         }
         
         # 为当前排序列添加指示器
@@ -478,6 +1102,8 @@ class FileSearchTool:
             for i, record in enumerate(history):
                 # 格式化日期范围
                 date_range = f"{record['date_from']} 至 {record['date_to']}"
+                if record.get('date_source') == DATE_SOURCE_EXIF:
+                    date_range += f" ({DATE_SOURCE_NAMES[DATE_SOURCE_EXIF]})"
                 # 格式化大小范围
                 if record['size_min'] == 0 and record['size_max'] == float('inf'):
                     size_range = "不限制"
@@ -487,13 +1113,18 @@ class FileSearchTool:
                     size_range = f"≥ {record['size_min']}"
                 else:
                     size_range = f"{record['size_min']} 至 {record['size_max']}"
+                # 文件类型后附加文件名查询
+                file_type = record['file_type']
+                if record.get('name_query'):
+                    mode = NAME_MODE_NAMES.get(record.get('name_mode'), NAME_MODE_NAMES[NAME_MODE_SUBSTRING])
+                    file_type += f"，文件名{mode} {record['name_query']}"
                 
                 # 添加到表格
                 history_tree.insert("", tk.END, iid=i, values=(
                     record['timestamp'],
                     record['folder'],
                     date_range,
-                    record['file_type'],
+                    file_type,
                     size_range
                 ))
         
@@ -525,9 +1156,14 @@ class FileSearchTool:
             date_to = datetime.strptime(record['date_to'], "%Y-%m-%d")
             self.date_from_entry.set_date(date_from)
             self.date_to_entry.set_date(date_to)
+            # 旧版本的记录没有日期依据，按创建时间搜索
+            self.date_source_var.set(DATE_SOURCE_NAMES.get(record.get('date_source'), DATE_SOURCE_NAMES[DATE_SOURCE_CTIME]))
             
-            # 设置文件类型
+            # 设置文件类型和文件名查询（旧版本的记录没有文件名查询）
             self.file_type_entry.set(record['file_type'])
+            self.name_entry.delete(0, tk.END)
+            self.name_entry.insert(0, record.get('name_query') or '')
+            self.name_mode_var.set(NAME_MODE_NAMES.get(record.get('name_mode'), NAME_MODE_NAMES[NAME_MODE_SUBSTRING]))
             
             # 设置大小范围
             self.size_min_entry.delete(0, tk.END)
@@ -553,6 +1189,48 @@ class FileSearchTool:
                 self.history_manager.delete_history(index)
                 load_history_to_tree()
         
+        # 按选中的历史记录重新搜索，结果直接写入文件，不显示在结果列表中
+        def export_history():
+            selected_item = history_tree.selection()
+            if not selected_item:
+                messagebox.showwarning("提示", "请选择一条历史记录")
+                return
+            if self.search_runner is not None:
+                messagebox.showwarning("提示", "请等待当前的搜索完成")
+                return
+            
+            record = self.history_manager.get_history()[int(selected_item[0])]
+            roots = record.get('roots') or split_roots(record['folder'])
+            missing = [root for root in roots if not os.path.isdir(root)]
+            if not roots or missing:
+                messagebox.showerror("错误", f"文件夹不存在: {missing[0] if missing else record['folder']}")
+                return
+            roots, _ = normalize_roots(roots)
+            try:
+                criteria = criteria_from_dict(record, self.file_types)
+            except ValueError as e:
+                messagebox.showerror("错误", f"搜索条件格式不正确: {e}")
+                return
+            path = self.ask_export_path(history_window)
+            if not path:
+                return
+            
+            try:
+                workers = max(1, min(MAX_SCAN_WORKERS, int(self.workers_var.get())))
+            except (ValueError, tk.TclError):
+                workers = 1
+            use_index = self.use_index_var.get()
+            breadth_first = self.breadth_first_var.get()
+            self.start_export(path, lambda runner: search_roots(
+                roots, criteria, workers,
+                index=self.metadata_index if use_index else None,
+                snapshots=self.metadata_snapshots if use_index else None,
+                capture_dates=self.capture_dates,
+                cancel_event=runner.cancel_event,
+                on_scanned=runner.add_scanned,
+                breadth_first=breadth_first,
+                cache=self.query_cache), count_scanned=True)
+        
         # 清空所有历史记录
         def clear_all_history():
             if messagebox.askyesno("确认", "确定要清空所有历史记录吗？"):
@@ -571,6 +1249,10 @@ class FileSearchTool:
         delete_btn = ttk.Button(button_frame, text="删除选中记录", command=delete_history)
         delete_btn.pack(side=tk.LEFT, padx=5)
         
+        # 导出按钮
+        export_btn = ttk.Button(button_frame, text="导出搜索结果", command=export_history)
+        export_btn.pack(side=tk.LEFT, padx=5)
+        
         # 清空按钮
         clear_btn = ttk.Button(button_frame, text="清空所有记录", command=clear_all_history)
         clear_btn.pack(side=tk.LEFT, padx=5)
@@ -592,16 +1274,24 @@ class FileSearchTool:
         self.folder_entry = ttk.Entry(folder_frame, width=50)
         self.folder_entry.grid(row=0, column=1, padx=5, pady=5)
         ttk.Button(folder_frame, text="浏览", command=self.browse_folder).grid(row=0, column=2, padx=5, pady=5)
+        # 追加文件夹，多个文件夹用分号分隔，结果合并显示
+        ttk.Button(folder_frame, text="添加", command=self.add_folder).grid(row=0, column=3, padx=5, pady=5)
         
         # 历史记录按钮
-        ttk.Button(folder_frame, text="历史记录", command=self.open_history_window).grid(row=0, column=3, padx=5, pady=5)
+        ttk.Button(folder_frame, text="历史记录", command=self.open_history_window).grid(row=0, column=4, padx=5, pady=5)
         
         # 搜索条件区
         criteria_frame = ttk.LabelFrame(main_frame, text="搜索条件", padding="10")
         criteria_frame.pack(fill=tk.X, pady=5)
         
-        # 创建时间范围
-        ttk.Label(criteria_frame, text="创建时间范围:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        # 日期范围，比较创建时间或EXIF拍摄时间（照片在磁盘间复制后创建时间会变化）
+        self.date_sources = {name: source for source, name in DATE_SOURCE_NAMES.items()}
+        self.date_source_var = tk.StringVar()
+        self.date_source_combobox = ttk.Combobox(criteria_frame, textvariable=self.date_source_var, width=10)
+        self.date_source_combobox['values'] = list(self.date_sources.keys())
+        self.date_source_combobox['state'] = 'readonly'  # 设置为只读，只能通过下拉选择
+        self.date_source_combobox.current(0)  # 默认按创建时间
+        self.date_source_combobox.grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
         
         ttk.Label(criteria_frame, text="从:").grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
         self.date_from_entry = DateEntry(criteria_frame, width=15, date_pattern='yyyy-MM-dd', showweeknumbers=False, showothermonthdays=False)
@@ -611,6 +1301,17 @@ class FileSearchTool:
         self.date_to_entry = DateEntry(criteria_frame, width=15, date_pattern='yyyy-MM-dd', showweeknumbers=False, showothermonthdays=False)
         self.date_to_entry.grid(row=0, column=4, padx=5, pady=5)
         
+        # 遍历线程数，大于1时并行枚举子目录，适合NAS等网络共享目录
+        ttk.Label(criteria_frame, text="遍历线程:").grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
+        self.workers_var = tk.StringVar(value="1")
+        self.workers_spinbox = ttk.Spinbox(criteria_frame, from_=1, to=MAX_SCAN_WORKERS, textvariable=self.workers_var, width=5)
+        self.workers_spinbox.grid(row=0, column=6, padx=5, pady=5)
+        
+        # 使用元数据索引，同一文件夹的重复搜索只重新枚举有变化的目录
+        # 索引首次建立时要保存整个文件夹的元数据，只在需要反复搜索同一文件夹时勾选
+        self.use_index_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(criteria_frame, text="使用索引", variable=self.use_index_var).grid(row=0, column=7, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
         # 文件类型
         ttk.Label(criteria_frame, text="文件类型:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
         self.file_type_var = tk.StringVar()
@@ -641,16 +1342,76 @@ class FileSearchTool:
         self.unit_combobox.current(0)  # 默认选择第一个选项（KB）
         self.unit_combobox.grid(row=1, column=8, padx=5, pady=5)
         
-        # 搜索按钮，增加columnspan以覆盖所有列
-        ttk.Button(criteria_frame, text="开始搜索", command=self.search_files).grid(row=2, column=0, columnspan=9, pady=10)
+        # 搜索限制，留空表示不限制，避免对整个磁盘的搜索长时间无法结束
+        ttk.Label(criteria_frame, text="结果上限:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+        self.max_results_entry = ttk.Entry(criteria_frame, width=10)
+        self.max_results_entry.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(criteria_frame, text="时间限制(秒):").grid(row=2, column=2, sticky=tk.W, padx=5, pady=5)
+        self.time_budget_entry = ttk.Entry(criteria_frame, width=10)
+        self.time_budget_entry.grid(row=2, column=3, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        # 目录深度，0表示只搜索所选文件夹本身
+        ttk.Label(criteria_frame, text="目录深度:").grid(row=2, column=5, sticky=tk.W, padx=5, pady=5)
+        self.max_depth_entry = ttk.Entry(criteria_frame, width=10)
+        self.max_depth_entry.grid(row=2, column=6, padx=5, pady=5)
+        
+        # 按层遍历，所选文件夹顶层的文件最先显示
+        # 默认与os.walk相同，深度优先遍历
+        self.breadth_first_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(criteria_frame, text="浅层优先", variable=self.breadth_first_var).grid(row=2, column=7, columnspan=2, sticky=tk.W, padx=5, pady=5)
+        
+        # 文件名查询，与文件类型同时满足；使用索引时由文件名的三字符片段索引直接查找
+        ttk.Label(criteria_frame, text="文件名:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        self.name_entry = ttk.Entry(criteria_frame, width=40)
+        self.name_entry.grid(row=3, column=1, columnspan=4, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(criteria_frame, text="匹配方式:").grid(row=3, column=5, sticky=tk.W, padx=5, pady=5)
+        self.name_modes = {name: mode for mode, name in NAME_MODE_NAMES.items()}
+        self.name_mode_var = tk.StringVar()
+        self.name_mode_combobox = ttk.Combobox(criteria_frame, textvariable=self.name_mode_var, width=10)
+        self.name_mode_combobox['values'] = list(self.name_modes.keys())
+        self.name_mode_combobox['state'] = 'readonly'  # 设置为只读，只能通过下拉选择
+        self.name_mode_combobox.current(0)  # 默认匹配包含输入文本的文件名
+        self.name_mode_combobox.grid(row=3, column=6, padx=5, pady=5)
+        
+        # 搜索操作区，增加columnspan以覆盖所有列
+        action_frame = ttk.Frame(criteria_frame)
+        action_frame.grid(row=4, column=0, columnspan=9, pady=10)
+        
+        # 搜索按钮
+        self.search_button = ttk.Button(action_frame, text="开始搜索", command=self.search_files)
+        self.search_button.pack(side=tk.LEFT, padx=5)
+        
+        # 查找重复文件按钮，在当前搜索结果中按内容比较
+        self.duplicate_button = ttk.Button(action_frame, text="查找重复", command=self.find_duplicates)
+        self.duplicate_button.pack(side=tk.LEFT, padx=5)
+        
+        # 监视按钮，搜索完成后可以持续更新结果
+        self.watch_button = ttk.Button(action_frame, text="监视变化", command=self.toggle_watch, state=tk.DISABLED)
+        self.watch_button.pack(side=tk.LEFT, padx=5)
+        
+        # 导出按钮，按当前显示顺序把结果写入CSV或JSON Lines文件
+        self.export_button = ttk.Button(action_frame, text="导出结果", command=self.export_results)
+        self.export_button.pack(side=tk.LEFT, padx=5)
+        
+        # 取消按钮，仅在搜索进行中可用
+        self.cancel_button = ttk.Button(action_frame, text="取消搜索", command=self.cancel_search, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        # 搜索进度显示
+        self.progress_var = tk.StringVar()
+        ttk.Label(action_frame, textvariable=self.progress_var).pack(side=tk.LEFT, padx=5)
         
         # 结果显示区
-        result_frame = ttk.LabelFrame(main_frame, text="搜索结果", padding="10")
-        result_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        # 搜索提前结束时标题中会说明原因
+        self.result_frame = ttk.LabelFrame(main_frame, text="搜索结果", padding="10")
+        self.result_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        # 创建树状视图
-        columns = ("name", "path", "size", "created", "modified")
-        self.tree = ttk.Treeview(result_frame, columns=columns, show="headings")
+        # 创建只渲染可见行的结果列表，结果数据按列保存在result_store中
+        self.result_store = ResultStore()
+        self.result_view = VirtualResultView(self.result_frame, self.result_store)
+        self.tree = self.result_view.tree
         
         # 初始化排序状态
         self.sort_column = ""
@@ -662,6 +1423,7 @@ class FileSearchTool:
         self.tree.heading("size", text="大小(KB)", command=lambda: self.sort_result("size"))
         self.tree.heading("created", text="创建时间", command=lambda: self.sort_result("created"))
         self.tree.heading("modified", text="修改时间", command=lambda: self.sort_result("modified"))
+        self.tree.heading("group", text="重复组", command=lambda: self.sort_result("group"))
         
         # 设置列宽
         self.tree.column("name", width=150)
@@ -669,19 +1431,18 @@ class FileSearchTool:
         self.tree.column("size", width=100, anchor=tk.CENTER)
         self.tree.column("created", width=150)
         self.tree.column("modified", width=150)
+        self.tree.column("group", width=60, anchor=tk.CENTER)
         
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(result_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
-        
-        # 布局树状视图和滚动条
+        # 布局结果列表和滚动条（滚动条由结果列表控制）
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.result_view.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # 绑定双击事件
         self.tree.bind("<Double-1>", self.open_file)
 
 if __name__ == "__main__":
+    # 读取拍摄时间使用进程池，打包为EXE后子进程需要
+    freeze_support()
     root = tk.Tk()
     app = FileSearchTool(root)
     root.mainloop()
\ No newline at end of file
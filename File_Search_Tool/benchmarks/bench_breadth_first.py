@@ -0,0 +1,111 @@
+"""按层遍历与深度优先遍历对比：浅层文件的输出时间和等待队列的内存占用
+
+用法:
+    python benchmarks/bench_breadth_first.py [--fanout 4] [--depth 6] [--files 10] [--wide 200] [--max-pending 1000]
+
+第一项测试在每层--fanout个子目录、共--depth层的合成目录树上，统计顶层和第一层目录中的文件
+全部输出所用的时间：深度优先遍历时这些文件分散在整个遍历过程中，按层遍历时最先输出。
+第二项测试在--wide x --wide个叶子目录的宽目录树上，用tracemalloc比较等待队列没有上限和
+上限为--max-pending时的峰值内存。合成目录树在测试结束后自动删除。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_walker import scan_files
+
+
+def build_deep_tree(base, fanout, depth, files_per_dir):
+    """生成每层fanout个子目录、共depth层的目录树，每个目录包含files_per_dir个空文件"""
+    level = [base]
+    dir_count = 0
+    for current_depth in range(depth + 1):
+        next_level = []
+        for d in level:
+            for i in range(files_per_dir):
+                open(os.path.join(d, f"file_{i:03d}.jpg"), "wb").close()
+            if current_depth < depth:
+                for i in range(fanout):
+                    path = os.path.join(d, f"dir_{i:02d}")
+                    os.mkdir(path)
+                    next_level.append(path)
+        dir_count += len(level)
+        level = next_level
+    return dir_count, dir_count * files_per_dir
+
+
+def build_wide_tree(base, width):
+    """生成两层的宽目录树：width个目录，每个目录下width个空的子目录"""
+    for i in range(width):
+        parent = os.path.join(base, f"dir_{i:04d}")
+        os.mkdir(parent)
+        for j in range(width):
+            os.mkdir(os.path.join(parent, f"sub_{j:04d}"))
+    return width * width
+
+
+def shallow_time(folder, breadth_first):
+    """返回 (深度不超过1的文件全部输出的时间, 遍历总时间)"""
+    shallow_total = sum(1 for _ in scan_files(folder, max_depth=1))
+    shallow_seen = 0
+    shallow_done = None
+    start = time.perf_counter()
+    for _, path, _, _, _ in scan_files(folder, breadth_first=breadth_first):
+        if os.path.relpath(path, folder).count(os.sep) <= 1:
+            shallow_seen += 1
+            if shallow_seen == shallow_total:
+                shallow_done = time.perf_counter() - start
+    return shallow_done, time.perf_counter() - start
+
+
+def peak_memory(folder, **kwargs):
+    """遍历过程中tracemalloc记录的峰值内存(字节)"""
+    tracemalloc.start()
+    for _ in scan_files(folder, **kwargs):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按层遍历与深度优先遍历对比")
+    parser.add_argument("--fanout", type=int, default=4, help="每个目录的子目录数")
+    parser.add_argument("--depth", type=int, default=6, help="目录树层数")
+    parser.add_argument("--files", type=int, default=10, help="每个目录的文件数")
+    parser.add_argument("--wide", type=int, default=200, help="宽目录树每层的目录数")
+    parser.add_argument("--max-pending", type=int, default=1000, help="按层遍历时等待枚举的目录数上限")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp(prefix="bench_bfs_")
+    try:
+        deep = os.path.join(temp_dir, "deep")
+        os.mkdir(deep)
+        dir_count, file_count = build_deep_tree(deep, args.fanout, args.depth, args.files)
+        print(f"合成目录树: {dir_count} 个目录, {file_count} 个文件")
+        for name, breadth_first in (("深度优先", False), ("按层遍历", True)):
+            done, total = shallow_time(deep, breadth_first)
+            print(f"{name}: 深度≤1的文件全部输出 {done:.3f} 秒，遍历完成 {total:.3f} 秒")
+
+        wide = os.path.join(temp_dir, "wide")
+        os.mkdir(wide)
+        leaf_count = build_wide_tree(wide, args.wide)
+        print(f"宽目录树: {leaf_count} 个叶子目录")
+        for name, kwargs in (("深度优先", {}),
+                             ("按层遍历(队列不限)", {"breadth_first": True, "max_pending": float("inf")}),
+                             (f"按层遍历(队列上限{args.max_pending})",
+                              {"breadth_first": True, "max_pending": args.max_pending})):
+            print(f"{name}: 峰值内存 {peak_memory(wide, **kwargs) / 1024:.1f} KB")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
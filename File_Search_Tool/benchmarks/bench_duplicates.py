@@ -0,0 +1,121 @@
+"""重复文件查找性能测试：在包含已知重复文件的合成目录树上比较读取量和耗时
+
+用法:
+    python benchmarks/bench_duplicates.py [--files 2000] [--duplicates 100] [--size-kb 2048] [--workers 4]
+
+合成目录树中的文件大小在--size-kb附近，其中：
+- --duplicates个文件各有一个位于其他目录的副本（应被找到）；
+- 同样数量的文件与另一个文件大小相同、只有中间的一个字节不同（部分哈希无法区分，需要完整哈希排除）；
+- 其余文件大小各不相同，按大小分组后即被排除，内容不会被读取。
+对比对象为对所有文件计算完整哈希的朴素方法。
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duplicate_finder import DuplicateFinder, FULL_READ_SIZE
+from file_walker import scan_files
+
+
+def build_tree(base, file_count, duplicate_count, size_kb):
+    """生成合成目录树，返回预期的重复文件分组（路径集合的集合）"""
+    rng = random.Random(42)
+    dirs = [os.path.join(base, f"dir_{i:03d}") for i in range(max(1, file_count // 100))]
+    for d in dirs:
+        os.mkdir(d)
+
+    # 每个文件使用不同的大小，保证只有刻意构造的文件大小相同
+    sizes = rng.sample(range(size_kb * 512, size_kb * 1536), file_count)
+    paths = []
+    for i, size in enumerate(sizes):
+        path = os.path.join(dirs[i % len(dirs)], f"IMG_{i:05d}.CR2")
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(size))
+        paths.append(path)
+
+    expected = set()
+    # 内容完全相同的副本
+    for i in range(duplicate_count):
+        source = paths[i]
+        copy = os.path.join(dirs[(i + 1) % len(dirs)], f"copy_{i:05d}.CR2")
+        shutil.copyfile(source, copy)
+        expected.add(frozenset((source, copy)))
+
+    # 大小相同、开头和结尾相同但中间不同的文件
+    for i in range(duplicate_count, 2 * duplicate_count):
+        source = paths[i]
+        with open(source, "rb") as f:
+            data = bytearray(f.read())
+        data[len(data) // 2] ^= 0xFF
+        with open(os.path.join(dirs[(i + 1) % len(dirs)], f"near_{i:05d}.CR2"), "wb") as f:
+            f.write(data)
+    return expected
+
+
+def naive_duplicates(files):
+    """朴素方法：对每个文件计算完整哈希后分组，返回 (分组, 读取字节数)"""
+    groups = defaultdict(list)
+    read = 0
+    for path, size in files:
+        digest = hashlib.blake2b(digest_size=32)
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(FULL_READ_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+                read += len(data)
+        groups[digest.digest()].append(path)
+    return [group for group in groups.values() if len(group) > 1], read
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重复文件查找性能测试")
+    parser.add_argument("--files", type=int, default=2000, help="原始文件数量")
+    parser.add_argument("--duplicates", type=int, default=100, help="副本数量（同时生成同样数量的近似文件）")
+    parser.add_argument("--size-kb", type=int, default=2048, help="文件的平均大小(KB)")
+    parser.add_argument("--workers", type=int, default=4, help="计算哈希的线程数")
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix="bench_duplicates_")
+    try:
+        print("正在生成合成目录树...")
+        expected = build_tree(base, args.files, args.duplicates, args.size_kb)
+        files = [(path, size) for _, path, size, _, _ in scan_files(base)]
+        total_bytes = sum(size for _, size in files)
+        print(f"文件数量: {len(files)}，总大小 {total_bytes / 1024 / 1024:.1f} MB，"
+              f"预期重复分组 {len(expected)} 个")
+        print("注意: 文件刚刚写入，两种方法都从系统缓存读取，磁盘上的差距会更大")
+
+        start = time.perf_counter()
+        finder = DuplicateFinder(args.workers)
+        groups = list(finder.find((path, path, size) for path, size in files))
+        finder_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive_groups, naive_read = naive_duplicates(files)
+        naive_time = time.perf_counter() - start
+
+        found = {frozenset(group) for group in groups}
+        if found != expected or {frozenset(group) for group in naive_groups} != expected:
+            print("警告: 找到的重复分组与预期不一致")
+
+        print(f"完整哈希全部文件        读取 {naive_read / 1024 / 1024:9.1f} MB (100.0%)  耗时 {naive_time:.2f} 秒")
+        print(f"大小分组+部分哈希+完整哈希 读取 {finder.bytes_read / 1024 / 1024:9.1f} MB "
+              f"({finder.bytes_read / total_bytes * 100:5.1f}%)  耗时 {finder_time:.2f} 秒  "
+              f"部分哈希 {finder.partial_hashed} 个，完整哈希 {finder.full_hashed} 个")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
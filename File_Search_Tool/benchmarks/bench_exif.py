@@ -0,0 +1,139 @@
+"""EXIF拍摄时间读取性能测试：逐个读取 与 进程池并行读取 与 命中缓存
+
+用法:
+    python benchmarks/bench_exif.py [--files 2000] [--size-kb 4096] [--workers 4]
+
+在临时目录中生成带EXIF拍摄时间的合成JPEG和基于TIFF的RAW文件（CR2），其中一半RAW文件的Exif目录
+位于首次读取的文件头之外，用于验证按需读取。分别统计：当前进程逐个读取、CaptureDateReader首次读取
+（进程池）、再次读取（全部命中缓存），以及读取的字节数占文件总大小的比例。
+"""
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exif_date
+from exif_date import CaptureDateReader, read_capture_time
+from file_walker import scan_files
+
+
+def tiff_block(captured, order="<", exif_offset=None):
+    """生成包含IFD0、Exif子目录和拍摄时间的TIFF结构，exif_offset指定Exif子目录的位置"""
+    value = captured.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\0"
+    # IFD0只有一个条目：Exif子目录指针
+    exif_offset = exif_offset or 8 + 2 + 12 + 4
+    header = (b"II" if order == "<" else b"MM") + struct.pack(order + "HI", 42, 8)
+    ifd0 = struct.pack(order + "H", 1) + struct.pack(order + "HHII", 0x8769, 4, 1, exif_offset) + b"\0" * 4
+    padding = b"\0" * (exif_offset - len(header) - len(ifd0))
+    value_offset = exif_offset + 2 + 12 + 4
+    exif_ifd = struct.pack(order + "H", 1) + struct.pack(order + "HHII", 0x9003, 2, len(value), value_offset) + b"\0" * 4
+    return header + ifd0 + padding + exif_ifd + value
+
+
+def write_jpeg(path, captured, size):
+    tiff = tiff_block(captured, ">")
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0"
+    app1 = b"\xff\xe1" + struct.pack(">H", 2 + 6 + len(tiff)) + b"Exif\0\0" + tiff
+    data = b"\xff\xd8" + app0 + app1 + b"\xff\xda"
+    with open(path, "wb") as f:
+        f.write(data)
+        f.truncate(size)
+
+
+def write_raw(path, captured, size, far):
+    # far为True时Exif子目录位于首次读取的文件头之外
+    data = tiff_block(captured, "<", 64 * 1024 if far else None)
+    with open(path, "wb") as f:
+        f.write(data)
+        f.truncate(max(size, len(data)))
+
+
+class CountingOpen:
+    """统计exif_date模块中open返回的文件对象实际读取的字节数（只在当前进程中有效）"""
+
+    def __init__(self):
+        self.bytes_read = 0
+
+    def __call__(self, *args, **kwargs):
+        f = open(*args, **kwargs)
+        counter = self
+        read = f.read
+
+        class Wrapper:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                f.close()
+
+            def read(self, size=-1):
+                data = read(size)
+                counter.bytes_read += len(data)
+                return data
+
+            def seek(self, offset, whence=0):
+                return f.seek(offset, whence)
+
+        return Wrapper()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXIF拍摄时间读取性能测试")
+    parser.add_argument("--files", type=int, default=2000, help="文件数量")
+    parser.add_argument("--size-kb", type=int, default=4096, help="每个文件的大小(KB)，以稀疏文件生成")
+    parser.add_argument("--workers", type=int, default=4, help="进程池的进程数")
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix="bench_exif_")
+    try:
+        start_date = datetime(2020, 1, 1, 8, 30, 0)
+        expected = {}
+        for i in range(args.files):
+            captured = start_date + timedelta(hours=i)
+            if i % 2:
+                path = os.path.join(base, f"IMG_{i:05d}.JPG")
+                write_jpeg(path, captured, args.size_kb * 1024)
+            else:
+                path = os.path.join(base, f"IMG_{i:05d}.CR2")
+                write_raw(path, captured, args.size_kb * 1024, far=i % 4 == 0)
+            expected[path] = captured.timestamp()
+        entries = list(scan_files(base))
+        total_bytes = sum(entry[2] for entry in entries)
+
+        counter = CountingOpen()
+        exif_date.open = counter
+        start = time.perf_counter()
+        serial = {path: read_capture_time(path) for path in expected}
+        serial_time = time.perf_counter() - start
+        del exif_date.open
+
+        reader = CaptureDateReader(os.path.join(base, "cache.db"), args.workers)
+        start = time.perf_counter()
+        cold = {entry[1]: captured for entry, captured in reader.capture_times(entries)}
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        warm = {entry[1]: captured for entry, captured in reader.capture_times(entries)}
+        warm_time = time.perf_counter() - start
+        reader.close()
+
+        if not serial == cold == warm == expected:
+            print("警告: 读取的拍摄时间与预期不一致")
+
+        print(f"文件数量: {args.files}，文件总大小 {total_bytes / 1024 / 1024:.0f} MB，"
+              f"读取文件头 {counter.bytes_read / 1024:.0f} KB ({counter.bytes_read / total_bytes * 100:.3f}%)")
+        print(f"当前进程逐个读取       {serial_time:.3f} 秒")
+        print(f"进程池首次读取({args.workers}进程)  {cold_time:.3f} 秒（包含启动进程池）")
+        print(f"再次读取(命中缓存)     {warm_time:.3f} 秒")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
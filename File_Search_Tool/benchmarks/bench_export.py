@@ -0,0 +1,65 @@
+"""流式导出性能测试：导出行数增加时内存占用保持不变
+
+用法:
+    python benchmarks/bench_export.py [--rows 5000000] [--format csv]
+
+使用生成器产生合成的搜索结果（不访问文件系统，也不在内存中保存），逐条导出到临时文件，
+统计每秒导出的行数和写入速度；再在tracemalloc下分别导出1/10和全部行数（tracemalloc会明显减慢
+导出，这两次不计速度），两次的峰值内存应基本相同。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_export import export_records
+
+
+def generate_records(count):
+    """逐条生成 (文件名, 路径, 大小, 创建时间戳, 修改时间戳)"""
+    now = time.time()
+    for i in range(count):
+        name = f"IMG_{i:07d}.CR3"
+        path = os.path.join(os.sep, "照片", f"{2020 + i % 5}", f"roll_{i // 300:05d}", name)
+        ctime = now - (i * 104729) % (5 * 365 * 86400)
+        yield name, path, (i * 7919) % (40 * 1024 * 1024), ctime, ctime
+
+
+def measure_peak(rows, path, fmt):
+    """在tracemalloc下导出，返回峰值内存(字节)"""
+    tracemalloc.start()
+    export_records(generate_records(rows), path, fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式导出性能测试")
+    parser.add_argument("--rows", type=int, default=5000000, help="导出行数")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="导出格式")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_export_")
+    try:
+        path = os.path.join(folder, f"export.{args.format}")
+        start = time.perf_counter()
+        count = export_records(generate_records(args.rows), path, args.format)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+        print(f"导出 {count} 行  {elapsed:.2f} 秒  {count / elapsed:.0f} 行/秒  "
+              f"{size / elapsed / 1024 / 1024:.1f} MB/秒  文件 {size / 1024 / 1024:.1f} MB")
+        for rows in (args.rows // 10, args.rows):
+            print(f"峰值内存 {rows:>9} 行: {measure_peak(rows, path, args.format) / 1024:.1f} KB")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""文件名查询性能测试：三字符片段索引与逐个匹配文件名的耗时对比
+
+用法:
+    python benchmarks/bench_name_query.py [--files 2000000] [--query IMG_2024] [--mode substring]
+
+在临时的元数据索引中直接写入--files条合成的文件记录（不访问文件系统），再用同一个文件名查询
+分别通过文件名的三字符片段索引和逐个匹配全部文件名查询索引，比较耗时并检查结果一致。
+需要SQLite支持FTS5的trigram分词器（3.34以上），不支持时只测试逐个匹配。
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_types import file_extension
+from metadata_index import MetadataIndex
+from name_query import NAME_MODES, NameQuery
+
+PREFIXES = ["IMG_", "DSC_", "DSCF", "P", "_MG_", "VID_"]
+EXTENSIONS = [".jpg", ".cr3", ".nef", ".heic", ".mp4", ".png"]
+
+# 每个合成目录中的文件数
+FILES_PER_DIR = 500
+
+
+def populate(index, root, file_count):
+    """在索引中写入合成的目录和文件记录：相机风格的文件名，年份和序号随机"""
+    rnd = random.Random(0)
+    conn = index.connect()
+    try:
+        root_id = index.get_root_id(conn, root, create=True)
+        now = time.time()
+        for start in range(0, file_count, FILES_PER_DIR):
+            dir_id = conn.execute("INSERT INTO dirs (root_id, parent_id, path, mtime) VALUES (?, NULL, ?, ?)",
+                                  (root_id, os.path.join(root, f"roll_{start // FILES_PER_DIR:05d}"), now)).lastrowid
+            rows = []
+            for _ in range(min(FILES_PER_DIR, file_count - start)):
+                name = (f"{rnd.choice(PREFIXES)}{rnd.randint(2015, 2025)}{rnd.randint(1, 12):02d}"
+                        f"{rnd.randint(1, 28):02d}_{rnd.randint(0, 99999):05d}{rnd.choice(EXTENSIONS)}")
+                rows.append((dir_id, name, file_extension(name), rnd.randint(0, 1 << 26), now, now))
+            conn.executemany("INSERT INTO files (dir_id, name, ext, size, ctime, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                             rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def timed_query(index, root, query, use_name_index):
+    start = time.perf_counter()
+    paths = [entry[1] for entry in index.query(
+        root, query, name_fragments=query.fragments if use_name_index else None)]
+    return time.perf_counter() - start, sorted(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件名查询性能测试")
+    parser.add_argument("--files", type=int, default=2000000, help="合成的文件记录数")
+    parser.add_argument("--query", default="IMG_2024", help="文件名查询")
+    parser.add_argument("--mode", choices=NAME_MODES, default="substring", help="文件名匹配方式")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_name_")
+    try:
+        index = MetadataIndex(os.path.join(folder, "index.db"))
+        root = os.path.join(folder, "photos")
+        start = time.perf_counter()
+        populate(index, root, args.files)
+        size = os.path.getsize(index.db_path) / 1024 / 1024
+        print(f"写入 {args.files} 条记录  {time.perf_counter() - start:.1f} 秒  索引文件 {size:.0f} MB")
+
+        query = NameQuery(args.query, args.mode)
+        print(f"查询 {args.query} ({args.mode})，可用于索引的片段: {query.fragments or '无'}")
+        scan_time, scan_paths = timed_query(index, root, query, False)
+        print(f"逐个匹配文件名    : {scan_time * 1000:.1f} 毫秒, {len(scan_paths)} 个文件")
+        if index.name_index_available() and query.fragments:
+            indexed_time, indexed_paths = timed_query(index, root, query, True)
+            print(f"三字符片段索引    : {indexed_time * 1000:.1f} 毫秒, 结果一致: {indexed_paths == scan_paths}")
+        else:
+            print("三字符片段索引不可用（SQLite不支持或查询没有至少3个字符的字面片段）")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""单个文件的条件判断开销对比：原实现的逐文件判断 与 编译后的SearchCriteria谓词
+
+用法:
+    python benchmarks/bench_predicate.py [--files 500000] [--repeat 3]
+
+只测量条件判断本身（不访问文件系统），输入为内存中的 (文件名, 大小(字节), 创建时间戳) 列表，
+输出每个文件的平均耗时（纳秒）。条件为RAW格式、1MB以上、一年内创建，约一半的文件满足扩展名条件。
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_types import FILE_TYPES
+from search_engine import SearchCriteria
+
+# 使用小写扩展名：fnmatch在Windows下忽略大小写，在其他系统下区分大小写
+EXTENSIONS = [".cr2", ".jpg", ".nef", ".xmp", ".dng", ".mp4"]
+
+
+def generate_files(count):
+    """生成合成的 (文件名, 大小, 创建时间戳) 列表，大小和时间均匀分布在条件边界两侧"""
+    now = time.time()
+    files = []
+    for i in range(count):
+        name = f"IMG_{i:07d}{EXTENSIONS[i % len(EXTENSIONS)]}"
+        size = (i * 7919) % (4 * 1024 * 1024)
+        ctime = now - (i * 104729) % (2 * 365 * 86400)
+        files.append((name, size, ctime))
+    return files
+
+
+def legacy_match(files, file_type, size_min, size_max, date_from, date_to):
+    """原实现：每个文件逐个fnmatch模式，大小换算为KB，创建时间转换为datetime后比较"""
+    count = 0
+    for name, size, ctime in files:
+        matched = False
+        for ft in file_type.split(";"):
+            if fnmatch.fnmatch(name, ft):
+                matched = True
+                break
+        if not matched:
+            continue
+        size_kb = size / 1024
+        if not (size_min <= size_kb <= size_max):
+            continue
+        created_time = datetime.fromtimestamp(ctime)
+        if date_from and created_time < date_from:
+            continue
+        if date_to and created_time > date_to:
+            continue
+        count += 1
+    return count
+
+
+def compiled_match(files, predicate):
+    """新实现：条件预先编译为一个谓词，依次比较扩展名、字节数和时间戳"""
+    count = 0
+    for name, size, ctime in files:
+        if predicate(name, size, ctime):
+            count += 1
+    return count
+
+
+def best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单个文件的条件判断开销对比")
+    parser.add_argument("--files", type=int, default=500000, help="文件数量")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    files = generate_files(args.files)
+    file_type = FILE_TYPES["RAW格式"]
+    date_to = datetime.combine(datetime.now().date(), datetime.max.time())
+    date_from = datetime.combine((date_to - timedelta(days=365)).date(), datetime.min.time())
+    size_min_kb, size_max_kb = 1024, float("inf")
+
+    criteria = SearchCriteria(file_type, size_min_kb * 1024, None, date_from.timestamp(), date_to.timestamp())
+    predicate = criteria.compile_predicate()
+
+    legacy_time, legacy_count = best_time(
+        lambda: legacy_match(files, file_type, size_min_kb, size_max_kb, date_from, date_to), args.repeat)
+    compiled_time, compiled_count = best_time(lambda: compiled_match(files, predicate), args.repeat)
+
+    if legacy_count != compiled_count:
+        print(f"警告: 匹配数量不一致 ({legacy_count} != {compiled_count})")
+
+    print(f"文件数量: {args.files}，匹配 {compiled_count} 个")
+    print(f"原实现(fnmatch + datetime)   {legacy_time:.3f} 秒  {legacy_time / args.files * 1e9:8.0f} ns/文件")
+    print(f"编译谓词                     {compiled_time:.3f} 秒  {compiled_time / args.files * 1e9:8.0f} ns/文件  "
+          f"{legacy_time / compiled_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
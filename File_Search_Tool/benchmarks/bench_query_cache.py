@@ -0,0 +1,80 @@
+"""搜索结果缓存性能测试：首次搜索、目录树未变化和部分目录变化时的耗时
+
+用法:
+    python benchmarks/bench_query_cache.py [--dirs 2000] [--files 50] [--changed 20]
+
+在临时目录中生成合成目录树，依次执行：未命中缓存的完整遍历、目录树未变化的重复搜索、
+在--changed个目录中各新增一个文件后的重复搜索（只重新枚举这些目录），并与不使用缓存的遍历比较结果。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_cache
+from query_cache import QueryCache
+from search_engine import SearchCriteria, search
+
+EXTENSIONS = [".jpg", ".png", ".cr2", ".nef", ".mp4", ".txt"]
+
+
+def build_tree(base, dir_count, files_per_dir):
+    """生成合成目录树：每层最多10个子目录，每个目录包含若干不同扩展名的空文件"""
+    dirs = [base]
+    for created in range(dir_count):
+        path = os.path.join(dirs[created // 10], f"dir_{created:05d}")
+        os.mkdir(path)
+        dirs.append(path)
+    for d in dirs:
+        for i in range(files_per_dir):
+            open(os.path.join(d, f"file_{i:04d}{EXTENSIONS[i % len(EXTENSIONS)]}"), "wb").close()
+    return dirs
+
+
+def timed_search(folder, criteria, cache):
+    start = time.perf_counter()
+    paths = [record.path for record in search(folder, criteria, cache=cache)]
+    return time.perf_counter() - start, paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索结果缓存性能测试")
+    parser.add_argument("--dirs", type=int, default=2000, help="合成目录数量")
+    parser.add_argument("--files", type=int, default=50, help="每个目录的文件数量")
+    parser.add_argument("--changed", type=int, default=20, help="第三次搜索前新增文件的目录数")
+    args = parser.parse_args()
+
+    # 合成目录树刚刚生成，修改时间都很新，测试时不需要防止同一时间片内的重复修改
+    query_cache.RACY_MARGIN = 0
+
+    folder = tempfile.mkdtemp(prefix="bench_cache_")
+    try:
+        dirs = build_tree(folder, args.dirs, args.files)
+        print(f"合成目录树: {len(dirs)} 个目录, {len(dirs) * args.files} 个文件")
+        criteria = SearchCriteria("*.jpg;*.cr2")
+        cache = QueryCache()
+
+        miss_time, miss_paths = timed_search(folder, criteria, cache)
+        hit_time, hit_paths = timed_search(folder, criteria, cache)
+        print(f"首次搜索(未命中) : {miss_time:.3f} 秒, {len(miss_paths)} 个文件")
+        print(f"目录树未变化     : {hit_time:.3f} 秒, 结果一致: {hit_paths == miss_paths}")
+
+        for d in dirs[::max(1, len(dirs) // args.changed)][:args.changed]:
+            open(os.path.join(d, "new_file.jpg"), "wb").close()
+        partial_time, partial_paths = timed_search(folder, criteria, cache)
+        _, full_paths = timed_search(folder, criteria, None)
+        tree = next(iter(cache.entries.values()))
+        print(f"{args.changed}个目录有变化  : {partial_time:.3f} 秒, 重新枚举 {tree.rescanned} 个目录, "
+              f"结果一致: {partial_paths == full_paths}")
+        print(f"缓存估算内存     : {cache.total_bytes / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
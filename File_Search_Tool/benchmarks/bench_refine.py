@@ -0,0 +1,73 @@
+"""在已有结果中筛选与重新搜索的对比
+
+用法:
+    python benchmarks/bench_refine.py [--dirs 2000] [--files 50]
+
+在临时目录中生成合成目录树，先搜索"所有图片"，再把条件收窄为"PNG格式"且大小不小于1KB，
+分别统计在上一次结果中筛选（refine）和重新遍历目录树的耗时，并比较两者的结果是否一致。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_types import FILE_TYPES
+from search_engine import SearchCriteria, refine, search
+
+EXTENSIONS = [".jpg", ".png", ".cr2", ".nef", ".mp4", ".txt"]
+
+
+def build_tree(base, dir_count, files_per_dir):
+    """生成合成目录树：每层最多10个子目录，每个目录包含若干不同扩展名、不同大小的文件"""
+    dirs = [base]
+    for created in range(dir_count):
+        path = os.path.join(dirs[created // 10], f"dir_{created:05d}")
+        os.mkdir(path)
+        dirs.append(path)
+    for d in dirs:
+        for i in range(files_per_dir):
+            with open(os.path.join(d, f"file_{i:04d}{EXTENSIONS[i % len(EXTENSIONS)]}"), "wb") as f:
+                f.write(b"x" * (i * 97 % 2048))
+    return len(dirs) * files_per_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在已有结果中筛选与重新搜索的对比")
+    parser.add_argument("--dirs", type=int, default=2000, help="合成目录数量")
+    parser.add_argument("--files", type=int, default=50, help="每个目录的文件数量")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_refine_")
+    try:
+        total = build_tree(folder, args.dirs, args.files)
+        print(f"合成目录树: {args.dirs + 1} 个目录, {total} 个文件")
+
+        wide = SearchCriteria(FILE_TYPES["所有图片"])
+        narrow = SearchCriteria(FILE_TYPES["PNG格式"], size_min=1024)
+        print(f"条件收窄: {narrow.narrows(wide)}，放宽: {wide.narrows(narrow)}")
+
+        start = time.perf_counter()
+        results = list(search(folder, wide))
+        print(f"搜索所有图片   : {time.perf_counter() - start:.3f} 秒, {len(results)} 个文件")
+
+        start = time.perf_counter()
+        refined = [results[index].path for index in refine(range(len(results)), results.__getitem__, narrow, wide)]
+        refine_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        searched = [record.path for record in search(folder, narrow)]
+        search_time = time.perf_counter() - start
+
+        print(f"在结果中筛选   : {refine_time:.3f} 秒, {len(refined)} 个文件")
+        print(f"重新搜索       : {search_time:.3f} 秒, {len(searched)} 个文件, 结果一致: {refined == searched}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
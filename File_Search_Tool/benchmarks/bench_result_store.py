@@ -0,0 +1,99 @@
+"""搜索结果内存占用对比：每条结果一个格式化字符串元组、按列保存的Python列表 与 紧凑的ResultStore
+
+用法:
+    python benchmarks/bench_result_store.py [--results 500000] [--per-dir 200]
+
+使用tracemalloc统计保存全部结果后新增的内存，并换算为每条结果占用的字节数。
+合成结果模拟相机目录：每个目录包含--per-dir个文件，路径和文件名都是独立的字符串对象，
+与遍历时os.scandir返回的结果相同。
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_view import ResultStore
+
+
+def generate_rows(count, per_dir):
+    """逐个生成 (文件名, 路径, 大小, 创建时间戳, 修改时间戳) 格式的合成结果"""
+    base = os.path.join(os.sep, "photos", "camera")
+    start = 1700000000.0
+    for i in range(count):
+        folder = os.path.join(base, f"{2000 + i // 100000}", f"roll_{i // per_dir:06d}")
+        name = f"IMG_{i:07d}.CR2"
+        yield name, os.path.join(folder, name), 20000000 + i, start + i, start + i * 2
+
+
+def store_formatted(rows):
+    """旧实现：每条结果保存为格式化后的字符串元组（原Treeview中的值）"""
+    items = []
+    for name, path, size, ctime, mtime in rows:
+        items.append((
+            name,
+            path,
+            f"{size / 1024:.2f}",
+            datetime.fromtimestamp(ctime).strftime("%Y-%m-%d %H:%M:%S"),
+            datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+        ))
+    return items
+
+
+def store_lists(rows):
+    """上一版ResultStore：每列一个Python列表，数值保存为int/float对象"""
+    columns = ([], [], [], [], [])
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+    return columns
+
+
+def store_compact(rows):
+    """当前实现：array列加共享的目录前缀"""
+    store = ResultStore()
+    store.extend(rows)
+    return store
+
+
+def measure(build, count, per_dir):
+    """返回 (新增内存字节数, 耗时秒数)，结果对象在测量后释放"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(generate_rows(count, per_dir))
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索结果内存占用对比")
+    parser.add_argument("--results", type=int, default=500000, help="结果数量")
+    parser.add_argument("--per-dir", type=int, default=200, help="每个目录中的文件数")
+    args = parser.parse_args()
+
+    print(f"结果数量: {args.results}，每个目录 {args.per_dir} 个文件")
+    baseline = None
+    for label, build in [
+        ("格式化字符串元组", store_formatted),
+        ("Python列表按列保存", store_lists),
+        ("ResultStore(array+目录前缀)", store_compact),
+    ]:
+        size, elapsed = measure(build, args.results, args.per_dir)
+        if baseline is None:
+            baseline = size
+        print(f"{label:<28} {size / 1024 / 1024:9.1f} MB  {size / args.results:7.1f} 字节/条  "
+              f"{baseline / size:5.1f}x  构建耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
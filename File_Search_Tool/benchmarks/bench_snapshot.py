@@ -0,0 +1,89 @@
+"""元数据筛选性能对比：逐文件的Python谓词 与 列式快照的向量化掩码（需要NumPy）
+
+用法:
+    python benchmarks/bench_snapshot.py [--files 2000000] [--repeat 3]
+
+使用合成的文件元数据（不访问文件系统）生成快照，条件为RAW格式、1MB以上、一年内创建。
+分别统计：Python循环逐个调用编译后的谓词、快照只计算布尔掩码、快照生成全部匹配结果（包含路径解码）。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 允许从benchmarks子目录直接运行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_types import FILE_TYPES
+from metadata_snapshot import SnapshotStore, snapshot_available
+from search_engine import SearchCriteria
+
+EXTENSIONS = [".cr2", ".jpg", ".nef", ".xmp", ".dng", ".mp4"]
+
+
+def generate_entries(count):
+    """生成scan_files格式的合成文件元组"""
+    now = time.time()
+    entries = []
+    for i in range(count):
+        name = f"IMG_{i:07d}{EXTENSIONS[i % len(EXTENSIONS)]}"
+        path = os.path.join(os.sep, "photos", f"roll_{i // 200:06d}", name)
+        size = (i * 7919) % (40 * 1024 * 1024)
+        ctime = now - (i * 104729) % (5 * 365 * 86400)
+        entries.append((name, path, size, ctime, ctime))
+    return entries
+
+
+def best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="元数据筛选性能对比")
+    parser.add_argument("--files", type=int, default=2000000, help="文件数量")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    if not snapshot_available():
+        print("需要安装NumPy: pip install numpy")
+        return
+
+    entries = generate_entries(args.files)
+    now = time.time()
+    criteria = SearchCriteria(FILE_TYPES["RAW格式"], 1024 * 1024, None, now - 365 * 86400, now)
+    predicate = criteria.compile_predicate()
+
+    folder = tempfile.mkdtemp(prefix="bench_snapshot_")
+    try:
+        start = time.perf_counter()
+        snapshot = SnapshotStore(folder).build("/photos", entries)
+        build_time = time.perf_counter() - start
+
+        loop_time, loop_count = best_time(
+            lambda: sum(1 for name, _, size, ctime, _ in entries if predicate(name, size, ctime)), args.repeat)
+        mask_time, mask_count = best_time(lambda: int(snapshot.mask(criteria).sum()), args.repeat)
+        query_time, query_count = best_time(lambda: sum(1 for _ in snapshot.query(criteria)), args.repeat)
+
+        if not loop_count == mask_count == query_count:
+            print(f"警告: 匹配数量不一致 ({loop_count}, {mask_count}, {query_count})")
+
+        print(f"文件数量: {args.files}，匹配 {mask_count} 个，生成快照耗时 {build_time:.2f} 秒")
+        print(f"Python循环 + 编译谓词    {loop_time * 1000:9.1f} ms")
+        print(f"快照布尔掩码             {mask_time * 1000:9.1f} ms  {loop_time / mask_time:6.1f}x")
+        print(f"快照查询(含路径解码)     {query_time * 1000:9.1f} ms  {loop_time / query_time:6.1f}x")
+        del snapshot
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 部分哈希读取文件开头和结尾各64KB
+PARTIAL_BLOCK_SIZE = 64 * 1024
+
+# 完整哈希每次读取的字节数
+FULL_READ_SIZE = 1024 * 1024
+
+
+class DuplicateFinder:
+    """查找内容完全相同的文件
+
+    依次筛选，每一步只处理上一步仍可能重复的文件，大多数文件的内容不会被读取：
+    1. 按文件大小分组，大小唯一的文件不可能重复；
+    2. 大小相同的文件只计算开头和结尾各64KB的哈希，不超过128KB的文件此时已读完全部内容；
+    3. 部分哈希仍相同的大文件在线程池中计算完整哈希，每次读取1MB。
+    """
+
+    def __init__(self, workers=4, min_size=1, cancel_event=None, onerror=None, on_hashed=None):
+        self.workers = max(1, workers)
+        # 小于min_size的文件不参与比较（默认跳过空文件）
+        self.min_size = min_size
+        self.cancel_event = cancel_event
+        # onerror(OSError) 在工作线程中调用
+        self.onerror = onerror
+        # on_hashed(数量) 每个候选文件计算完部分哈希时调用一次（完整哈希不再调用，数量见full_hashed），
+        # 在工作线程中调用
+        self.on_hashed = on_hashed
+        # 统计信息，由多个工作线程更新
+        self.lock = threading.Lock()
+        self.bytes_read = 0
+        self.partial_hashed = 0
+        self.full_hashed = 0
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def add_read(self, count):
+        with self.lock:
+            self.bytes_read += count
+
+    def partial_hash(self, path, size):
+        """计算文件开头和结尾各PARTIAL_BLOCK_SIZE字节的哈希，失败或取消时返回None"""
+        if self.cancelled():
+            return None
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, "rb") as f:
+                data = f.read(PARTIAL_BLOCK_SIZE)
+                digest.update(data)
+                read = len(data)
+                if size > PARTIAL_BLOCK_SIZE:
+                    f.seek(max(PARTIAL_BLOCK_SIZE, size - PARTIAL_BLOCK_SIZE))
+                    data = f.read(PARTIAL_BLOCK_SIZE)
+                    digest.update(data)
+                    read += len(data)
+        except OSError as e:
+            if self.onerror is not None:
+                self.onerror(e)
+            return None
+        self.add_read(read)
+        with self.lock:
+            self.partial_hashed += 1
+        if self.on_hashed is not None:
+            self.on_hashed(1)
+        return digest.digest()
+
+    def full_hash(self, path, size):
+        """计算整个文件的哈希，失败或取消时返回None"""
+        digest = hashlib.blake2b(digest_size=32)
+        read = 0
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    if self.cancelled():
+                        return None
+                    data = f.read(FULL_READ_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    read += len(data)
+        except OSError as e:
+            if self.onerror is not None:
+                self.onerror(e)
+            return None
+        finally:
+            self.add_read(read)
+        with self.lock:
+            self.full_hashed += 1
+        return digest.digest()
+
+    def group_by_hash(self, executor, items, hash_func):
+        """在线程池中计算哈希，返回仍有重复的分组 [[(标识, 路径, 大小), ...], ...]"""
+        groups = defaultdict(list)
+        digests = executor.map(lambda item: hash_func(item[1], item[2]), items)
+        for item, digest in zip(items, digests):
+            if digest is not None:
+                groups[(item[2], digest)].append(item)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def find(self, items):
+        """items为 (标识, 路径, 大小) 的可迭代对象，逐个生成重复文件分组（标识列表）
+
+        标识由调用方决定（例如结果列表中的行号），同一分组中的文件内容完全相同。
+        """
+        # 第一步：按大小分组
+        by_size = defaultdict(list)
+        for item in items:
+            if item[2] >= self.min_size:
+                by_size[item[2]].append(item)
+        candidates = [item for bucket in by_size.values() if len(bucket) > 1 for item in bucket]
+        if not candidates:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash") as executor:
+            # 第二步：部分哈希
+            full_candidates = []
+            for group in self.group_by_hash(executor, candidates, self.partial_hash):
+                if group[0][2] <= 2 * PARTIAL_BLOCK_SIZE:
+                    # 部分哈希已经覆盖整个文件
+                    yield [item[0] for item in group]
+                else:
+                    full_candidates.extend(group)
+            if self.cancelled() or not full_candidates:
+                return
+
+            # 第三步：完整哈希
+            for group in self.group_by_hash(executor, full_candidates, self.full_hash):
+                yield [item[0] for item in group]
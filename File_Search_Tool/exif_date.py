@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from file_types import FILE_TYPES, compile_file_type, file_extension
+
+# 读取拍摄时间的文件类型，都在文件头部保存EXIF信息
+EXIF_FILE_TYPES = ("JPEG格式", "TIFF格式", "RAW格式", "DNG格式")
+EXIF_EXTENSIONS = frozenset().union(*(compile_file_type(FILE_TYPES[name]).extensions for name in EXIF_FILE_TYPES))
+
+# 首次读取的文件头大小，EXIF目录超出这个范围时只按需读取需要的几十个字节
+HEADER_SIZE = 8 * 1024
+
+# EXIF标签：Exif子目录指针、拍摄时间(DateTimeOriginal)
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+
+# 单个目录最多检查的条目数，防止损坏的文件导致长时间循环
+MAX_IFD_ENTRIES = 1000
+
+# EXIF中的日期格式
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# 每批处理的文件数：先批量查询缓存，未命中的文件一起交给进程池
+BATCH_SIZE = 512
+
+# 未命中缓存的文件少于这个数量时直接在当前进程中读取，不启动进程池
+POOL_THRESHOLD = 64
+
+
+class HeaderReader:
+    """按偏移量读取文件内容，文件头范围内的数据直接从已读取的缓冲区返回"""
+
+    def __init__(self, f, head):
+        self.f = f
+        self.head = head
+
+    def read(self, offset, length):
+        if offset + length <= len(self.head):
+            return self.head[offset:offset + length]
+        self.f.seek(offset)
+        return self.f.read(length)
+
+
+def parse_exif_date(value):
+    """把EXIF日期字符串（YYYY:MM:DD HH:MM:SS）转换为本地时间戳，无效时返回None"""
+    try:
+        text = value.split(b"\0", 1)[0].decode("ascii").strip()
+        return datetime.strptime(text[:19], EXIF_DATE_FORMAT).timestamp()
+    except (UnicodeDecodeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def read_ifd_tags(reader, base, order, ifd_offset, tags):
+    """读取TIFF目录中指定标签的 (类型, 数量, 值或偏移量字段) ，返回 {标签: (类型, 数量, 原始字段)}"""
+    data = reader.read(base + ifd_offset, 2)
+    if len(data) < 2:
+        return {}
+    count = min(struct.unpack(order + "H", data)[0], MAX_IFD_ENTRIES)
+    data = reader.read(base + ifd_offset + 2, count * 12)
+    found = {}
+    for i in range(len(data) // 12):
+        tag, value_type, value_count = struct.unpack_from(order + "HHI", data, i * 12)
+        if tag in tags:
+            found[tag] = (value_type, value_count, data[i * 12 + 8:i * 12 + 12])
+    return found
+
+
+def read_tiff_date(reader, base):
+    """从base处的TIFF结构中读取拍摄时间：先查IFD0，再查Exif子目录"""
+    header = reader.read(base, 8)
+    if len(header) < 8 or header[:2] not in (b"II", b"MM"):
+        return None
+    order = "<" if header[:2] == b"II" else ">"
+    # 标准TIFF的标识为42，部分RAW格式（ORF、RW2）使用其他标识，结构相同
+    ifd_offset = struct.unpack(order + "I", header[4:8])[0]
+
+    tags = read_ifd_tags(reader, base, order, ifd_offset, (TAG_EXIF_IFD, TAG_DATE_TIME_ORIGINAL))
+    if TAG_DATE_TIME_ORIGINAL not in tags and TAG_EXIF_IFD in tags:
+        exif_offset = struct.unpack(order + "I", tags[TAG_EXIF_IFD][2])[0]
+        tags = read_ifd_tags(reader, base, order, exif_offset, (TAG_DATE_TIME_ORIGINAL,))
+    if TAG_DATE_TIME_ORIGINAL not in tags:
+        return None
+
+    value_type, value_count, field = tags[TAG_DATE_TIME_ORIGINAL]
+    # 类型2为ASCII，超过4字节时字段中保存的是偏移量
+    if value_type != 2 or value_count < 19:
+        return None
+    value_offset = struct.unpack(order + "I", field)[0]
+    return parse_exif_date(reader.read(base + value_offset, min(value_count, 32)))
+
+
+def read_jpeg_date(reader, offset=0):
+    """依次检查JPEG的标记段，在APP1(Exif)段中读取拍摄时间"""
+    pos = offset + 2
+    while True:
+        marker = reader.read(pos, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        # 图像数据开始或文件结束，EXIF只会出现在这之前
+        if marker[1] in (0xDA, 0xD9):
+            return None
+        length = struct.unpack(">H", marker[2:4])[0]
+        if marker[1] == 0xE1 and reader.read(pos + 4, 6) == b"Exif\0\0":
+            return read_tiff_date(reader, pos + 10)
+        pos += 2 + length
+
+
+def read_capture_time(path):
+    """读取图片的EXIF拍摄时间（本地时间戳），没有拍摄时间或无法读取时返回None
+
+    只读取文件头：JPEG按标记段查找Exif段，TIFF及基于TIFF的RAW/DNG直接解析目录，
+    RAF读取其中嵌入的JPEG，CR3在文件头中查找保存Exif目录的CMT2盒。可以在子进程中调用。
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+            reader = HeaderReader(f, head)
+            if head[:2] == b"\xff\xd8":
+                return read_jpeg_date(reader)
+            if head[:2] in (b"II", b"MM"):
+                return read_tiff_date(reader, 0)
+            if head[:16] == b"FUJIFILMCCD-RAW ":
+                # RAF文件头的第84字节起为嵌入JPEG的偏移量
+                jpeg_offset = struct.unpack(">I", head[84:88])[0]
+                return read_jpeg_date(reader, jpeg_offset)
+            if head[4:8] == b"ftyp":
+                cmt2 = head.find(b"CMT2")
+                if cmt2 >= 0:
+                    return read_tiff_date(reader, cmt2 + 4)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+class CaptureDateReader:
+    """读取文件的EXIF拍摄时间，结果按 (路径, 大小, 修改时间) 保存在SQLite缓存中
+
+    文件大小和修改时间都没有变化时直接使用缓存（包括没有拍摄时间的结果），同一批未命中缓存的
+    文件较多时交给进程池并行读取。进程池在第一次需要时创建，之后的搜索继续使用，close时关闭。
+    """
+
+    def __init__(self, cache_path=None, workers=None):
+        # cache_path为None时缓存保存在内存数据库中，只在这个读取器的生命周期内有效
+        self.cache_path = cache_path
+        self.workers = max(1, workers or min(8, os.cpu_count() or 1))
+        self.executor = None
+        self.memory_conn = None
+        self.lock = threading.Lock()
+        # 内存数据库的连接由所有调用共享，查询和写入缓存时加锁
+        self.db_lock = threading.Lock()
+
+    def connect(self):
+        """返回缓存数据库的连接：文件缓存每次打开新的连接，内存缓存始终使用同一个连接"""
+        if self.cache_path is None:
+            with self.lock:
+                if self.memory_conn is None:
+                    self.memory_conn = self.open_db(":memory:")
+                return self.memory_conn
+        return self.open_db(self.cache_path)
+
+    def open_db(self, database):
+        conn = sqlite3.connect(database, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS capture_times ("
+                     "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, captured REAL)")
+        return conn
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # 使用spawn方式启动子进程：进程池可能在工作线程中创建，fork会复制其他线程持有的锁
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            return self.executor
+
+    def close(self):
+        """关闭进程池和内存缓存"""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+            if self.memory_conn is not None:
+                self.memory_conn.close()
+                self.memory_conn = None
+
+    def read_missing(self, paths):
+        """读取未命中缓存的文件的拍摄时间，数量较多时使用进程池"""
+        if len(paths) < POOL_THRESHOLD or self.workers == 1:
+            return [read_capture_time(path) for path in paths]
+        chunksize = max(1, len(paths) // (self.workers * 4))
+        return list(self.get_executor().map(read_capture_time, paths, chunksize=chunksize))
+
+    def capture_times(self, entries, cancel_event=None, stats=None):
+        """entries为scan_files格式的元组，逐个生成 (元组, 拍摄时间戳或None)
+
+        只读取JPEG、TIFF、RAW和DNG文件，其他类型的文件拍摄时间为None。
+        stats: 可选，SearchStats，查询缓存和读取文件头的耗时计入exif阶段
+        """
+        conn = self.connect()
+        try:
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) >= BATCH_SIZE:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    yield from self.timed_batch(conn, batch, stats)
+                    batch = []
+            if batch and not (cancel_event is not None and cancel_event.is_set()):
+                yield from self.timed_batch(conn, batch, stats)
+        finally:
+            if conn is not self.memory_conn:
+                conn.close()
+
+    def timed_batch(self, conn, batch, stats):
+        """处理一批文件，提供stats时记录耗时"""
+        if stats is None:
+            return self.process_batch(conn, batch)
+        start = time.perf_counter()
+        results = self.process_batch(conn, batch)
+        stats.add_time("exif", time.perf_counter() - start)
+        return results
+
+    def process_batch(self, conn, batch):
+        """查询一批文件的缓存，读取未命中的文件并写入缓存，返回 [(元组, 拍摄时间)]"""
+        results = [None] * len(batch)
+        missing = []
+        with self.db_lock:
+            for i, (name, path, size, _, mtime) in enumerate(batch):
+                if file_extension(name) not in EXIF_EXTENSIONS:
+                    continue
+                row = conn.execute("SELECT size, mtime, captured FROM capture_times WHERE path = ?",
+                                   (path,)).fetchone()
+                if row is not None and row[0] == size and row[1] == mtime:
+                    results[i] = row[2]
+                else:
+                    missing.append(i)
+
+        if missing:
+            captured = self.read_missing([batch[i][1] for i in missing])
+            for i, value in zip(missing, captured):
+                results[i] = value
+            with self.db_lock:
+                conn.executemany("INSERT OR REPLACE INTO capture_times (path, size, mtime, captured) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 [(batch[i][1], batch[i][2], batch[i][4], results[i]) for i in missing])
+                conn.commit()
+        return list(zip(batch, results))
@@ -0,0 +1,119 @@
+import fnmatch
+import json
+import os
+import re
+from functools import lru_cache
+
+# 摄影常用文件类型映射
+FILE_TYPES = {
+    "所有文件": "*.*",
+    "所有图片": "*.jpg;*.jpeg;*.png;*.gif;*.bmp;*.tiff;*.tif",
+    "JPEG格式": "*.jpg;*.jpeg",
+    "PNG格式": "*.png",
+    "TIFF格式": "*.tiff;*.tif",
+    "RAW格式": "*.cr2;*.cr3;*.nef;*.arw;*.dng;*.rw2;*.orf;*.pef;*.srw;*.raf;*.mos",
+    "PSD格式": "*.psd",
+    "DNG格式": "*.dng",
+    "视频文件": "*.mp4;*.avi;*.mkv;*.mov;*.wmv;*.m4v",
+    "压缩文件": "*.zip;*.rar;*.7z;*.tar;*.gz"
+}
+
+# 文件类型在日志中使用的英文缩写
+FILE_TYPE_CODES = {
+    "所有文件": "all_files",
+    "所有图片": "all_images",
+    "JPEG格式": "jpeg",
+    "PNG格式": "png",
+    "TIFF格式": "tiff",
+    "RAW格式": "raw",
+    "PSD格式": "psd",
+    "DNG格式": "dng",
+    "视频文件": "video",
+    "压缩文件": "archive"
+}
+
+
+def file_extension(name):
+    """返回小写的文件扩展名（包含点号，取最后一个点之后的部分），没有扩展名时返回空字符串"""
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot >= 0 else ""
+
+
+class FileTypeMatcher:
+    """把分号分隔的通配符模式（如"*.cr2;*.cr3"）编译为匹配器
+
+    形如"*.ext"的模式合并为小写扩展名集合，匹配时只需一次后缀查找；
+    其他通配符模式合并为一个忽略大小写的正则表达式。"*.*"、"*"或空模式匹配所有文件。
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.match_all = False
+        extensions = set()
+        wildcard_patterns = []
+
+        for part in pattern.split(";"):
+            part = part.strip()
+            if not part:
+                continue
+            if part in ("*.*", "*"):
+                self.match_all = True
+            elif part.startswith("*.") and not any(c in part[2:] for c in "*?[."):
+                extensions.add(part[1:].lower())
+            else:
+                wildcard_patterns.append(part)
+
+        if not extensions and not wildcard_patterns:
+            self.match_all = True
+
+        self.extensions = frozenset(extensions)
+        self.regex = None
+        if wildcard_patterns:
+            self.regex = re.compile("|".join(fnmatch.translate(p) for p in wildcard_patterns), re.IGNORECASE)
+
+    @property
+    def extensions_only(self):
+        """是否只需比较扩展名（可以直接用于索引查询）"""
+        return not self.match_all and self.regex is None
+
+    def __call__(self, name):
+        if self.match_all:
+            return True
+        dot = name.rfind(".")
+        if dot >= 0 and name[dot:].lower() in self.extensions:
+            return True
+        return self.regex is not None and self.regex.match(name) is not None
+
+
+@lru_cache(maxsize=64)
+def compile_file_type(pattern):
+    """编译文件类型模式，相同的模式只编译一次"""
+    return FileTypeMatcher(pattern)
+
+
+def load_custom_file_types(path):
+    """加载用户自定义的文件类型分组，格式为 {"分组名称": "*.heic;*.heif"}
+
+    文件不存在或格式错误时返回空字典。
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"加载自定义文件类型失败: {e}")
+        return {}
+
+    if not isinstance(data, dict):
+        print(f"自定义文件类型格式不正确: {path}")
+        return {}
+
+    custom_types = {}
+    for name, pattern in data.items():
+        # 同时支持 "*.a;*.b" 字符串和 ["*.a", "*.b"] 列表两种写法
+        if isinstance(pattern, list):
+            pattern = ";".join(str(p) for p in pattern)
+        if isinstance(pattern, str) and pattern.strip():
+            custom_types[str(name)] = pattern
+    return custom_types
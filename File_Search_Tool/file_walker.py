@@ -0,0 +1,288 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 广度优先遍历时等待枚举的目录数上限，超过后新发现的子目录改为立即深度优先遍历，
+# 内存占用不随目录树的宽度增长
+MAX_PENDING_DIRS = 10000
+
+# 并行遍历时每个工作线程提前提交的目录数，已提交但尚未取出结果的目录不超过 线程数 x 这个值，
+# 非常宽的目录也不会一次把全部子目录排入线程池，内存占用不随目录树的宽度增长
+PREFETCH_PER_WORKER = 4
+
+# 记录分阶段耗时时，每隔这么多个文件对读取属性和条件筛选计时一次
+STATS_SAMPLE_INTERVAL = 16
+
+
+def scan_directory(path, name_filter=None, cancel_event=None, follow_links=False, stat_filter=None, stats=None):
+    """枚举单个目录，返回 (文件列表, 子目录列表, 错误列表)
+
+    文件列表中的元素为 (文件名, 文件路径, 大小(字节), 创建时间戳, 修改时间戳)；
+    stat_filter(大小, 创建时间戳) 可选，在读取属性后、创建结果元组前筛选；
+    子目录列表中的元素为 (目录路径, 目录标识)，目录标识仅在follow_links时为(st_dev, st_ino)，
+    用于检测符号链接造成的循环。
+    stats: 可选，SearchStats，记录检查的文件数，以及枚举目录、读取属性和条件筛选各自的耗时
+    """
+    files = []
+    subdirs = []
+    errors = []
+    try:
+        scanner = os.scandir(path)
+    except OSError as e:
+        errors.append(e)
+        return files, subdirs, errors
+
+    examined = 0
+    timed = stats is not None
+    if timed:
+        # 计时本身会明显减慢遍历，只对每STATS_SAMPLE_INTERVAL个文件中的一个计时，按比例估算；
+        # 抽样位置在目录之间连续，文件很少的目录也会被抽到
+        clock = time.perf_counter
+        start = clock()
+        sample_phase = stats.sample_phase
+        stat_time = filter_time = 0.0
+
+    with scanner:
+        for entry in scanner:
+            # 大目录中也要及时响应取消
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+            # 区分目录和文件，无法判断时按文件处理（与os.walk一致）
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                try:
+                    if follow_links:
+                        # 跟随链接时需要真实的设备号和inode来识别重复目录
+                        dir_stat = os.stat(entry.path)
+                        subdirs.append((entry.path, (dir_stat.st_dev, dir_stat.st_ino)))
+                    elif not entry.is_symlink():
+                        subdirs.append((entry.path, None))
+                except OSError as e:
+                    # 无法进入的子目录直接跳过，只在统计中记录
+                    if timed:
+                        stats.add_error(e)
+                continue
+
+            examined += 1
+            sampled = timed and (examined + sample_phase) % STATS_SAMPLE_INTERVAL == 0
+            if sampled:
+                begin = clock()
+            name = entry.name
+            # 先按文件名筛选，避免对不需要的文件读取属性
+            if name_filter is not None and not name_filter(name):
+                if sampled:
+                    filter_time += clock() - begin
+                continue
+
+            if sampled:
+                stat_begin = clock()
+                filter_time += stat_begin - begin
+            try:
+                # Windows下属性来自目录枚举的缓存，无需再次访问文件
+                stat_info = entry.stat()
+            except OSError as e:
+                errors.append(e)
+                continue
+            if sampled:
+                begin = clock()
+                stat_time += begin - stat_begin
+
+            if stat_filter is not None and not stat_filter(stat_info.st_size, stat_info.st_ctime):
+                if sampled:
+                    filter_time += clock() - begin
+                continue
+            if sampled:
+                filter_time += clock() - begin
+
+            files.append((name, entry.path, stat_info.st_size, stat_info.st_ctime, stat_info.st_mtime))
+
+    if timed:
+        stats.sample_phase = (sample_phase + examined) % STATS_SAMPLE_INTERVAL
+        stat_time *= STATS_SAMPLE_INTERVAL
+        filter_time *= STATS_SAMPLE_INTERVAL
+        total = clock() - start
+        # 估算值可能略大于实际耗时，枚举目录的时间不小于0
+        stats.add_directory(examined, max(0.0, total - stat_time - filter_time), stat_time, filter_time)
+    return files, subdirs, errors
+
+
+def scan_files(folder, name_filter=None, onerror=None, cancel_event=None, stat_filter=None, max_depth=None,
+               breadth_first=False, max_pending=MAX_PENDING_DIRS, on_directory=None, stats=None):
+    """基于os.scandir遍历文件夹，直接复用DirEntry缓存的属性信息
+
+    默认遍历顺序与os.walk(自顶向下)一致，符号链接目录不会进入。
+    每个匹配的文件生成一个元组: (文件名, 文件路径, 大小(字节), 创建时间戳, 修改时间戳)
+
+    name_filter: 可选，按文件名预先筛选的函数，不匹配的文件不会读取属性
+    stat_filter: 可选，按 (大小, 创建时间戳) 筛选的函数，在文件名匹配后调用
+    onerror: 可选，目录无法访问或属性读取失败时调用，参数为OSError
+    cancel_event: 可选，threading.Event，设置后遍历会尽快停止
+    max_depth: 可选，最大目录深度，0表示只枚举folder本身，1表示再包括直接子目录，依此类推
+    breadth_first: 为True时按层遍历，浅层目录中的文件先生成；等待枚举的目录超过max_pending个时，
+        新发现的子目录立即深度优先遍历，因此非常宽的目录树也只占用有限的内存
+    on_directory: 可选，每枚举完一个目录、生成其中的文件之前调用，
+        参数为 (目录路径, 文件列表, 子目录路径列表)，用于记录目录树的结构
+    stats: 可选，SearchStats，记录枚举的目录和文件数以及各阶段的耗时
+    """
+    if breadth_first:
+        yield from scan_files_breadth_first(folder, name_filter, onerror, cancel_event, stat_filter,
+                                            max_depth, max_pending, on_directory, stats)
+        return
+
+    # 使用显式栈代替递归，避免深层目录导致递归过深；栈中同时保存目录深度
+    stack = [(folder, 0)]
+    while stack:
+        current, depth = stack.pop()
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        files, subdirs, errors = scan_directory(current, name_filter, cancel_event, stat_filter=stat_filter,
+                                                stats=stats)
+        if onerror is not None:
+            for e in errors:
+                onerror(e)
+        if on_directory is not None:
+            on_directory(current, files, [path for path, _ in subdirs])
+        yield from files
+
+        # 逆序入栈，保证子目录按枚举顺序依次处理
+        if max_depth is None or depth < max_depth:
+            stack.extend((path, depth + 1) for path, _ in reversed(subdirs))
+
+
+def scan_files_breadth_first(folder, name_filter=None, onerror=None, cancel_event=None, stat_filter=None,
+                             max_depth=None, max_pending=MAX_PENDING_DIRS, on_directory=None, stats=None):
+    """按层遍历文件夹，参数与scan_files相同，队列已满时溢出的子目录深度优先遍历"""
+    frontier = deque([(folder, 0)])
+    while frontier:
+        current, depth = frontier.popleft()
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        files, subdirs, errors = scan_directory(current, name_filter, cancel_event, stat_filter=stat_filter,
+                                                stats=stats)
+        if onerror is not None:
+            for e in errors:
+                onerror(e)
+        if on_directory is not None:
+            on_directory(current, files, [path for path, _ in subdirs])
+        yield from files
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for path, _ in subdirs:
+            if len(frontier) < max_pending:
+                frontier.append((path, depth + 1))
+            else:
+                yield from scan_files(path, name_filter, onerror, cancel_event, stat_filter,
+                                      None if max_depth is None else max_depth - depth - 1,
+                                      on_directory=on_directory, stats=stats)
+
+
+def parallel_scan_files(folder, workers=4, name_filter=None, onerror=None, cancel_event=None,
+                        follow_links=False, stat_filter=None, max_depth=None, breadth_first=False,
+                        max_pending=MAX_PENDING_DIRS, on_directory=None, stats=None):
+    """使用线程池并行枚举子目录，适用于网络共享等目录访问延迟较高的场景
+
+    每个目录的枚举和属性读取在线程池中完成，结果按与scan_files相同的顺序生成，
+    因此多次搜索的结果顺序是确定的。follow_links为True时会进入符号链接目录，
+    并按(st_dev, st_ino)跳过已访问的目录，避免链接循环导致重复遍历。
+    name_filter和stat_filter会在工作线程中调用，必须是线程安全的；onerror在调用方线程中调用。
+    max_depth、breadth_first、max_pending、on_directory和stats的含义与scan_files相同，on_directory在调用方线程中调用。
+    """
+    visited = set()
+    if follow_links:
+        try:
+            root_stat = os.stat(folder)
+            visited.add((root_stat.st_dev, root_stat.st_ino))
+        except OSError:
+            pass
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan")
+    prefetch = max(1, workers) * PREFETCH_PER_WORKER
+    try:
+        def submit(path):
+            return executor.submit(scan_directory, path, name_filter, cancel_event, follow_links, stat_filter, stats)
+
+        def child_dirs(subdirs, depth):
+            """需要继续遍历的子目录，跳过超过深度限制和已访问的目录"""
+            if max_depth is not None and depth >= max_depth:
+                return
+            for path, key in subdirs:
+                if key is not None:
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                yield path
+
+        def result(future, path):
+            files, subdirs, errors = future.result()
+            if onerror is not None:
+                for e in errors:
+                    onerror(e)
+            if on_directory is not None:
+                on_directory(path, files, [subdir for subdir, _ in subdirs])
+            return files, subdirs
+
+        def depth_first(stack):
+            # 栈中保存目录任务（尚未提交时为None）、目录路径和深度，出栈顺序即深度优先的先序顺序
+            in_flight = 0
+            while stack:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+
+                # 从栈顶开始提前提交接下来要取出的目录，让工作线程在消费当前结果时并行枚举；
+                # 已提交的任务最多prefetch个，因此最多检查2 x prefetch个栈顶元素
+                for item in reversed(stack):
+                    if in_flight >= prefetch:
+                        break
+                    if item[0] is None:
+                        item[0] = submit(item[1])
+                        in_flight += 1
+
+                future, path, depth = stack.pop()
+                if future is None:
+                    # 提前提交的任务都在栈的较深处，当前目录直接提交并等待
+                    future = submit(path)
+                else:
+                    in_flight -= 1
+                files, subdirs = result(future, path)
+                stack.extend([[None, subdir, depth + 1] for subdir in reversed(list(child_dirs(subdirs, depth)))])
+
+                yield from files
+
+        if not breadth_first:
+            yield from depth_first([[None, folder, 0]])
+            return
+
+        # 队列中保存目录任务（尚未提交时为None）、目录路径和深度，按层的顺序取出；
+        # 只提前提交队首的prefetch个目录，已提交的目录总是位于队首，其余目录只保存路径
+        frontier = deque([[None, folder, 0]])
+        in_flight = 0
+        while frontier:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+
+            for i in range(in_flight, min(prefetch, len(frontier))):
+                frontier[i][0] = submit(frontier[i][1])
+                in_flight += 1
+
+            future, path, depth = frontier.popleft()
+            in_flight -= 1
+            files, subdirs = result(future, path)
+            yield from files
+
+            for subdir in child_dirs(subdirs, depth):
+                if len(frontier) < max_pending:
+                    frontier.append([None, subdir, depth + 1])
+                else:
+                    yield from depth_first([[None, subdir, depth + 1]])
+    finally:
+        # 提前结束（取消或调用方停止迭代）时丢弃尚未开始的任务
+        executor.shutdown(wait=False, cancel_futures=True)
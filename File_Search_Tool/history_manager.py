@@ -1,207 +1,340 @@
+import atexit
 import json
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from file_types import FILE_TYPE_CODES
+from name_query import NAME_MODE_SUBSTRING
+from search_engine import DATE_SOURCE_CTIME
+from search_log import SearchLog, read_first_line, read_log_records_from
+
+# 日志中的文件类型缩写到中文名称的映射
+FILE_TYPE_NAMES = {code: name for name, code in FILE_TYPE_CODES.items()}
+
+# 默认保留的历史记录数量
+DEFAULT_MAX_HISTORY = 20
+
+# 修改历史记录后延迟保存的秒数，连续的修改只写入一次
+SAVE_DELAY = 2.0
+
+
+def history_key(search_criteria):
+    """把搜索条件规范化为用于去重的元组：文件夹、日期范围和日期依据、文件类型、大小范围、文件名查询"""
+    # 同时搜索多个文件夹时按去重后的文件夹列表比较
+    folders = search_criteria.get('roots') or [search_criteria.get('folder') or '']
+    folder = ';'.join(os.path.normcase(os.path.normpath(f)) if f else '' for f in folders)
+    sizes = []
+    for field, default in (('size_min', 0), ('size_max', float('inf'))):
+        value = search_criteria.get(field)
+        # 旧版本可能把不限制记录为空白字符串
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            sizes.append(float(default if value in (None, '', '不限制') else value))
+        except (TypeError, ValueError):
+            sizes.append(value)
+    # 旧版本的记录没有date_source，均按创建时间搜索
+    # 旧版本的记录没有文件名查询
+    name_query = search_criteria.get('name_query') or ''
+    name_mode = (search_criteria.get('name_mode') or NAME_MODE_SUBSTRING) if name_query else ''
+    return (folder, search_criteria.get('date_from'), search_criteria.get('date_to'),
+            search_criteria.get('date_source') or DATE_SOURCE_CTIME,
+            search_criteria.get('file_type'), sizes[0], sizes[1], name_query, name_mode)
+
+
+def write_json_atomic(path, data):
+    """先写入临时文件再替换目标文件，写入中断时原文件保持完整"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'), default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
 class HistoryManager:
-    def __init__(self, history_file="search_history.json", log_folder="search_logs"):
+    def __init__(self, history_file="search_history.json", log_folder="search_logs", max_history=DEFAULT_MAX_HISTORY):
         self.history_file = history_file
         self.log_folder = log_folder
-        self.history = self.load_history()
-        # 从日志文件加载历史记录
-        self.load_history_from_logs()
-    
+        self.max_history = max(1, max_history)
+        # 已导入到历史记录的日志位置，保存在历史记录文件旁边
+        self.watermark_file = os.path.splitext(history_file)[0] + "_watermark.json"
+        # 日志在后台线程中导入，与界面线程对历史记录的修改互斥
+        self.lock = threading.Lock()
+        # 规范化的搜索条件 -> 历史记录，按从旧到新排列，最新的记录在末尾
+        self.entries = OrderedDict()
+        # 延迟保存的定时器和是否有未保存的修改
+        self.save_timer = None
+        self.dirty = False
+        # 启动时的日志导入是否已完成，以及导入期间本进程是否写入过日志
+        self.logs_imported = False
+        self.logged_during_import = False
+        # 启动时只读取历史记录文件，日志由load_history_from_logs在后台增量导入
+        for search_criteria in reversed(self.load_history()):
+            self.add_entry(search_criteria)
+        # 程序退出时写入尚未保存的修改
+        atexit.register(self.flush)
+
     def load_history(self):
-        """加载历史搜索记录"""
+        """加载历史搜索记录，文件中按从新到旧排列"""
         try:
             if os.path.exists(self.history_file):
                 with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    history = json.load(f)
+                return [item for item in history if isinstance(item, dict)] if isinstance(history, list) else []
             else:
                 return []
         except Exception as e:
             print(f"加载历史记录失败: {e}")
             return []
-    
-    def save_history(self):
-        """保存历史搜索记录"""
+
+    def load_watermark(self):
+        """读取上次导入到的日志位置，格式为 {"first_line": 日志文件第一行, "offset": 字节位置}"""
+        try:
+            with open(self.watermark_file, 'r', encoding='utf-8') as f:
+                watermark = json.load(f)
+            if isinstance(watermark, dict):
+                return watermark
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def save_watermark(self, watermark):
+        """保存已导入到的日志位置"""
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2, default=str)
+            write_json_atomic(self.watermark_file, watermark)
         except Exception as e:
-            print(f"保存历史记录失败: {e}")
-    
+            print(f"保存日志导入位置失败: {e}")
+
+    def add_entry(self, search_criteria):
+        """把记录作为最新的历史记录，相同搜索条件的旧记录被替换
+
+        调用方需持有锁（初始化时除外）。
+        """
+        key = history_key(search_criteria)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        self.entries[key] = search_criteria
+
+        # 超出保留数量时丢弃最旧的记录
+        while len(self.entries) > self.max_history:
+            self.entries.popitem(last=False)
+
+    def merge_entries(self, imported):
+        """把从日志导入的记录按时间戳插入历史记录，返回添加的记录数
+
+        已存在的搜索条件保持不变；导入的记录比本次运行中的搜索更早时排在它们之后，
+        超出保留数量时仍从最旧的一端丢弃，不会挤掉较新的记录。调用方需持有锁。
+        """
+        # 同一搜索条件在日志中出现多次时只保留最新的一次
+        new = OrderedDict()
+        for search_criteria in imported:
+            key = history_key(search_criteria)
+            if key not in self.entries:
+                new.pop(key, None)
+                new[key] = search_criteria
+        if not new:
+            return 0
+        new = sorted(new.items(), key=lambda item: str(item[1].get('timestamp', '')))
+
+        # 已有记录的顺序不变，没有时间戳的记录（旧版本）沿用前一条记录的时间
+        merged = OrderedDict()
+        i = 0
+        last = ''
+        for key, search_criteria in self.entries.items():
+            last = str(search_criteria.get('timestamp') or last)
+            while i < len(new) and str(new[i][1].get('timestamp', '')) < last:
+                merged[new[i][0]] = new[i][1]
+                i += 1
+            merged[key] = search_criteria
+        merged.update(new[i:])
+
+        # 超出保留数量时丢弃最旧的记录
+        while len(merged) > self.max_history:
+            merged.popitem(last=False)
+        added = sum(1 for key in merged if key not in self.entries)
+        self.entries = merged
+        return added
+
+    def save_history(self):
+        """保存历史搜索记录"""
+        with self.lock:
+            history = self.get_history()
+            self.dirty = False
+            try:
+                write_json_atomic(self.history_file, history)
+            except Exception as e:
+                print(f"保存历史记录失败: {e}")
+
+    def schedule_save(self):
+        """标记有未保存的修改，延迟SAVE_DELAY秒后保存，期间的修改合并为一次写入"""
+        self.dirty = True
+        if self.save_timer is not None:
+            self.save_timer.cancel()
+        self.save_timer = threading.Timer(SAVE_DELAY, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+
+    def flush(self):
+        """立即保存尚未写入的修改，程序退出前调用"""
+        if self.save_timer is not None:
+            self.save_timer.cancel()
+            self.save_timer = None
+        if self.dirty:
+            self.save_history()
+
     def add_search_history(self, search_criteria):
         """添加搜索记录到历史"""
         # 为每条记录添加时间戳
         search_criteria['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 检查是否存在重复记录（基于主要搜索条件）
-        for item in self.history:
-            # 比较主要搜索条件
-            if (item.get('folder') == search_criteria.get('folder') and
-                item.get('date_from') == search_criteria.get('date_from') and
-                item.get('date_to') == search_criteria.get('date_to') and
-                item.get('file_type') == search_criteria.get('file_type') and
-                item.get('size_min') == search_criteria.get('size_min') and
-                item.get('size_max') == search_criteria.get('size_max')):
-                # 如果存在重复，先删除旧记录
-                self.history.remove(item)
-                break
-        
-        # 将新记录添加到历史列表开头
-        self.history.insert(0, search_criteria)
-        
-        # 限制历史记录数量，只保留最近20条
-        if len(self.history) > 20:
-            self.history = self.history[:20]
-        
-        # 保存到文件
-        self.save_history()
-    
+
+        with self.lock:
+            self.add_entry(search_criteria)
+            self.schedule_save()
+
     def get_history(self):
-        """获取历史搜索记录"""
-        return self.history
-    
+        """获取历史搜索记录，按从新到旧排列"""
+        return list(reversed(self.entries.values()))
+
     def clear_history(self):
         """清空历史搜索记录"""
-        self.history = []
-        self.save_history()
-    
+        with self.lock:
+            self.entries.clear()
+            self.schedule_save()
+
     def delete_history(self, index):
-        """删除特定的历史搜索记录"""
-        if 0 <= index < len(self.history):
-            del self.history[index]
-            self.save_history()
-    
+        """删除特定的历史搜索记录，index为get_history返回列表中的位置"""
+        with self.lock:
+            if 0 <= index < len(self.entries):
+                key = list(self.entries)[len(self.entries) - 1 - index]
+                del self.entries[key]
+                self.schedule_save()
+
     def load_history_from_logs(self):
-        """从日志文件加载历史搜索记录"""
+        """导入上次导入位置之后新增的搜索日志（只使用成功的搜索），返回导入的记录数
+
+        可以在后台线程中调用。日志轮转只会重命名文件，按第一行找到上次导入的文件后，
+        从记录的位置继续读取，再读取之后轮转出的较新文件，不会重新解析已导入的日志。
+        """
         try:
             # 检查日志文件夹是否存在
             if not os.path.exists(self.log_folder):
+                return 0
+
+            pending = self.pending_log_files(SearchLog(self.log_folder).log_files(), self.load_watermark())
+            if not pending:
+                return 0
+
+            # 按从旧到新的顺序读取日志
+            entries = []
+            watermark = None
+            for path, first_line, offset in pending:
+                records, offset = read_log_records_from(path, offset)
+                for record in records:
+                    search_criteria = self.history_from_log_record(record)
+                    if search_criteria is not None:
+                        entries.append(search_criteria)
+                if first_line:
+                    watermark = {'first_line': first_line, 'offset': offset}
+
+            with self.lock:
+                # 按时间戳插入，已存在的搜索条件不重复添加
+                added = self.merge_entries(entries)
+                if added:
+                    self.schedule_save()
+
+            if watermark is not None:
+                self.save_watermark(watermark)
+            return len(entries)
+
+        except Exception as e:
+            print(f"从日志加载历史记录失败: {e}")
+            return 0
+        finally:
+            with self.lock:
+                self.logs_imported = True
+                logged = self.logged_during_import
+            # 导入期间本进程写入的日志对应的搜索已经在历史记录中
+            if logged:
+                self.save_log_end()
+
+    def log_written(self):
+        """本进程写入一条搜索日志后调用，把导入位置移到日志末尾
+
+        本进程的成功搜索已经直接加入历史记录，下次启动时不需要再从日志导入；
+        否则删除或清空的历史记录会在重新启动后从日志中恢复。启动时的导入尚未完成时，等导入结束后再移动。
+        """
+        with self.lock:
+            if not self.logs_imported:
+                self.logged_during_import = True
                 return
-            
-            # 安全获取日志文件夹中的所有txt文件
-            log_files = []
-            try:
-                log_files = [f for f in os.listdir(self.log_folder) if f.endswith('.txt')]
-            except PermissionError:
-                print(f"没有权限访问日志文件夹: {self.log_folder}")
-                return
-            except Exception as e:
-                print(f"读取日志文件夹失败: {e}")
-                return
-            
-            # 按修改时间排序，从最新到最旧
-            try:
-                log_files.sort(key=lambda x: os.path.getmtime(os.path.join(self.log_folder, x)), reverse=True)
-            except Exception as e:
-                print(f"排序日志文件失败: {e}")
-                # 无法排序时，使用默认顺序
-                pass
-            
-            # 解析每个日志文件
-            for log_file in log_files:
-                log_path = os.path.join(self.log_folder, log_file)
-                
+        self.save_log_end()
+
+    def save_log_end(self):
+        """把导入位置保存为当前日志文件的末尾"""
+        log_files = SearchLog(self.log_folder).log_files()
+        if not log_files:
+            return
+        first_line = read_first_line(log_files[0])
+        try:
+            offset = os.path.getsize(log_files[0])
+        except OSError:
+            return
+        if first_line:
+            self.save_watermark({'first_line': first_line, 'offset': offset})
+
+    def pending_log_files(self, log_files, watermark):
+        """返回需要导入的日志 [(文件路径, 第一行, 起始位置)]，按从旧到新排列
+
+        log_files按从新到旧排列。找不到上次导入的文件（首次运行或该文件已被轮转删除）时导入全部文件。
+        """
+        pending = []
+        for path in log_files:
+            first_line = read_first_line(path)
+            if watermark and first_line and first_line == watermark.get('first_line'):
+                offset = watermark.get('offset', 0)
                 try:
-                    # 读取日志文件内容
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        content = f.readlines()
-                    
-                    # 解析日志内容
-                    search_criteria = {}
-                    timestamp = None
-                    
-                    for line in content:
-                        line = line.strip()
-                        
-                        # 提取搜索时间（支持中英文格式）
-                        if line.startswith('Search Log - ') or line.startswith('搜索日志 - '):
-                            timestamp = line[11:].strip() if line.startswith('Search Log - ') else line[6:].strip()
-                        # 提取搜索文件夹（支持中英文格式）
-                        elif line.startswith('Search Folder:') or line.startswith('搜索文件夹:'):
-                            search_criteria['folder'] = line[14:].strip() if line.startswith('Search Folder:') else line[5:].strip()
-                        # 提取日期范围（支持中英文格式）
-                        elif line.startswith('Date Range:') or line.startswith('日期范围:'):
-                            date_range = line[12:].strip() if line.startswith('Date Range:') else line[5:].strip()
-                            # 支持中英文分隔符
-                            if 'to' in date_range:
-                                date_from, date_to = date_range.split('to', 1)
-                                search_criteria['date_from'] = date_from.strip()
-                                search_criteria['date_to'] = date_to.strip()
-                            elif '至' in date_range:
-                                date_from, date_to = date_range.split('至', 1)
-                                search_criteria['date_from'] = date_from.strip()
-                                search_criteria['date_to'] = date_to.strip()
-                        # 提取文件类型（支持中英文格式）
-                        elif line.startswith('File Type:') or line.startswith('文件类型:'):
-                            search_criteria['file_type'] = line[10:].strip() if line.startswith('File Type:') else line[5:].strip()
-                        # 提取大小范围（支持中英文格式）
-                        elif line.startswith('Size Range:') or line.startswith('大小范围:'):
-                            size_range = line[11:].strip() if line.startswith('Size Range:') else line[5:].strip()
-                            # 支持中英文分隔符
-                            if 'to' in size_range:
-                                size_min_str, size_max_str = size_range.split('to', 1)
-                                size_min = size_min_str.replace('KB', '').strip()
-                                size_max = size_max_str.replace('KB', '').strip()
-                            elif '至' in size_range:
-                                size_min_str, size_max_str = size_range.split('至', 1)
-                                size_min = size_min_str.replace('KB', '').strip()
-                                size_max = size_max_str.replace('KB', '').strip()
-                            else:
-                                continue
-                                
-                            # 转换大小为数字
-                            try:
-                                search_criteria['size_min'] = float(size_min) if size_min != '0' else 0
-                            except:
-                                search_criteria['size_min'] = 0
-                            
-                            if size_max == 'Unlimited' or size_max == '不限制':
-                                search_criteria['size_max'] = float('inf')
-                            else:
-                                try:
-                                    search_criteria['size_max'] = float(size_max)
-                                except:
-                                    search_criteria['size_max'] = float('inf')
-                    
-                    # 如果提取到了必要的搜索条件
-                    if search_criteria and timestamp:
-                        # 添加时间戳
-                        search_criteria['timestamp'] = timestamp
-                        
-                        # 确保所有必要字段都存在
-                        if all(key in search_criteria for key in ['folder', 'date_from', 'date_to', 'file_type', 'size_min', 'size_max', 'timestamp']):
-                            # 检查是否存在重复记录（基于主要搜索条件）
-                            is_duplicate = False
-                            for item in self.history:
-                                if (item.get('folder') == search_criteria.get('folder') and
-                                    item.get('date_from') == search_criteria.get('date_from') and
-                                    item.get('date_to') == search_criteria.get('date_to') and
-                                    item.get('file_type') == search_criteria.get('file_type') and
-                                    item.get('size_min') == search_criteria.get('size_min') and
-                                    item.get('size_max') == search_criteria.get('size_max')):
-                                    is_duplicate = True
-                                    break
-                            
-                            # 如果不是重复记录，则添加到历史列表
-                            if not is_duplicate:
-                                # 将新记录添加到历史列表开头
-                                self.history.insert(0, search_criteria)
-                                
-                                # 限制历史记录数量，只保留最近20条
-                                if len(self.history) > 20:
-                                    self.history = self.history[:20]
-                
-                except PermissionError:
-                    print(f"没有权限读取日志文件: {log_file}")
-                    continue
-                except Exception as e:
-                    print(f"解析日志文件 {log_file} 失败: {e}")
+                    # 文件比记录的位置还短，说明内容被替换过，从头读取
+                    if not isinstance(offset, int) or offset > os.path.getsize(path):
+                        offset = 0
+                except OSError:
                     continue
-            
-            # 保存更新后的历史记录
-            self.save_history()
-            
-        except Exception as e:
-            print(f"从日志加载历史记录失败: {e}")
+                pending.append((path, first_line, offset))
+                break
+            pending.append((path, first_line, 0))
+        pending.reverse()
+        return pending
+
+    def history_from_log_record(self, record):
+        """把一条成功的搜索日志转换为历史记录，失败的搜索或字段不全时返回None"""
+        if record.get('st') != 'S':
+            return None
+        if not all(key in record for key in ['ts', 'folder', 'date_from', 'date_to', 'type']):
+            return None
+
+        # 日志时间戳格式为YYYYMMDD_HHMMSS，历史记录使用标准日期时间格式
+        try:
+            timestamp = datetime.strptime(record['ts'], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return None
+
+        size_max = record.get('size_max')
+        history = {
+            'folder': record['folder'],
+            'date_from': record['date_from'],
+            'date_to': record['date_to'],
+            'date_source': record.get('date_source') or DATE_SOURCE_CTIME,
+            # 日志中保存的是文件类型缩写，转换回中文名称
+            'file_type': FILE_TYPE_NAMES.get(record['type'], record['type']),
+            'size_min': record.get('size_min') or 0,
+            'size_max': float('inf') if size_max is None else size_max,
+            'timestamp': timestamp
+        }
+        if record.get('name'):
+            history['name_query'] = record['name']
+            history['name_mode'] = record.get('name_mode') or NAME_MODE_SUBSTRING
+        if record.get('roots'):
+            history['roots'] = record['roots']
+        return history
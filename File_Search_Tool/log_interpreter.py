@@ -1,7 +1,15 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import glob
+
+from file_types import FILE_TYPE_CODES
+from name_query import NAME_MODE_NAMES, NAME_MODE_SUBSTRING
+from search_engine import DATE_SOURCE_CTIME, STOP_REASON_NAMES
+from search_log import SearchLog, read_log_records, read_log_records_reversed, parse_legacy_log
+from search_stats import format_stats
+
+# 日志列表每次加载的记录数，从最新的记录开始，需要时再加载更早的记录
+LOG_PAGE_SIZE = 200
 
 # 日志缩写映射
 LOG_MAPPINGS = {
@@ -11,18 +19,14 @@ LOG_MAPPINGS = {
         "F": "失败"
     },
     # 文件类型映射
-    "file_type": {
-        "all_files": "所有文件",
-        "all_images": "所有图片",
-        "jpeg": "JPEG格式",
-        "png": "PNG格式",
-        "tiff": "TIFF格式",
-        "raw": "RAW格式",
-        "psd": "PSD格式",
-        "dng": "DNG格式",
-        "video": "视频文件",
-        "archive": "压缩文件"
-    }
+    "file_type": {code: name for name, code in FILE_TYPE_CODES.items()},
+    # 日期依据映射
+    "date_source": {
+        "ctime": "创建时间",
+        "exif": "EXIF拍摄时间"
+    },
+    # 文件名匹配方式映射
+    "name_mode": NAME_MODE_NAMES
 }
 
 class LogInterpreter:
@@ -35,6 +39,8 @@ class LogInterpreter:
         # 设置全局变量
         self.current_logs = []
         self.log_folder = "search_logs"
+        # 尚未加载到列表中的更早的记录，逐个生成 (日志文件, 记录)
+        self.older_logs = None
         
         # 创建主界面
         self.create_widgets()
@@ -60,8 +66,13 @@ class LogInterpreter:
         # 清除按钮
         ttk.Button(top_frame, text="清除当前列表", command=self.clear_log_list).pack(side=tk.LEFT, padx=5)
         
-        # 日志文件列表
-        list_frame = ttk.LabelFrame(main_frame, text="日志文件列表")
+        # 加载更早的记录按钮
+        self.more_button = ttk.Button(top_frame, text="加载更早的记录", command=self.load_more_logs,
+                                      state=tk.DISABLED)
+        self.more_button.pack(side=tk.LEFT, padx=5)
+        
+        # 日志记录列表
+        list_frame = ttk.LabelFrame(main_frame, text="日志记录列表")
         list_frame.pack(fill=tk.X, pady=5)
         
         # 创建列表框
@@ -93,35 +104,84 @@ class LogInterpreter:
         self.refresh_log_list()
     
     def refresh_log_list(self):
-        """刷新日志文件列表"""
+        """刷新日志记录列表"""
         # 清空列表
         self.log_listbox.delete(0, tk.END)
+        self.current_logs = []
+        self.older_logs = None
+        self.more_button['state'] = tk.DISABLED
         
         # 检查日志文件夹是否存在
         if not os.path.exists(self.log_folder):
             return
         
-        # 获取所有日志文件
-        log_files = glob.glob(os.path.join(self.log_folder, "*.txt"))
-        
-        # 按修改时间排序，最新的在最上面
-        log_files.sort(key=os.path.getmtime, reverse=True)
+        # 从每个日志文件的末尾向前读取，最新的在最上面，只加载第一页
+        def newest_first(log_files):
+            for log_file in log_files:
+                for record in read_log_records_reversed(log_file):
+                    yield log_file, record
         
-        # 添加到列表
-        for log_file in log_files:
-            # 只显示文件名，不显示完整路径
-            self.log_listbox.insert(tk.END, os.path.basename(log_file))
+        self.older_logs = newest_first(SearchLog(self.log_folder).log_files())
+        self.load_more_logs()
+    
+    def load_more_logs(self):
+        """加载下一页更早的日志记录"""
+        if self.older_logs is None:
+            return
+        page = []
+        for item in self.older_logs:
+            page.append(item)
+            if len(page) >= LOG_PAGE_SIZE:
+                break
+        for log_path, record in page:
+            self.add_log_records(log_path, [record])
+        # 不满一页时已经读完
+        if len(page) < LOG_PAGE_SIZE:
+            self.older_logs = None
+        self.more_button['state'] = tk.NORMAL if self.older_logs is not None else tk.DISABLED
+    
+    def add_log_records(self, log_path, records):
+        """把日志记录添加到列表"""
+        for record in records:
+            self.current_logs.append((log_path, record))
+            status_text = LOG_MAPPINGS["status"].get(record.get('st'), record.get('st', ''))
+            self.log_listbox.insert(tk.END, f"{self.format_timestamp(record.get('ts', ''))}  "
+                                            f"{status_text}  {record.get('folder', '')}")
+    
+    def load_log_file(self, log_path):
+        """读取日志文件，支持JSON Lines日志和旧版本的单文件.txt日志"""
+        if log_path.endswith('.jsonl'):
+            return list(read_log_records(log_path))
+        with open(log_path, 'r', encoding='utf-8') as f:
+            record = parse_legacy_log(f.read())
+        return [record] if record else []
     
     def select_single_log(self):
         """选择单个日志文件"""
         # 打开文件选择对话框
         log_file = filedialog.askopenfilename(
             title="选择日志文件",
-            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+            filetypes=[("日志文件", "*.jsonl *.txt"), ("所有文件", "*.*")]
         )
         
-        if log_file:
-            self.interpret_log(log_file)
+        if not log_file:
+            return
+        
+        try:
+            records = self.load_log_file(log_file)
+        except Exception as e:
+            messagebox.showerror("错误", f"解析日志文件失败: {e}")
+            return
+        
+        if not records:
+            messagebox.showerror("错误", "日志格式不正确")
+            return
+        
+        # 只显示所选文件中的记录，最新的在最上面
+        records.reverse()
+        self.clear_log_list()
+        self.add_log_records(log_file, records)
+        self.interpret_log(log_file, records[0])
     
     def import_log_folder(self):
         """导入日志文件夹"""
@@ -133,49 +193,44 @@ class LogInterpreter:
             self.refresh_log_list()
     
     def on_log_select(self, event):
-        """选择日志文件时触发"""
-        # 获取选中的日志文件名
+        """选择日志记录时触发"""
+        # 获取选中的日志记录
         selected_index = self.log_listbox.curselection()
         if selected_index:
-            log_filename = self.log_listbox.get(selected_index)
-            log_path = os.path.join(self.log_folder, log_filename)
-            self.interpret_log(log_path)
+            log_path, record = self.current_logs[selected_index[0]]
+            self.interpret_log(log_path, record)
     
-    def interpret_log(self, log_path):
-        """解释日志文件"""
+    def interpret_log(self, log_path, record):
+        """解释一条日志记录"""
         try:
-            # 读取日志文件
-            with open(log_path, 'r', encoding='utf-8') as f:
-                log_content = f.read().strip()
-            
-            # 解析日志内容
-            log_parts = log_content.split(',')
-            
-            if len(log_parts) < 9:
-                messagebox.showerror("错误", "日志格式不正确")
-                return
-            
             # 提取日志字段
-            timestamp = log_parts[0]
-            status = log_parts[1]
-            folder = log_parts[2]
-            date_from = log_parts[3]
-            date_to = log_parts[4]
-            file_type = log_parts[5]
-            size_min = log_parts[6]
-            size_max = log_parts[7]
-            result = ','.join(log_parts[8:])
+            timestamp = record.get('ts', '')
+            status = record.get('st', '')
+            folder = record.get('folder', '')
+            # 同时搜索多个文件夹时显示去掉重复和嵌套后实际搜索的文件夹
+            roots = record.get('roots')
+            if roots:
+                folder = "；".join(roots)
+            date_from = record.get('date_from', '')
+            date_to = record.get('date_to', '')
+            # 旧日志没有date_source字段，均按创建时间搜索
+            date_source = record.get('date_source') or DATE_SOURCE_CTIME
+            file_type = record.get('type', '')
+            size_min = record.get('size_min', 0)
+            size_max = record.get('size_max')
             
             # 转换缩写
             status_text = LOG_MAPPINGS["status"].get(status, status)
             file_type_text = LOG_MAPPINGS["file_type"].get(file_type, file_type)
             
             # 格式化结果显示
-            formatted_result = self.format_result(status, result)
+            formatted_result = self.format_result(record)
             
             # 格式化大小范围显示
-            if size_min == '0' and size_max == '':
+            if not size_min and size_max is None:
                 size_range = "无限制"
+            elif size_max is None:
+                size_range = f"{size_min} KB 至 不限制"
             else:
                 size_range = f"{size_min} KB 至 {size_max} KB"
             
@@ -187,19 +242,29 @@ class LogInterpreter:
                 f"搜索时间: {self.format_timestamp(timestamp)}",
                 f"搜索状态: {status} ({status_text})",
                 f"搜索文件夹: {folder if folder else '未指定'}",
-                f"日期范围: {date_from} 至 {date_to}",
+                f"日期范围: {date_from} 至 {date_to} "
+                f"({LOG_MAPPINGS['date_source'].get(date_source, date_source)})",
                 f"文件类型: {file_type} ({file_type_text})",
+                f"文件名: {self.format_name_query(record)}",
                 f"大小范围: {size_range}",
+                f"搜索限制: {self.format_limits(record)}",
                 f"搜索结果: {formatted_result}",
                 "=" * 50
             ]
             
+            # 记录了各阶段耗时的日志显示性能统计，旧日志没有这个字段
+            stats = record.get('stats')
+            if stats:
+                detail_info.append("性能统计:")
+                detail_info.extend(f"  {line}" for line in format_stats(stats))
+                detail_info.append("=" * 50)
+            
             # 显示到文本框
             self.detail_text.delete(1.0, tk.END)
             self.detail_text.insert(tk.END, '\n'.join(detail_info))
             
         except Exception as e:
-            messagebox.showerror("错误", f"解析日志文件失败: {e}")
+            messagebox.showerror("错误", f"解析日志记录失败: {e}")
     
     def format_timestamp(self, timestamp):
         """格式化时间戳"""
@@ -215,23 +280,49 @@ class LogInterpreter:
                 return timestamp
         return timestamp
     
-    def format_result(self, status, result):
+    def format_name_query(self, record):
+        """格式化文件名查询，旧日志没有这个字段"""
+        name = record.get('name')
+        if not name:
+            return "不限制"
+        mode = record.get('name_mode') or NAME_MODE_SUBSTRING
+        return f"{name} ({LOG_MAPPINGS['name_mode'].get(mode, mode)})"
+    
+    def format_limits(self, record):
+        """格式化结果数量、时间和目录深度限制，旧日志没有这些字段"""
+        limits = []
+        if record.get('max_results') is not None:
+            limits.append(f"最多 {record['max_results']} 个文件")
+        if record.get('time_budget') is not None:
+            limits.append(f"最长 {record['time_budget']} 秒")
+        if record.get('max_depth') is not None:
+            limits.append(f"最多 {record['max_depth']} 层子目录")
+        return "，".join(limits) if limits else "无限制"
+    
+    def format_result(self, record):
         """格式化结果"""
-        if status == "S":
-            # 成功结果格式: 文件数,耗时
-            if ',' in result:
-                file_count, search_time = result.split(',', 1)
-                return f"成功找到 {file_count} 个文件，耗时 {search_time} 秒"
-            else:
+        if record.get('st') == "S":
+            # 成功结果: 文件数和耗时
+            if 'count' in record:
+                result = f"成功找到 {record['count']} 个文件，耗时 {record.get('time', 0)} 秒"
+                stop = record.get('stop')
+                if stop:
+                    result += f"（{STOP_REASON_NAMES.get(stop, stop)}，搜索提前结束）"
+                if record.get('refined'):
+                    result += "（在上一次搜索的结果中筛选）"
                 return result
+            return record.get('result', '')
         else:
             # 失败结果直接返回错误信息
-            return f"失败 - {result}"
+            return f"失败 - {record.get('error', '')}"
     
     def clear_log_list(self):
         """清除当前日志列表"""
         self.log_listbox.delete(0, tk.END)
         self.detail_text.delete(1.0, tk.END)
+        self.current_logs = []
+        self.older_logs = None
+        self.more_button['state'] = tk.DISABLED
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,324 @@
+import os
+import sqlite3
+import stat
+import time
+
+from file_types import file_extension
+from file_walker import scan_directory
+
+# 索引数据库结构：每个搜索根目录一条roots记录，目录和文件按根目录分组保存
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    refreshed REAL,
+    changed REAL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    root_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    path TEXT NOT NULL,
+    mtime REAL,
+    UNIQUE (root_id, path)
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent_id);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    ctime REAL NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir_id);
+CREATE INDEX IF NOT EXISTS files_ext ON files (ext);
+"""
+
+# 文件名的三字符片段索引：FTS5的trigram分词器（SQLite 3.34以上），按文件编号与files表关联，
+# 由触发器随files表同步更新；不需要按相关度排序，不保存列长度。不支持时按文件名逐个匹配
+NAME_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS file_names USING fts5(
+    name, content='files', content_rowid='id', tokenize='trigram', columnsize=0
+);
+CREATE TRIGGER IF NOT EXISTS file_names_insert AFTER INSERT ON files BEGIN
+    INSERT INTO file_names (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS file_names_delete AFTER DELETE ON files BEGIN
+    INSERT INTO file_names (file_names, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS file_names_update AFTER UPDATE OF name ON files BEGIN
+    INSERT INTO file_names (file_names, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO file_names (rowid, name) VALUES (new.id, new.name);
+END;
+"""
+
+# 文件名索引与files表一致时数据库的user_version；曾在不支持FTS5的环境中更新过索引时需要重建
+NAME_INDEX_VERSION = 1
+
+
+class MetadataIndex:
+    """按搜索根目录保存文件元数据（路径、大小、创建/修改时间、扩展名）的SQLite索引
+
+    同一文件夹的重复搜索（只修改日期、类型或大小条件）直接查询索引，无需重新遍历整个目录树。
+    刷新时只对每个已知目录做一次stat，仅重新枚举修改时间发生变化的目录。
+    注意：原地修改文件内容不会改变所在目录的修改时间，这类变化要等目录中有文件增删时才会更新。
+    """
+
+    def __init__(self, db_path="search_index.db"):
+        self.db_path = db_path
+        # 文件名的三字符片段索引是否可用，第一次打开数据库时确定
+        self.name_index = None
+
+    def connect(self):
+        """打开数据库连接，每个线程需要使用自己的连接"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        # 旧版本的索引没有changed列
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(roots)")]
+        if "changed" not in columns:
+            conn.execute("ALTER TABLE roots ADD COLUMN changed REAL")
+        self.name_index = self.prepare_name_index(conn)
+        return conn
+
+    def prepare_name_index(self, conn):
+        """创建文件名的三字符片段索引，返回是否可用
+
+        不支持FTS5或trigram分词器时删除同步触发器（否则无法写入files表），并标记为需要重建；
+        之后在支持的环境中打开时，从files表重建整个文件名索引。
+        """
+        try:
+            conn.executescript(NAME_INDEX_SCHEMA)
+        except sqlite3.OperationalError:
+            for trigger in ("file_names_insert", "file_names_delete", "file_names_update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("PRAGMA user_version = 0")
+            return False
+        if conn.execute("PRAGMA user_version").fetchone()[0] != NAME_INDEX_VERSION:
+            # 新建的文件名索引为空，已有的文件（旧版本的索引）需要补上
+            conn.execute("INSERT INTO file_names (file_names) VALUES ('rebuild')")
+            conn.execute(f"PRAGMA user_version = {NAME_INDEX_VERSION}")
+            conn.commit()
+        return True
+
+    def name_index_available(self):
+        """是否可以用三字符片段索引查找文件名"""
+        if self.name_index is None:
+            self.connect().close()
+        return self.name_index
+
+    def get_root_id(self, conn, root, create=False):
+        """获取根目录的编号，create为True时不存在则创建"""
+        row = conn.execute("SELECT id FROM roots WHERE path = ?", (root,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        root_id = conn.execute("INSERT INTO roots (path) VALUES (?)", (root,)).lastrowid
+        conn.commit()
+        return root_id
+
+    def is_indexed(self, root):
+        """根目录是否已经完成过至少一次完整刷新"""
+        root = os.path.abspath(root)
+        if not os.path.exists(self.db_path):
+            return False
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT refreshed FROM roots WHERE path = ?", (root,)).fetchone()
+            return bool(row and row[0])
+        finally:
+            conn.close()
+
+    def changed_time(self, root):
+        """根目录的索引内容最后一次发生变化的时间，从未刷新过时返回None
+
+        只在刷新时删除或重新枚举了目录才会更新，可用于判断基于索引生成的快照是否过期。
+        """
+        root = os.path.abspath(root)
+        if not os.path.exists(self.db_path):
+            return None
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT changed FROM roots WHERE path = ?", (root,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def refresh(self, root, onerror=None, cancel_event=None, on_progress=None):
+        """增量刷新根目录的索引，返回重新枚举的目录数
+
+        onerror: 可选，目录无法访问或属性读取失败时调用，参数为OSError
+        cancel_event: 可选，threading.Event，设置后尽快停止；已处理的目录会保存，下次刷新继续
+        on_progress: 可选，每枚举完一个目录调用一次，参数为该目录中的文件数
+        """
+        root = os.path.abspath(root)
+        conn = self.connect()
+        try:
+            root_id = self.get_root_id(conn, root, create=True)
+            # 根目录本身作为待枚举目录登记（首次刷新或根目录曾被删除时）
+            conn.execute("INSERT OR IGNORE INTO dirs (root_id, parent_id, path, mtime) VALUES (?, NULL, ?, NULL)",
+                         (root_id, root))
+
+            # 第一步：对所有已知目录做一次stat，找出已删除和修改时间变化的目录
+            pending = []
+            changed = False
+            known = conn.execute("SELECT id, path, mtime FROM dirs WHERE root_id = ?", (root_id,)).fetchall()
+            for dir_id, path, mtime in known:
+                if cancel_event is not None and cancel_event.is_set():
+                    return 0
+                try:
+                    dir_stat = os.stat(path)
+                except OSError:
+                    dir_stat = None
+                if dir_stat is None or not stat.S_ISDIR(dir_stat.st_mode):
+                    self.delete_dir_tree(conn, dir_id)
+                    changed = True
+                elif dir_stat.st_mtime != mtime:
+                    pending.append((dir_id, path))
+            conn.commit()
+
+            # 第二步：重新枚举变化的目录，新发现的子目录加入待处理列表
+            rescanned = 0
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    # 已处理的目录可能改变了索引内容
+                    self.mark_changed(conn, root_id, changed or rescanned)
+                    return rescanned
+                dir_id, path = pending.pop()
+                pending.extend(self.rescan_dir(conn, root_id, dir_id, path, onerror, cancel_event, on_progress))
+                # 每个目录单独提交，中途取消时已处理的目录不会丢失
+                conn.commit()
+                rescanned += 1
+
+            self.mark_changed(conn, root_id, changed or rescanned)
+            conn.execute("UPDATE roots SET refreshed = ? WHERE id = ?", (time.time(), root_id))
+            conn.commit()
+            return rescanned
+        finally:
+            conn.close()
+
+    def mark_changed(self, conn, root_id, changed):
+        """索引内容发生变化时记录变化时间"""
+        if changed:
+            conn.execute("UPDATE roots SET changed = ? WHERE id = ?", (time.time(), root_id))
+            conn.commit()
+
+    def rescan_dir(self, conn, root_id, dir_id, path, onerror=None, cancel_event=None, on_progress=None):
+        """重新枚举单个目录并与索引比较，返回新发现的子目录 [(目录编号, 路径)]"""
+        # 先记录目录修改时间，枚举期间发生的变化会在下次刷新时被发现
+        try:
+            dir_mtime = os.stat(path).st_mtime
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            return []
+
+        files, subdirs, errors = scan_directory(path, cancel_event=cancel_event)
+        listing_failed = False
+        for e in errors:
+            if e.filename == path:
+                listing_failed = True
+            if onerror is not None:
+                onerror(e)
+        if cancel_event is not None and cancel_event.is_set():
+            # 枚举不完整，保留原有记录，下次刷新时重新处理
+            return []
+        if on_progress is not None:
+            on_progress(len(files))
+
+        # 按文件名比较，只更新变化的记录，未变化的文件保持原有编号
+        existing = {}
+        for file_id, name, size, ctime, mtime in conn.execute(
+                "SELECT id, name, size, ctime, mtime FROM files WHERE dir_id = ?", (dir_id,)):
+            existing[name] = (file_id, size, ctime, mtime)
+
+        for name, _, size, ctime, mtime in files:
+            old = existing.pop(name, None)
+            if old is None:
+                conn.execute("INSERT INTO files (dir_id, name, ext, size, ctime, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                             (dir_id, name, file_extension(name), size, ctime, mtime))
+            elif old[1:] != (size, ctime, mtime):
+                conn.execute("UPDATE files SET size = ?, ctime = ?, mtime = ? WHERE id = ?",
+                             (size, ctime, mtime, old[0]))
+        if existing:
+            conn.executemany("DELETE FROM files WHERE id = ?", [(old[0],) for old in existing.values()])
+
+        # 比较子目录：删除已不存在的，登记新出现的（修改时间为空，表示尚未枚举）
+        children = dict(conn.execute("SELECT path, id FROM dirs WHERE parent_id = ?", (dir_id,)).fetchall())
+        new_dirs = []
+        for sub_path, _ in subdirs:
+            if children.pop(sub_path, None) is None:
+                sub_id = conn.execute("INSERT INTO dirs (root_id, parent_id, path, mtime) VALUES (?, ?, ?, NULL)",
+                                      (root_id, dir_id, sub_path)).lastrowid
+                new_dirs.append((sub_id, sub_path))
+        for child_id in children.values():
+            self.delete_dir_tree(conn, child_id)
+
+        # 枚举失败时不记录修改时间，下次刷新会重试
+        conn.execute("UPDATE dirs SET mtime = ? WHERE id = ?", (None if listing_failed else dir_mtime, dir_id))
+        return new_dirs
+
+    def delete_dir_tree(self, conn, dir_id):
+        """删除目录及其所有子目录和文件的记录"""
+        dir_ids = [row[0] for row in conn.execute(
+            "WITH RECURSIVE tree(id) AS ("
+            " SELECT ? UNION ALL SELECT dirs.id FROM dirs JOIN tree ON dirs.parent_id = tree.id"
+            ") SELECT id FROM tree", (dir_id,))]
+        conn.executemany("DELETE FROM files WHERE dir_id = ?", [(i,) for i in dir_ids])
+        conn.executemany("DELETE FROM dirs WHERE id = ?", [(i,) for i in dir_ids])
+
+    def query(self, root, name_filter=None, size_min=0, size_max=None, ctime_from=None, ctime_to=None,
+              cancel_event=None, extensions=None, name_fragments=None):
+        """查询索引中的文件，生成与scan_files相同格式的元组
+
+        大小以字节为单位，时间为时间戳，None表示不限制；extensions为小写扩展名集合，在SQL中筛选；
+        name_fragments为文件名必须包含的片段（至少3个字符，忽略大小写），文件名索引可用时先用它找出候选文件；
+        name_filter在Python中对文件名做最终筛选。
+        """
+        root = os.path.abspath(root)
+        conn = self.connect()
+        try:
+            root_id = self.get_root_id(conn, root)
+            if root_id is None:
+                return
+
+            if name_fragments and self.name_index:
+                # 从文件名索引出发：每个片段作为一个短语，FTS5按三字符片段找出包含全部片段的文件，
+                # 再按编号取出文件记录（CROSS JOIN固定连接顺序）
+                sql = ("SELECT d.path, f.name, f.size, f.ctime, f.mtime FROM file_names n"
+                       " CROSS JOIN files f ON f.id = n.rowid JOIN dirs d ON f.dir_id = d.id"
+                       " WHERE file_names MATCH ? AND d.root_id = ?")
+                params = [" AND ".join('"%s"' % fragment.replace('"', '""') for fragment in name_fragments),
+                          root_id]
+            else:
+                sql = ("SELECT d.path, f.name, f.size, f.ctime, f.mtime FROM files f"
+                       " JOIN dirs d ON f.dir_id = d.id WHERE d.root_id = ?")
+                params = [root_id]
+            if extensions is not None:
+                sql += " AND f.ext IN (%s)" % ",".join("?" * len(extensions))
+                params.extend(sorted(extensions))
+            if size_min:
+                sql += " AND f.size >= ?"
+                params.append(size_min)
+            if size_max is not None and size_max != float("inf"):
+                sql += " AND f.size <= ?"
+                params.append(size_max)
+            if ctime_from is not None:
+                sql += " AND f.ctime >= ?"
+                params.append(ctime_from)
+            if ctime_to is not None:
+                sql += " AND f.ctime <= ?"
+                params.append(ctime_to)
+
+            for count, (dir_path, name, size, ctime, mtime) in enumerate(conn.execute(sql, params)):
+                if count % 1000 == 0 and cancel_event is not None and cancel_event.is_set():
+                    return
+                if name_filter is not None and not name_filter(name):
+                    continue
+                yield name, os.path.join(dir_path, name), size, ctime, mtime
+        finally:
+            conn.close()
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from array import array
+
+from file_types import file_extension
+
+# NumPy是可选依赖，未安装时快照不可用，搜索直接查询索引
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 快照格式版本，格式变化时旧快照会被重新生成
+SNAPSHOT_VERSION = 1
+
+# 快照描述文件，最后写入，存在即表示快照完整
+META_FILE_NAME = "meta.json"
+
+# 每列保存为一个.npy文件，按内存映射方式打开
+COLUMNS = {
+    "size": "int64",
+    "ctime": "float64",
+    "mtime": "float64",
+    "ext": "int32",
+    "name_start": "int32",
+    "path_offsets": "int64"
+}
+
+# 所有路径按UTF-8编码拼接后保存的文件，直接以mmap打开
+PATHS_FILE_NAME = "paths.bin"
+
+# 查询时每次取出的行数，按块批量读取各列并检查取消
+QUERY_CHUNK_SIZE = 4096
+
+
+def snapshot_available():
+    """是否可以使用快照（已安装NumPy）"""
+    return np is not None
+
+
+class MetadataSnapshot:
+    """一个根目录的列式元数据快照，各列以内存映射的NumPy数组打开
+
+    大小、创建时间、修改时间和扩展名编号各占一列，路径以UTF-8拼接为一个字节块(paths.bin)，
+    path_offsets[i]:path_offsets[i + 1] 为第i个文件的路径，name_start[i]为文件名在路径中的起始字节。
+    大小、日期和扩展名条件以向量化的布尔掩码一次筛选全部文件，只为匹配的文件解码路径。
+    """
+
+    def __init__(self, folder, meta):
+        self.folder = folder
+        self.meta = meta
+        self.extensions = meta["extensions"]
+        prefix = meta["prefix"]
+        self.columns = {}
+        for column in COLUMNS:
+            self.columns[column] = np.load(os.path.join(folder, f"{prefix}{column}.npy"), mmap_mode="r")
+        # 空文件无法映射
+        self.paths = b""
+        paths_file = os.path.join(folder, prefix + PATHS_FILE_NAME)
+        if os.path.getsize(paths_file):
+            with open(paths_file, "rb") as f:
+                self.paths = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def close(self):
+        """释放各列和路径文件的内存映射，之后不能再查询；Windows下仍被映射的文件无法删除"""
+        self.columns = {}
+        if isinstance(self.paths, mmap.mmap):
+            self.paths.close()
+        self.paths = b""
+
+    def mask(self, criteria):
+        """返回满足大小、创建时间和扩展名条件的布尔掩码；其他通配符模式需要另外按文件名判断"""
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if criteria.size_min:
+            mask &= columns["size"] >= criteria.size_min
+        if criteria.size_max is not None:
+            mask &= columns["size"] <= criteria.size_max
+        if criteria.ctime_from is not None:
+            mask &= columns["ctime"] >= criteria.ctime_from
+        if criteria.ctime_to is not None:
+            mask &= columns["ctime"] <= criteria.ctime_to
+
+        matcher = criteria.matcher
+        if matcher.extensions_only:
+            ext_ids = [i for i, ext in enumerate(self.extensions) if ext in matcher.extensions]
+            mask &= np.isin(columns["ext"], np.array(ext_ids, dtype=np.int32))
+        return mask
+
+    def query(self, criteria, cancel_event=None):
+        """生成满足条件的文件，格式与scan_files相同"""
+        # 只包含扩展名的类型已经在掩码中筛选
+        name_filter = criteria.compile_name_filter(check_type=not criteria.matcher.extensions_only)
+
+        columns = self.columns
+        paths = self.paths
+        offsets = columns["path_offsets"]
+        indices = np.flatnonzero(self.mask(criteria))
+
+        # 按块批量取出匹配行的各列，避免逐个访问NumPy标量
+        for chunk_start in range(0, len(indices), QUERY_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            chunk = indices[chunk_start:chunk_start + QUERY_CHUNK_SIZE]
+            rows = zip(offsets[chunk].tolist(), offsets[chunk + 1].tolist(),
+                       columns["name_start"][chunk].tolist(), columns["size"][chunk].tolist(),
+                       columns["ctime"][chunk].tolist(), columns["mtime"][chunk].tolist())
+            for start, end, name_start, size, ctime, mtime in rows:
+                raw = paths[start:end]
+                name = raw[name_start:].decode("utf-8", "surrogatepass")
+                if name_filter is not None and not name_filter(name):
+                    continue
+                yield name, raw.decode("utf-8", "surrogatepass"), size, ctime, mtime
+
+
+class SnapshotStore:
+    """在指定文件夹中按根目录保存元数据快照
+
+    快照由索引数据生成，记录生成时索引的变化时间，索引内容变化后快照视为过期。
+    打开的快照按根目录保留，版本不变时重复使用；重新生成时先关闭旧快照，再删除它的文件。
+    """
+
+    def __init__(self, folder, background=False):
+        self.folder = folder
+        # 为True时过期的快照在后台线程中重新生成（见load_snapshot），适合长时间运行的界面
+        self.background = background
+        # 快照文件夹 -> 已打开的快照
+        self.opened = {}
+        # 正在后台生成快照的文件夹
+        self.building = set()
+        self.lock = threading.Lock()
+
+    def snapshot_folder(self, root):
+        """根目录对应的快照文件夹，文件夹名为路径的哈希值"""
+        key = os.path.normcase(os.path.abspath(root))
+        return os.path.join(self.folder, hashlib.sha1(key.encode("utf-8", "surrogatepass")).hexdigest()[:16])
+
+    def load(self, root, source_version=None):
+        """打开根目录的快照，不存在、格式不符或source_version不一致时返回None"""
+        if np is None:
+            return None
+        folder = self.snapshot_folder(root)
+        try:
+            with open(os.path.join(folder, META_FILE_NAME), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION or meta.get("root") != os.path.abspath(root):
+            return None
+        if source_version is not None and meta.get("source_version") != source_version:
+            return None
+        with self.lock:
+            snapshot = self.opened.get(folder)
+            if snapshot is not None and snapshot.meta == meta:
+                return snapshot
+            try:
+                opened = MetadataSnapshot(folder, meta)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"打开元数据快照失败: {e}")
+                return None
+            if snapshot is not None:
+                snapshot.close()
+            self.opened[folder] = opened
+            return opened
+
+    def build_in_background(self, root, entries, source_version=None):
+        """在后台线程中生成快照，同一根目录同时只生成一次，返回线程（已在生成时返回None）
+
+        entries()返回scan_files格式的文件元组，在后台线程中调用。
+        """
+        folder = self.snapshot_folder(root)
+        with self.lock:
+            if folder in self.building:
+                return None
+            self.building.add(folder)
+
+        def run():
+            try:
+                self.build(root, entries(), source_version)
+            except OSError as e:
+                print(f"生成元数据快照失败: {e}")
+            finally:
+                with self.lock:
+                    self.building.discard(folder)
+
+        thread = threading.Thread(target=run, name="snapshot-build", daemon=True)
+        thread.start()
+        return thread
+
+    def build(self, root, entries, source_version=None, cancel_event=None):
+        """把scan_files格式的文件元组写入根目录的快照，返回打开的快照，取消时返回None
+
+        新快照的列文件使用新的文件名前缀，描述文件最后替换，读取方不会看到写了一半的快照。
+        """
+        if np is None:
+            raise RuntimeError("元数据快照需要安装NumPy")
+
+        sizes = array("q")
+        ctimes = array("d")
+        mtimes = array("d")
+        ext_ids = array("i")
+        name_starts = array("i")
+        path_offsets = array("q", [0])
+        paths = bytearray()
+        extensions = {}
+
+        for count, (name, path, size, ctime, mtime) in enumerate(entries):
+            if count % 1000 == 0 and cancel_event is not None and cancel_event.is_set():
+                return None
+            raw = path.encode("utf-8", "surrogatepass")
+            ext = file_extension(name)
+            ext_id = extensions.get(ext)
+            if ext_id is None:
+                ext_id = extensions[ext] = len(extensions)
+            sizes.append(size)
+            ctimes.append(ctime)
+            mtimes.append(mtime)
+            ext_ids.append(ext_id)
+            name_starts.append(len(raw) - len(name.encode("utf-8", "surrogatepass")))
+            paths += raw
+            path_offsets.append(len(paths))
+
+        data = {
+            "size": sizes,
+            "ctime": ctimes,
+            "mtime": mtimes,
+            "ext": ext_ids,
+            "name_start": name_starts,
+            "path_offsets": path_offsets
+        }
+
+        folder = self.snapshot_folder(root)
+        os.makedirs(folder, exist_ok=True)
+        old_files = [name for name in os.listdir(folder) if name != META_FILE_NAME]
+
+        prefix = f"{time.time_ns():x}_"
+        for column, dtype in COLUMNS.items():
+            np.save(os.path.join(folder, f"{prefix}{column}.npy"), np.frombuffer(data[column], dtype=dtype))
+        with open(os.path.join(folder, prefix + PATHS_FILE_NAME), "wb") as f:
+            f.write(paths)
+
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "root": os.path.abspath(root),
+            "created": time.time(),
+            "source_version": source_version,
+            "count": len(sizes),
+            "extensions": [ext for ext, _ in sorted(extensions.items(), key=lambda item: item[1])],
+            "prefix": prefix
+        }
+        meta_path = os.path.join(folder, META_FILE_NAME)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        # 先关闭已打开的旧快照，再删除它的列文件；其他程序仍在映射的文件无法删除，留到下次生成时再删
+        snapshot = MetadataSnapshot(folder, meta)
+        with self.lock:
+            old = self.opened.get(folder)
+            if old is not None:
+                old.close()
+            self.opened[folder] = snapshot
+        for name in old_files:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+        return snapshot
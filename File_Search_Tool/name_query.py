@@ -0,0 +1,155 @@
+import fnmatch
+import re
+
+# 文件名的匹配方式：包含子串、通配符（匹配整个文件名）、正则表达式（匹配文件名的任意部分）
+NAME_MODE_SUBSTRING = "substring"
+NAME_MODE_GLOB = "glob"
+NAME_MODE_REGEX = "regex"
+NAME_MODES = (NAME_MODE_SUBSTRING, NAME_MODE_GLOB, NAME_MODE_REGEX)
+NAME_MODE_NAMES = {NAME_MODE_SUBSTRING: "包含", NAME_MODE_GLOB: "通配符", NAME_MODE_REGEX: "正则表达式"}
+
+# 三字符片段索引只能查找至少这么长的片段
+MIN_FRAGMENT_LENGTH = 3
+
+# 正则表达式中开启verbose模式的内联标志，此时空白和注释不是字面字符
+VERBOSE_FLAG = re.compile(r"\(\?[a-zA-Z]*x")
+
+
+def glob_literals(pattern):
+    """通配符模式中一定出现在匹配的文件名中的字面片段，方括号的规则与fnmatch相同"""
+    literals = []
+    current = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c in "*?":
+            literals.append("".join(current))
+            current = []
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j < 0:
+                # 没有结束的方括号按字面字符匹配
+                current.append(c)
+            else:
+                literals.append("".join(current))
+                current = []
+                i = j + 1
+        else:
+            current.append(c)
+    literals.append("".join(current))
+    return literals
+
+
+def regex_literals(pattern):
+    """正则表达式中一定出现在匹配文本中的字面片段
+
+    保守估计：有分支(|)或verbose标志时返回空列表；分组、字符类、转义的字符类和可以不出现的字符
+    都会截断片段，分组中的内容不计入。得到的片段可能比实际更少，但不会包含不一定出现的文本。
+    """
+    if "|" in pattern or VERBOSE_FLAG.search(pattern):
+        return []
+    literals = []
+    current = []
+    depth = 0
+    i, n = 0, len(pattern)
+
+    def end_literal():
+        literals.append("".join(current))
+        current.clear()
+
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "\\":
+            if i < n and not pattern[i].isalnum():
+                char = pattern[i]
+                i += 1
+            else:
+                # \d、\w、\x41、\N{...}和反向引用等，连同后面的字母数字一起跳过
+                if pattern[i:i + 2] == "N{":
+                    i = pattern.find("}", i) + 1 or n
+                while i < n and pattern[i].isalnum():
+                    i += 1
+                end_literal()
+                continue
+        elif c == "[":
+            # 跳过字符类，第一个]（或^之后的]）是字面字符
+            j = i + 1 if pattern[i:i + 1] == "^" else i
+            if pattern[j:j + 1] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            i = j + 1
+            end_literal()
+            continue
+        elif c in "*?{":
+            # 前一个字符可以不出现
+            if current:
+                current.pop()
+            end_literal()
+            if c == "{":
+                i = pattern.find("}", i) + 1 or n
+            continue
+        elif c in "()":
+            depth += 1 if c == "(" else -1
+            end_literal()
+            continue
+        elif c in ".^$+":
+            end_literal()
+            continue
+        else:
+            char = c
+        if depth == 0:
+            current.append(char)
+        # 分组中的内容可能整体可以不出现
+    end_literal()
+    return literals
+
+
+class NameQuery:
+    """文件名查询，忽略大小写
+
+    mode为NAME_MODE_SUBSTRING时文件名包含text即匹配，NAME_MODE_GLOB时按通配符匹配整个文件名，
+    NAME_MODE_REGEX时按正则表达式匹配文件名的任意部分；正则表达式格式错误时抛出ValueError。
+    fragments为匹配的文件名一定包含的小写字面片段（至少MIN_FRAGMENT_LENGTH个字符），
+    元数据索引用三字符片段索引先找出包含这些片段的文件，再逐个确认；为空时只能逐个匹配。
+    """
+
+    def __init__(self, text, mode=NAME_MODE_SUBSTRING):
+        if mode not in NAME_MODES:
+            raise ValueError(f"未知的文件名匹配方式: {mode}")
+        self.text = text
+        self.mode = mode
+
+        if mode == NAME_MODE_SUBSTRING:
+            needle = text.lower()
+            self.match = lambda name: needle in name.lower()
+            literals = [text]
+        elif mode == NAME_MODE_GLOB:
+            regex = re.compile(fnmatch.translate(text), re.IGNORECASE)
+            self.match = lambda name: regex.match(name) is not None
+            literals = glob_literals(text)
+        else:
+            try:
+                regex = re.compile(text, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"正则表达式格式不正确: {e}")
+            self.match = lambda name: regex.search(name) is not None
+            literals = regex_literals(text)
+
+        self.fragments = tuple(sorted({literal.lower() for literal in literals
+                                       if len(literal) >= MIN_FRAGMENT_LENGTH}))
+
+    def __call__(self, name):
+        return self.match(name)
+
+    @property
+    def key(self):
+        """查询的规范化形式，用于比较两个查询和作为缓存键"""
+        return self.mode, self.text
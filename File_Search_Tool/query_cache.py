@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 默认的缓存内存上限（估算值）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 每个缓存的文件和目录除路径字符串之外的大致内存占用（元组、数值和列表项）
+FILE_OVERHEAD_BYTES = 250
+DIR_OVERHEAD_BYTES = 300
+
+# 修改时间距离记录时不足这个秒数的目录不记录修改时间，下次一定重新枚举：
+# 文件系统的时间精度有限，目录在枚举之后的同一时间片内再次变化时修改时间可能不变
+RACY_MARGIN = 2.0
+
+
+class DirectoryTree:
+    """一次搜索遍历过的目录树：每个目录的修改时间、匹配的文件和子目录，作为缓存的指纹和内容"""
+
+    def __init__(self, root):
+        self.root = root
+        # 目录路径 -> [修改时间(纳秒)或None, 文件列表, 子目录路径列表, 估算的内存占用]
+        self.dirs = {}
+        self.size = 0
+        # 最近一次刷新时重新枚举的目录数
+        self.rescanned = 0
+
+    def record(self, path, files, subdirs):
+        """记录一个刚枚举完的目录，用作walker的on_directory回调"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if time.time() - mtime / 1e9 < RACY_MARGIN:
+                mtime = None
+        except OSError:
+            mtime = None
+        size = DIR_OVERHEAD_BYTES + len(path) + sum(FILE_OVERHEAD_BYTES + len(entry[1]) for entry in files)
+        old = self.dirs.get(path)
+        if old is not None:
+            self.size -= old[3]
+        self.dirs[path] = [mtime, files, subdirs, size]
+        self.size += size
+
+    def remove(self, path):
+        """删除一个目录及其所有子目录的记录"""
+        stack = [path]
+        while stack:
+            node = self.dirs.pop(stack.pop(), None)
+            if node is not None:
+                self.size -= node[3]
+                stack.extend(node[2])
+
+    def refresh(self, walk, scan, onerror=None, cancel_event=None):
+        """检查每个目录的修改时间，只重新枚举发生变化的目录，返回是否完整刷新（未被取消）
+
+        walk(folder, on_directory): 完整遍历一个新出现的子目录，返回文件生成器
+        scan(path): 枚举单个目录，返回scan_directory格式的 (文件列表, 子目录列表, 错误列表)
+        """
+        self.rescanned = 0
+        stack = [self.root]
+        while stack:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            path = stack.pop()
+            node = self.dirs.get(path)
+            if node is None:
+                # 上次遍历未完成枚举的子目录
+                for _ in walk(path, self.record):
+                    pass
+                continue
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                # 目录已被删除
+                self.remove(path)
+                continue
+            if node[0] is not None and node[0] == mtime:
+                stack.extend(reversed(node[2]))
+                continue
+
+            # 目录有变化：重新枚举这个目录，新出现的子目录完整遍历，消失的子目录删除记录
+            files, subdirs, errors = scan(path)
+            if onerror is not None:
+                for e in errors:
+                    onerror(e)
+            subdirs = [subdir for subdir, _ in subdirs]
+            old_subdirs = set(node[2])
+            self.record(path, files, subdirs)
+            self.rescanned += 1
+            for subdir in set(old_subdirs).difference(subdirs):
+                self.remove(subdir)
+            for subdir in reversed(subdirs):
+                if subdir in old_subdirs:
+                    stack.append(subdir)
+                else:
+                    self.remove(subdir)
+                    for _ in walk(subdir, self.record):
+                        pass
+        return True
+
+    def files(self, breadth_first=False, on_files=None):
+        """按与遍历相同的顺序（深度优先或按层）生成所有缓存的文件
+
+        on_files: 可选，每个目录的文件生成前调用，参数为文件数
+        """
+        if breadth_first:
+            pending = deque([self.root])
+            take = pending.popleft
+        else:
+            pending = [self.root]
+            take = pending.pop
+        while pending:
+            node = self.dirs.get(take())
+            if node is None:
+                continue
+            if on_files is not None and node[1]:
+                on_files(len(node[1]))
+            yield from node[1]
+            pending.extend(node[2] if breadth_first else reversed(node[2]))
+
+
+class QueryCache:
+    """按搜索根目录和条件缓存遍历结果的LRU缓存，用于反复执行相同的搜索
+
+    每条缓存保存上次遍历的目录树（每个目录的修改时间、匹配的文件和子目录）：
+    再次搜索时只对每个目录做一次stat，修改时间都没有变化时直接返回缓存的结果，
+    部分目录有变化时只重新枚举这些目录。所有缓存的估算内存超过max_bytes时淘汰最久未使用的条目。
+    与元数据索引相同，原地修改文件内容不会改变所在目录的修改时间，这类变化要等目录中有文件增删时才会更新。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        # 统计信息：命中（包括部分重新枚举）和未命中的次数
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, key, root, walk, scan, onerror=None, cancel_event=None, breadth_first=False, on_cached=None):
+        """生成root下满足条件的文件，key为包含根目录和条件的缓存键
+
+        walk(folder, on_directory): 遍历folder的整个子树，生成匹配的文件（未命中或出现新目录时使用）
+        scan(path): 枚举单个目录，返回scan_directory格式的 (文件列表, 子目录列表, 错误列表)
+        on_cached: 可选，命中时代替遍历的进度回调，参数为从缓存中生成的文件数
+        只有完整的遍历结果才会保存；取消或调用方提前停止迭代时不保存。
+        """
+        # 取出条目期间其他搜索不会使用同一条缓存
+        with self.lock:
+            tree = self.entries.pop(key, None)
+            if tree is not None:
+                self.total_bytes -= tree.size
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if tree is None:
+            tree = DirectoryTree(root)
+            yield from walk(root, tree.record)
+        else:
+            if not tree.refresh(walk, scan, onerror, cancel_event):
+                return
+            yield from tree.files(breadth_first, on_cached)
+
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        self.store(key, tree)
+
+    def store(self, key, tree):
+        """保存一条缓存，超过内存上限时从最久未使用的条目开始淘汰"""
+        if tree.size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            self.entries[key] = tree
+            self.total_bytes += tree.size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+
+    def clear(self):
+        """清空所有缓存"""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+# 支持的导出格式，未指定时按文件扩展名判断
+EXPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl"}
+
+# 导出的列：文件名、路径、大小(字节)、创建时间、修改时间（本地时间，ISO 8601格式）
+EXPORT_FIELDS = ("name", "path", "size", "created", "modified")
+
+# 写入缓冲区大小，内存占用与导出的行数无关
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# 每写入多少行检查一次取消并报告进度
+PROGRESS_INTERVAL = 1000
+
+
+def export_format(path, fmt=None):
+    """返回导出格式（csv或jsonl），fmt为None时按文件扩展名判断，无法判断时抛出ValueError"""
+    if fmt is None:
+        fmt = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"无法根据扩展名判断导出格式: {path}")
+    if fmt not in EXPORT_FORMATS.values():
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    return fmt
+
+
+def format_time(timestamp):
+    """把时间戳格式化为本地时间的ISO 8601字符串，无法转换时返回空字符串"""
+    try:
+        return datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="seconds")
+    except (OSError, OverflowError, ValueError):
+        return ""
+
+
+def write_csv(f, records, cancel_event=None, on_written=None):
+    writer = csv.writer(f)
+    writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for name, path, size, ctime, mtime in records:
+        writer.writerow((name, path, size, format_time(ctime), format_time(mtime)))
+        count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            if on_written is not None:
+                on_written(PROGRESS_INTERVAL)
+            if cancel_event is not None and cancel_event.is_set():
+                break
+    return count
+
+
+def write_jsonl(f, records, cancel_event=None, on_written=None):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    count = 0
+    for name, path, size, ctime, mtime in records:
+        f.write(encode({"name": name, "path": path, "size": size,
+                        "created": format_time(ctime), "modified": format_time(mtime)}))
+        f.write("\n")
+        count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            if on_written is not None:
+                on_written(PROGRESS_INTERVAL)
+            if cancel_event is not None and cancel_event.is_set():
+                break
+    return count
+
+
+def export_records(records, path, fmt=None, cancel_event=None, on_written=None):
+    """把 (文件名, 路径, 大小, 创建时间戳, 修改时间戳) 格式的结果逐条写入文件，返回写入的行数
+
+    records可以是搜索引擎的生成器，结果边搜索边写入，不在内存中保存；path为"-"时写入标准输出。
+    写入文件时先写临时文件，完成后再替换目标文件，取消或出错时删除临时文件，不留下不完整的导出。
+    CSV文件带有UTF-8 BOM，Excel可以直接打开中文路径；JSON Lines和标准输出使用不带BOM的UTF-8。
+    on_written: 可选，每写入PROGRESS_INTERVAL行调用一次，参数为行数
+    """
+    fmt = export_format(path, fmt) if path != "-" or fmt is not None else "jsonl"
+    write = write_csv if fmt == "csv" else write_jsonl
+
+    if path == "-":
+        stdout = sys.stdout
+        stdout.reconfigure(encoding="utf-8", errors="surrogateescape", newline="" if fmt == "csv" else None)
+        count = write(stdout, records, cancel_event, on_written)
+        stdout.flush()
+        return count
+
+    temp_path = path + ".part"
+    try:
+        # 无法解码的文件名（surrogateescape）按原始字节写回
+        with open(temp_path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8",
+                  errors="surrogateescape", newline="", buffering=WRITE_BUFFER_SIZE) as f:
+            count = write(f, records, cancel_event, on_written)
+        if cancel_event is not None and cancel_event.is_set():
+            os.remove(temp_path)
+            return count
+        os.replace(temp_path, path)
+        return count
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,400 @@
+import tkinter as tk
+from tkinter import ttk
+from array import array
+from datetime import datetime
+
+# 结果列表的列名，重复文件分组列只在显示重复文件时出现
+RESULT_COLUMNS = ("name", "path", "size", "created", "modified", "group")
+DEFAULT_DISPLAY_COLUMNS = ("name", "path", "size", "created", "modified")
+DUPLICATE_DISPLAY_COLUMNS = ("group", "name", "path", "size", "created", "modified")
+
+
+class ResultStore:
+    """按列保存搜索结果的原始数据，大小为字节数、时间为时间戳，显示时再格式化
+
+    大小保存在array('q')中、时间戳保存在array('d')中，每个值只占8字节，不为每条结果创建对象；
+    路径拆分为目录前缀和文件名，同一目录下的结果共用一个前缀字符串。
+    每列的升序排列结果会被缓存，降序直接反转缓存的顺序，数据变化时缓存失效。
+    删除的结果只记录行号，不移动其他行，行号在清空前保持不变。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """清空所有结果"""
+        self.names = []
+        # 每条结果所在目录前缀的编号
+        self.dir_ids = array("I")
+        self.sizes = array("q")
+        self.ctimes = array("d")
+        self.mtimes = array("d")
+        # 目录前缀（包含末尾的路径分隔符）及其编号
+        self.dirs = []
+        self.dir_lookup = {}
+        # 不以文件名结尾、无法拆分的路径：行号 -> 完整路径
+        self.path_overrides = {}
+        # 每条结果所在的重复文件分组编号（从1开始，0表示不重复），未查找重复文件时为None
+        self.groups = None
+        # 已删除的行号（例如监视到文件被删除），排序和显示时跳过
+        self.removed = set()
+        # 列名 -> 升序排列的行号
+        self.sort_cache = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def live_count(self):
+        """未删除的结果数量"""
+        return len(self.names) - len(self.removed)
+
+    def live_rows(self):
+        """按搜索顺序返回未删除的行号"""
+        if not self.removed:
+            return range(len(self.names))
+        removed = self.removed
+        return [i for i in range(len(self.names)) if i not in removed]
+
+    def append(self, name, path, size, ctime, mtime):
+        """添加一条结果"""
+        if self.sort_cache:
+            self.sort_cache = {}
+        if self.groups is not None:
+            self.groups.append(0)
+        if name and path.endswith(name):
+            prefix = path[:len(path) - len(name)]
+        else:
+            self.path_overrides[len(self.names)] = path
+            prefix = ""
+        dir_id = self.dir_lookup.get(prefix)
+        if dir_id is None:
+            dir_id = self.dir_lookup[prefix] = len(self.dirs)
+            self.dirs.append(prefix)
+        self.names.append(name)
+        self.dir_ids.append(dir_id)
+        self.sizes.append(size)
+        self.ctimes.append(ctime)
+        self.mtimes.append(mtime)
+
+    def extend(self, rows):
+        """批量添加 (文件名, 路径, 大小, 创建时间戳, 修改时间戳) 格式的结果"""
+        for name, path, size, ctime, mtime in rows:
+            self.append(name, path, size, ctime, mtime)
+
+    def update(self, index, size, ctime, mtime):
+        """更新一条结果的大小和时间，路径不变"""
+        self.sizes[index] = size
+        self.ctimes[index] = ctime
+        self.mtimes[index] = mtime
+        for column in ("size", "created", "modified"):
+            self.sort_cache.pop(column, None)
+
+    def remove(self, index):
+        """删除一条结果，只记录行号"""
+        self.removed.add(index)
+        self.sort_cache = {}
+
+    def path(self, index):
+        """第index条结果的完整路径"""
+        if self.path_overrides and index in self.path_overrides:
+            return self.path_overrides[index]
+        return self.dirs[self.dir_ids[index]] + self.names[index]
+
+    def row(self, index):
+        """第index条结果，格式为 (文件名, 路径, 大小, 创建时间戳, 修改时间戳)"""
+        return (self.names[index], self.path(index), self.sizes[index], self.ctimes[index], self.mtimes[index])
+
+    def set_groups(self, groups):
+        """记录重复文件分组，groups为行号列表的列表，按顺序编号"""
+        self.groups = array("i", [0]) * len(self.names)
+        for number, rows in enumerate(groups, 1):
+            for index in rows:
+                self.groups[index] = number
+        self.sort_cache.pop("group", None)
+
+    def sort_keys(self, column):
+        """返回指定列的排序键列表，与行号一一对应"""
+        if column == "name":
+            return [name.lower() for name in self.names]
+        if column == "path":
+            return [self.path(i).lower() for i in range(len(self.names))]
+        if column == "size":
+            return self.sizes
+        if column == "created":
+            return self.ctimes
+        if column == "modified":
+            return self.mtimes
+        if column == "group" and self.groups is not None:
+            return self.groups
+        raise ValueError(f"未知的排序列: {column}")
+
+    def sorted_order(self, column, reverse=False):
+        """返回按指定列排序后的行号列表
+
+        升序结果按列缓存，切换升降序时只需反转，不再重新比较。行号保存在array('I')中，
+        每个只占4字节。
+        """
+        ascending = self.sort_cache.get(column)
+        if ascending is None:
+            keys = self.sort_keys(column)
+            ascending = array("I", sorted(self.live_rows(), key=keys.__getitem__))
+            self.sort_cache[column] = ascending
+        return ascending[::-1] if reverse else ascending[:]
+
+
+def format_timestamp(timestamp):
+    """把时间戳格式化为显示用的字符串，无法转换时返回空字符串"""
+    try:
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    except (OSError, OverflowError, ValueError):
+        return ""
+
+
+class VirtualResultView:
+    """只渲染可见行的搜索结果列表
+
+    数据保存在ResultStore中，Treeview里始终只有一屏的行，滚动时复用这些行并更新内容，
+    因此百万级结果也不会拖慢界面。排序只改变行号顺序，不移动任何Treeview项目。
+    显示重复文件时只显示部分行，按分组排列并显示分组列。
+    在已有结果中筛选后只显示筛选出的行，此时show_all恢复到筛选后的结果。
+    """
+
+    def __init__(self, parent, store, page_size=20):
+        self.store = store
+        # 排序后的行号顺序，None表示按搜索顺序显示
+        self.order = None
+        # 只显示部分行时的行号（例如重复文件），None表示显示全部结果
+        self.visible = None
+        # 在已有结果中筛选出的行号，None表示没有筛选
+        self.filtered = None
+        # 是否正在显示重复文件分组
+        self.showing_duplicates = False
+        # 当前第一行可见行的位置和每屏行数
+        self.offset = 0
+        self.page_size = page_size
+        # 选中行在当前顺序中的位置
+        self.selected_position = None
+        # 大小列的显示单位（相对KB的倍数）
+        self.unit_factor = 1
+        self.row_height = None
+        self.header_height = None
+
+        self.tree = ttk.Treeview(parent, columns=RESULT_COLUMNS, displaycolumns=DEFAULT_DISPLAY_COLUMNS,
+                                 show="headings", selectmode="browse", height=page_size)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+
+        # 自行处理滚动，阻止Treeview滚动其内部的行
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.page_size))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.page_size))
+        self.tree.bind("<Home>", lambda event: self.move_selection(-self.row_count()))
+        self.tree.bind("<End>", lambda event: self.move_selection(self.row_count()))
+
+    def clear(self):
+        """清空结果和排序状态"""
+        self.store.clear()
+        self.filtered = None
+        self.show_all()
+
+    def row_count(self):
+        """当前显示的行数"""
+        return len(self.order) if self.order is not None else len(self.store)
+
+    def show_rows(self, rows, display_columns=DEFAULT_DISPLAY_COLUMNS):
+        """只显示指定的行，按给定的顺序排列"""
+        self.visible = array("I", rows)
+        self.order = self.visible[:]
+        self.showing_duplicates = display_columns == DUPLICATE_DISPLAY_COLUMNS
+        self.offset = 0
+        self.selected_position = None
+        self.tree["displaycolumns"] = display_columns
+        self.refresh()
+
+    def show_duplicates(self, groups):
+        """只显示重复文件，groups为行号列表的列表，同一分组的文件相邻显示"""
+        self.store.set_groups(groups)
+        self.show_rows([index for rows in groups for index in rows], DUPLICATE_DISPLAY_COLUMNS)
+
+    def show_filtered(self, rows):
+        """只显示在已有结果中筛选出的行（按搜索顺序），之后show_all恢复到这些行"""
+        self.filtered = array("I", rows)
+        self.show_rows(self.filtered)
+
+    def base_rows(self):
+        """当前搜索的全部结果的行号：筛选出的行，或未删除的全部结果"""
+        return self.filtered if self.filtered is not None else self.store.live_rows()
+
+    def show_all(self):
+        """恢复显示全部结果（按搜索顺序），筛选过时只显示筛选出的行"""
+        if self.filtered is not None:
+            self.show_rows(self.filtered)
+            return
+        self.visible = None
+        self.showing_duplicates = False
+        self.order = None if not self.store.removed else array("I", self.store.live_rows())
+        self.offset = 0
+        self.selected_position = None
+        self.tree["displaycolumns"] = DEFAULT_DISPLAY_COLUMNS
+        self.refresh()
+
+    def update_rows(self, rows):
+        """更新已有结果，rows为 (行号, 大小, 创建时间戳, 修改时间戳) 列表，排序位置不变"""
+        for index, size, ctime, mtime in rows:
+            self.store.update(index, size, ctime, mtime)
+        self.refresh()
+
+    def remove_rows(self, indices):
+        """删除结果，其余行保持当前顺序"""
+        removed = set(indices)
+        for index in removed:
+            self.store.remove(index)
+        if self.order is None:
+            self.order = array("I", self.store.live_rows())
+        else:
+            self.order = array("I", [index for index in self.order if index not in removed])
+        if self.visible is not None:
+            self.visible = array("I", [index for index in self.visible if index not in removed])
+        if self.filtered is not None:
+            self.filtered = array("I", [index for index in self.filtered if index not in removed])
+        self.selected_position = None
+        self.refresh()
+
+    def append_rows(self, rows):
+        """追加一批结果，已排序时新结果显示在末尾；只显示部分行时新结果不显示"""
+        start = len(self.store)
+        self.store.extend(rows)
+        if self.order is not None and self.visible is None:
+            self.order.extend(range(start, len(self.store)))
+        self.refresh()
+
+    def sort(self, column, reverse=False):
+        """按列排序，只取得行号顺序并一次刷新可见行"""
+        if self.visible is None:
+            self.order = self.store.sorted_order(column, reverse)
+        else:
+            # 只对显示的行排序，排序是稳定的，按分组排序时组内保持原有顺序
+            keys = self.store.sort_keys(column)
+            self.order = array("I", sorted(self.visible, key=keys.__getitem__, reverse=reverse))
+        self.offset = 0
+        self.selected_position = None
+        self.refresh()
+
+    def row_index(self, position):
+        """把显示位置转换为ResultStore中的行号"""
+        return self.order[position] if self.order is not None else position
+
+    def format_row(self, index):
+        """格式化一行结果，日期对象只为可见行创建"""
+        store = self.store
+        group = store.groups[index] if store.groups is not None else 0
+        return (
+            store.names[index],
+            store.path(index),
+            f"{store.sizes[index] / 1024 / self.unit_factor:.2f}",
+            format_timestamp(store.ctimes[index]),
+            format_timestamp(store.mtimes[index]),
+            group or ""
+        )
+
+    def refresh(self):
+        """按当前位置重新填充可见行"""
+        total = self.row_count()
+        self.offset = max(0, min(self.offset, total - self.page_size))
+        count = min(self.page_size, total - self.offset)
+
+        # 调整Treeview中的行数，项目编号即可见行的序号
+        children = self.tree.get_children()
+        for iid in children[count:]:
+            self.tree.delete(iid)
+        for slot in range(len(children), count):
+            self.tree.insert("", tk.END, iid=str(slot))
+
+        selection = ()
+        for slot in range(count):
+            position = self.offset + slot
+            self.tree.item(str(slot), values=self.format_row(self.row_index(position)))
+            if position == self.selected_position:
+                selection = (str(slot),)
+        if self.tree.selection() != selection:
+            self.tree.selection_set(selection)
+
+        self.update_scrollbar()
+
+        # 第一次出现结果时测量实际行高，修正每屏行数
+        if self.row_height is None and count:
+            self.tree.after_idle(self.update_page_size)
+
+    def update_scrollbar(self):
+        total = self.row_count()
+        if total <= self.page_size:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.page_size) / total)
+
+    def scroll_to(self, offset):
+        self.offset = int(offset)
+        self.refresh()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def on_scrollbar(self, *args):
+        """滚动条回调，参数格式与Tk的yview命令相同"""
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.row_count())
+        elif args[0] == "scroll":
+            step = self.page_size if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        # Windows下delta为120的倍数，macOS下为较小的值，只取方向
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected_position = self.offset + int(selection[0])
+
+    def move_selection(self, rows):
+        """键盘移动选中行，必要时滚动使其可见"""
+        total = self.row_count()
+        if total == 0:
+            return "break"
+        if self.selected_position is None:
+            position = self.offset
+        else:
+            position = max(0, min(total - 1, self.selected_position + rows))
+        self.selected_position = position
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.page_size:
+            self.offset = position - self.page_size + 1
+        self.refresh()
+        return "break"
+
+    def on_configure(self, event):
+        """窗口大小变化时重新计算每屏行数"""
+        self.update_page_size(event.height)
+
+    def update_page_size(self, height=None):
+        """根据控件高度和实际行高计算每屏行数，行高在第一次显示结果后测量"""
+        if height is None:
+            height = self.tree.winfo_height()
+        if self.row_height is None and self.tree.get_children():
+            bbox = self.tree.bbox(self.tree.get_children()[0])
+            if bbox:
+                self.header_height = bbox[1]
+                self.row_height = bbox[3]
+        row_height = self.row_height or 20
+        header_height = self.header_height if self.header_height is not None else 25
+        page_size = max(1, (height - header_height) // row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
@@ -0,0 +1,801 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+from multiprocessing import freeze_support
+
+from exif_date import CaptureDateReader
+from file_types import FILE_TYPES, compile_file_type, load_custom_file_types
+from file_walker import scan_directory, scan_files, parallel_scan_files
+from metadata_snapshot import snapshot_available
+from name_query import NameQuery, NAME_MODES, NAME_MODE_SUBSTRING
+from result_export import export_format, export_records
+from search_stats import SearchStats, format_stats
+
+# 程序所在目录，命令行默认使用界面保存的历史记录和自定义文件类型
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 搜索结果：文件名、路径、大小(字节)、创建时间戳、修改时间戳
+# 与scan_files生成的元组格式相同，可以直接按元组解包
+FileRecord = namedtuple("FileRecord", ["name", "path", "size", "ctime", "mtime"])
+
+# 日期条件使用的格式
+DATE_FORMAT = "%Y-%m-%d"
+
+# 日期条件比较的时间：文件创建时间，或EXIF拍摄时间（没有拍摄时间的文件使用修改时间）
+DATE_SOURCE_CTIME = "ctime"
+DATE_SOURCE_EXIF = "exif"
+DATE_SOURCES = (DATE_SOURCE_CTIME, DATE_SOURCE_EXIF)
+DATE_SOURCE_NAMES = {DATE_SOURCE_CTIME: "创建时间", DATE_SOURCE_EXIF: "拍摄时间"}
+
+# 文件夹输入框、历史记录和日志中多个搜索根目录之间的分隔符
+ROOT_SEPARATOR = ";"
+
+# 同时搜索多个根目录时，每个设备的线程攒够这么多结果或超过MERGE_FLUSH_INTERVAL秒后交给合并队列
+MERGE_BATCH_SIZE = 256
+MERGE_FLUSH_INTERVAL = 0.1
+# 合并队列中最多等待的批数，消费较慢时遍历线程暂停，内存占用有上限
+MERGE_QUEUE_SIZE = 64
+
+# 搜索因限制条件提前结束的原因
+STOP_MAX_RESULTS = "max_results"
+STOP_TIME_BUDGET = "time_budget"
+STOP_REASON_NAMES = {STOP_MAX_RESULTS: "达到结果数量上限", STOP_TIME_BUDGET: "达到时间限制"}
+
+
+class SearchCriteria:
+    """类型化的搜索条件，与界面无关
+
+    file_type: 分号分隔的通配符模式（如"*.cr2;*.cr3"），或已编译的FileTypeMatcher
+    size_min / size_max: 文件大小范围（字节），size_max为None表示不限制
+    ctime_from / ctime_to: 创建时间范围（时间戳），None表示不限制
+    capture_from / capture_to: EXIF拍摄时间范围（时间戳），None表示不限制；
+        需要读取文件头，在其他条件都满足后才检查，没有拍摄时间的文件按修改时间比较
+    name_query: 可选，NameQuery，按子串、通配符或正则表达式匹配文件名，与文件类型同时满足
+    """
+
+    def __init__(self, file_type="*.*", size_min=0, size_max=None, ctime_from=None, ctime_to=None,
+                 capture_from=None, capture_to=None, name_query=None):
+        self.matcher = compile_file_type(file_type) if isinstance(file_type, str) else file_type
+        self.size_min = size_min or 0
+        self.size_max = None if size_max in (None, float("inf")) else size_max
+        self.ctime_from = ctime_from
+        self.ctime_to = ctime_to
+        self.capture_from = capture_from
+        self.capture_to = capture_to
+        self.name_query = name_query
+
+    @property
+    def uses_capture_time(self):
+        """是否需要读取EXIF拍摄时间"""
+        return self.capture_from is not None or self.capture_to is not None
+
+    def compile_name_filter(self, check_type=True):
+        """把文件类型和文件名查询编译为一个函数 f(文件名)，都不限制时返回None
+
+        check_type为False时不检查文件类型（扩展名已经在索引查询或快照中筛选过）。
+        """
+        matcher = self.matcher if check_type and not self.matcher.match_all else None
+        name_query = self.name_query
+        if name_query is None:
+            return matcher
+        if matcher is None:
+            return name_query
+        return lambda name: matcher(name) and name_query(name)
+
+    def compile_stat_filter(self):
+        """把大小和创建时间条件编译为一个函数 f(大小, 创建时间戳)
+
+        边界预先计算好，不限制的一侧使用无穷大，每个文件只需两次链式比较；
+        两个条件都不限制时返回None，遍历时完全跳过这一步。
+        """
+        size_min = self.size_min
+        size_max = float("inf") if self.size_max is None else self.size_max
+        ctime_from = float("-inf") if self.ctime_from is None else self.ctime_from
+        ctime_to = float("inf") if self.ctime_to is None else self.ctime_to
+        check_size = size_min > 0 or self.size_max is not None
+        check_ctime = self.ctime_from is not None or self.ctime_to is not None
+
+        if check_size and check_ctime:
+            return lambda size, ctime: size_min <= size <= size_max and ctime_from <= ctime <= ctime_to
+        if check_size:
+            return lambda size, ctime: size_min <= size <= size_max
+        if check_ctime:
+            return lambda size, ctime: ctime_from <= ctime <= ctime_to
+        return None
+
+    def walk_key(self):
+        """遍历时检查的条件（文件类型、文件名、大小和创建时间）的规范化形式，用作结果缓存的键
+
+        文件类型按编译后的扩展名集合和通配符比较，"*.JPG;*.jpg"与"*.jpg"的键相同。
+        """
+        matcher = self.matcher
+        if matcher.match_all:
+            file_type = None
+        else:
+            file_type = (matcher.extensions, matcher.regex.pattern if matcher.regex is not None else None)
+        name = self.name_query.key if self.name_query is not None else None
+        return file_type, name, self.size_min, self.size_max, self.ctime_from, self.ctime_to
+
+    def without_capture_time(self):
+        """去掉拍摄时间条件的副本，其他条件不变"""
+        return SearchCriteria(self.matcher, self.size_min, self.size_max, self.ctime_from, self.ctime_to,
+                              name_query=self.name_query)
+
+    def narrows(self, other):
+        """本条件找到的文件是否一定也满足other（条件相同或更严格），用于在other的结果中直接筛选
+
+        文件类型在other匹配所有文件、两者相同，或本条件只包含other中的扩展名时收窄；
+        大小、创建时间和拍摄时间的范围都在other的范围之内时收窄，other按拍摄时间筛选而本条件没有时不收窄；
+        other有文件名查询时，本条件的文件名查询必须与其相同。
+        """
+        if other.name_query is not None and (self.name_query is None or self.name_query.key != other.name_query.key):
+            return False
+        matcher, other_matcher = self.matcher, other.matcher
+        if not other_matcher.match_all and self.walk_key()[0] != other.walk_key()[0]:
+            if not matcher.extensions_only or not matcher.extensions <= other_matcher.extensions:
+                return False
+
+        def within(low, high, other_low, other_high):
+            return ((other_low is None or (low is not None and low >= other_low)) and
+                    (other_high is None or (high is not None and high <= other_high)))
+
+        return (within(self.size_min or None, self.size_max, other.size_min or None, other.size_max) and
+                within(self.ctime_from, self.ctime_to, other.ctime_from, other.ctime_to) and
+                within(self.capture_from, self.capture_to, other.capture_from, other.capture_to))
+
+    def compile_predicate(self):
+        """把全部条件编译为一个函数 f(文件名, 大小, 创建时间戳)，按代价从低到高依次判断：
+        扩展名和文件名、大小、创建时间。用于在已有的结果或索引数据上筛选。
+        """
+        name_filter = self.compile_name_filter()
+        stat_filter = self.compile_stat_filter()
+        if name_filter is None:
+            if stat_filter is None:
+                return lambda name, size, ctime: True
+            return lambda name, size, ctime: stat_filter(size, ctime)
+        if stat_filter is None:
+            return lambda name, size, ctime: name_filter(name)
+        return lambda name, size, ctime: name_filter(name) and stat_filter(size, ctime)
+
+
+class SearchLimits:
+    """限制搜索的结果数量、时间和目录深度，避免对整个磁盘的搜索无法结束
+
+    max_results: 最多生成的结果数，None表示不限制
+    time_budget: 最长搜索时间（秒），包括索引刷新和读取拍摄时间，None表示不限制
+    max_depth: 最大目录深度，0表示只搜索文件夹本身，None表示不限制；设置后不使用元数据索引
+
+    search()把这个对象代替cancel_event传给遍历、索引和拍摄时间读取，用户取消、超时
+    或结果数量达到上限时都在下一个文件处停止。搜索结束后stop_reason为提前结束的原因
+    （STOP_MAX_RESULTS或STOP_TIME_BUDGET），正常结束或用户取消时为None。
+    """
+
+    def __init__(self, max_results=None, time_budget=None, max_depth=None):
+        self.max_results = max_results
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.stop_reason = None
+        self.cancel_event = None
+        self.deadline = None
+
+    def start(self, cancel_event=None):
+        """开始计时，每次搜索开始时调用"""
+        self.cancel_event = cancel_event
+        self.stop_reason = None
+        self.deadline = None if self.time_budget is None else time.monotonic() + self.time_budget
+
+    def stop(self, reason):
+        """因限制条件提前结束搜索"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+
+    def is_set(self):
+        """与threading.Event.is_set()相同的接口，返回搜索是否应该停止"""
+        if self.stop_reason is not None:
+            return True
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stop(STOP_TIME_BUDGET)
+            return True
+        return False
+
+    @property
+    def unlimited(self):
+        """没有设置任何限制"""
+        return self.max_results is None and self.time_budget is None and self.max_depth is None
+
+
+def parse_size_kb(value):
+    """把以KB为单位的大小转换为字节数，空值、"不限制"或无穷大返回None"""
+    if isinstance(value, str):
+        value = value.strip()
+    if value in (None, "", "不限制", "Unlimited"):
+        return None
+    size = float(value)
+    return None if size == float("inf") else size * 1024
+
+
+def criteria_from_dict(criteria, file_types=None):
+    """把历史记录格式的搜索条件转换为SearchCriteria
+
+    criteria中的日期为"YYYY-MM-DD"字符串（结束日期包含当天），大小以KB为单位，
+    file_type为文件类型名称，不在file_types中时按通配符模式处理；
+    date_source为"exif"时日期条件比较拍摄时间，默认比较创建时间；
+    name_query为文件名查询，name_mode为其匹配方式（默认包含子串）。格式错误时抛出ValueError。
+    """
+    file_types = FILE_TYPES if file_types is None else file_types
+    file_type = criteria.get("file_type") or "所有文件"
+
+    ctime_from = ctime_to = None
+    if criteria.get("date_from"):
+        date_from = datetime.strptime(criteria["date_from"], DATE_FORMAT)
+        ctime_from = datetime.combine(date_from, datetime.min.time()).timestamp()
+    if criteria.get("date_to"):
+        date_to = datetime.strptime(criteria["date_to"], DATE_FORMAT)
+        ctime_to = datetime.combine(date_to, datetime.max.time()).timestamp()
+
+    date_source = criteria.get("date_source") or DATE_SOURCE_CTIME
+    if date_source not in DATE_SOURCES:
+        raise ValueError(f"未知的日期依据: {date_source}")
+    capture_from = capture_to = None
+    if date_source == DATE_SOURCE_EXIF:
+        capture_from, capture_to = ctime_from, ctime_to
+        ctime_from = ctime_to = None
+
+    name_query = None
+    if criteria.get("name_query"):
+        name_query = NameQuery(criteria["name_query"], criteria.get("name_mode") or NAME_MODE_SUBSTRING)
+
+    return SearchCriteria(
+        file_types.get(file_type, file_type),
+        parse_size_kb(criteria.get("size_min")) or 0,
+        parse_size_kb(criteria.get("size_max")),
+        ctime_from,
+        ctime_to,
+        capture_from,
+        capture_to,
+        name_query
+    )
+
+
+def search(root, criteria, workers=1, index=None, cancel_event=None, on_scanned=None, onerror=None,
+           snapshots=None, capture_dates=None, limits=None, breadth_first=False, cache=None, stats=None):
+    """在root下搜索满足条件的文件，逐个生成FileRecord
+
+    workers: 遍历线程数，大于1时并行枚举子目录（结果顺序不变）
+    index: 可选，MetadataIndex，提供时先增量刷新索引再查询，不遍历整个目录树
+    snapshots: 可选，SnapshotStore，与index一起使用；已安装NumPy时把索引数据保存为列式快照，
+        以向量化的方式筛选，索引内容变化后自动重新生成（snapshots.background为True时在后台生成）
+    capture_dates: 可选，CaptureDateReader，条件包含拍摄时间时使用（提供持久缓存和进程池），
+        未提供时每次搜索使用新的读取器，拍摄时间只在这次搜索中缓存于内存
+    cancel_event: 可选，threading.Event，设置后尽快停止
+    on_scanned: 可选，每检查一个文件名（或索引刷新时每枚举一个目录，cache命中时每生成一个目录的缓存文件）调用，参数为文件数
+    onerror: 可选，目录无法访问或属性读取失败时调用，参数为OSError
+    limits: 可选，SearchLimits，限制结果数量、搜索时间和目录深度，搜索结束后可以读取stop_reason
+    breadth_first: 为True时按层遍历，浅层目录中的文件先生成（等待枚举的目录数有上限，内存占用不变）；
+        通过索引查询时不适用
+    cache: 可选，QueryCache，不使用索引时缓存遍历结果，相同的搜索只重新枚举修改时间变化的目录；
+        limits设置了任何限制时不使用（结果可能不完整）
+    stats: 可选，SearchStats，记录各阶段的耗时、枚举的目录和文件数以及无法访问的文件数
+    """
+    max_depth = None
+    if limits is not None:
+        # 限制条件代替cancel_event，超时或用户取消时遍历在下一个文件处停止
+        limits.start(cancel_event)
+        cancel_event = limits
+        max_depth = limits.max_depth
+        # 索引保存整个目录树，限制深度时直接遍历
+        if max_depth is not None:
+            index = None
+
+    # 条件只编译一次：文件类型和文件名在读取属性前筛选，大小和创建时间在创建结果前筛选
+    stat_filter = criteria.compile_stat_filter()
+    name_filter = criteria.compile_name_filter()
+    # 缓存命中时按生成的文件数报告进度，重新枚举目录时不再逐个计数
+    cached_name_filter = name_filter
+
+    if on_scanned is not None:
+        matcher = name_filter or (lambda name: True)
+
+        def name_filter(name):
+            on_scanned(1)
+            return matcher(name)
+
+    if stats is not None:
+        # 没有onerror回调时错误也计入统计
+        report_error = onerror
+
+        def onerror(e):
+            stats.add_error(e)
+            if report_error is not None:
+                report_error(e)
+
+    if index is not None:
+        # 先增量刷新索引（只重新枚举修改时间变化的目录），再直接查询索引
+        on_progress = on_scanned
+        if stats is not None:
+            def on_progress(count):
+                stats.add_directory(count)
+                if on_scanned is not None:
+                    on_scanned(count)
+            index_start = time.perf_counter()
+        index.refresh(root, onerror=onerror, cancel_event=cancel_event, on_progress=on_progress)
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        snapshot = None
+        # 文件名查询有可以用于索引的片段时，三字符片段索引比在快照中逐个匹配文件名更快
+        name_query = criteria.name_query
+        if name_query is not None and name_query.fragments and index.name_index_available():
+            snapshots = None
+        if snapshots is not None and snapshot_available():
+            snapshot = load_snapshot(root, index, snapshots, cancel_event)
+        if snapshot is not None:
+            # 大小、日期和扩展名条件以向量化的掩码一次筛选
+            entries = snapshot.query(criteria, cancel_event)
+        else:
+            entries = query_index(root, index, criteria, cancel_event)
+        if stats is not None:
+            # 刷新和打开快照的耗时，加上逐个生成查询结果的耗时
+            stats.add_time("index", time.perf_counter() - index_start)
+            entries = stats.timed(entries, "index")
+    else:
+        def walk(folder, on_directory=None):
+            if workers > 1:
+                return parallel_scan_files(folder, workers, name_filter, onerror=onerror, cancel_event=cancel_event,
+                                           stat_filter=stat_filter, max_depth=max_depth,
+                                           breadth_first=breadth_first, on_directory=on_directory, stats=stats)
+            return scan_files(folder, name_filter, onerror=onerror, cancel_event=cancel_event,
+                              stat_filter=stat_filter, max_depth=max_depth, breadth_first=breadth_first,
+                              on_directory=on_directory, stats=stats)
+
+        if cache is not None and (limits is None or limits.unlimited):
+            # 目录树没有变化时直接返回缓存的结果，只重新枚举修改时间变化的目录
+            entries = cache.search((root, criteria.walk_key()), root, walk,
+                                   lambda path: scan_directory(path, cached_name_filter, cancel_event,
+                                                               stat_filter=stat_filter, stats=stats),
+                                   onerror=onerror, cancel_event=cancel_event, breadth_first=breadth_first,
+                                   on_cached=on_scanned)
+        else:
+            entries = walk(root)
+
+    if criteria.uses_capture_time:
+        # 拍摄时间需要读取文件头，只对已满足其他条件的文件检查；没有提供读取器时不在搜索之间缓存
+        if capture_dates is None:
+            capture_dates = CaptureDateReader()
+        entries = filter_capture_time(entries, criteria, capture_dates, cancel_event, stats)
+
+    # 遍历和索引查询生成的元组都已满足全部条件
+    yield from limit_results(map(FileRecord._make, entries), limits)
+
+
+def limit_results(records, limits=None):
+    """按limits.max_results截断结果，生成最后一个结果后立即停止，不再继续遍历"""
+    if limits is None or limits.max_results is None:
+        yield from records
+        return
+    if limits.max_results <= 0:
+        limits.stop(STOP_MAX_RESULTS)
+        return
+    for count, record in enumerate(records, 1):
+        yield record
+        if count >= limits.max_results:
+            limits.stop(STOP_MAX_RESULTS)
+            return
+
+
+def split_roots(text):
+    """把文件夹输入按分号拆分为搜索根目录列表；整个输入是一个存在的文件夹时不拆分（文件夹名可能包含分号）"""
+    text = (text or "").strip()
+    if not text:
+        return []
+    if os.path.isdir(text):
+        return [text]
+    return [part.strip() for part in text.split(ROOT_SEPARATOR) if part.strip()]
+
+
+def is_inside(path, parent):
+    """规范化的路径path是否为parent本身或位于parent之下"""
+    try:
+        return os.path.commonpath([path, parent]) == parent
+    except ValueError:
+        # 不同驱动器上的路径
+        return False
+
+
+def normalize_roots(roots):
+    """去掉重复和嵌套的搜索根目录，返回 (保留的根目录列表, [(去掉的根目录, 原因)])
+
+    按realpath和(st_dev, st_ino)识别同一个目录（包括符号链接和写法不同的路径）；
+    位于其他根目录之下的根目录也去掉，遍历外层目录时已经包括其中的文件。保留的根目录按输入顺序排列。
+    """
+    candidates = []
+    dropped = []
+    for root in roots:
+        real = os.path.normcase(os.path.realpath(root))
+        try:
+            root_stat = os.stat(root)
+            key = (root_stat.st_dev, root_stat.st_ino)
+        except OSError:
+            key = None
+        same = next((other for other, other_real, other_key in candidates
+                     if other_real == real or (key is not None and other_key == key)), None)
+        if same is not None:
+            dropped.append((root, f"与{same}是同一个文件夹"))
+        else:
+            candidates.append((root, real, key))
+
+    kept = []
+    for root, real, _ in candidates:
+        parent = next((other for other, other_real, _ in candidates
+                       if other_real != real and is_inside(real, other_real)), None)
+        if parent is not None:
+            dropped.append((root, f"位于{parent}之下"))
+        else:
+            kept.append(root)
+    return kept, dropped
+
+
+def physical_device(path):
+    """返回path所在的物理设备标识，同一块磁盘上的目录返回相同的值
+
+    Linux下把分区映射到所在的磁盘（/sys/dev/block），其他系统使用st_dev（卷），无法访问时返回path本身。
+    """
+    try:
+        device = os.stat(path).st_dev
+    except OSError:
+        return path
+    block = os.path.realpath(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}") if hasattr(os, "major") else None
+    if block and os.path.exists(os.path.join(block, "partition")):
+        return os.path.dirname(block)
+    return block if block and os.path.exists(block) else device
+
+
+def search_roots(roots, criteria, workers=1, index=None, cancel_event=None, on_scanned=None, onerror=None,
+                 snapshots=None, capture_dates=None, limits=None, breadth_first=False, cache=None, stats=None):
+    """在多个根目录下搜索满足条件的文件，合并为一个FileRecord流
+
+    roots应先用normalize_roots去掉重复和嵌套的根目录。同一物理设备上的根目录在一个线程中依次遍历
+    （同一块磁盘上并发遍历只会增加寻道），不同设备在各自的线程中同时遍历，结果按到达的顺序合并。
+    其他参数与search相同，onerror和on_scanned会在遍历线程中调用；结果数量、时间限制和拍摄时间条件
+    作用于合并后的全部结果。只有一个根目录时等同于search。
+    """
+    if len(roots) == 1:
+        yield from search(roots[0], criteria, workers, index, cancel_event, on_scanned, onerror,
+                          snapshots, capture_dates, limits, breadth_first, cache, stats)
+        return
+
+    if limits is not None:
+        # 各个遍历线程共用同一个时间限制，用户取消时同样停止
+        limits.start(cancel_event)
+        cancel_event = limits
+    max_depth = limits.max_depth if limits is not None else None
+
+    devices = OrderedDict()
+    for root in roots:
+        devices.setdefault(physical_device(root), []).append(root)
+
+    # 拍摄时间在合并后的结果上筛选，只在当前线程中读取
+    walk_criteria = criteria.without_capture_time() if criteria.uses_capture_time else criteria
+    results = queue.Queue(maxsize=MERGE_QUEUE_SIZE)
+    stop_event = threading.Event()
+    done = object()
+
+    def put(item):
+        # 调用方停止迭代后不再等待队列空位
+        while not stop_event.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def walk_device(device_roots):
+        try:
+            for root in device_roots:
+                records = search(root, walk_criteria, workers, index, cancel_event, on_scanned, onerror,
+                                 snapshots, limits=None if max_depth is None else SearchLimits(max_depth=max_depth),
+                                 breadth_first=breadth_first, cache=cache, stats=stats)
+                try:
+                    batch = []
+                    flush_time = time.monotonic() + MERGE_FLUSH_INTERVAL
+                    for record in records:
+                        batch.append(record)
+                        if len(batch) >= MERGE_BATCH_SIZE or time.monotonic() >= flush_time:
+                            if not put(batch):
+                                return
+                            batch = []
+                            flush_time = time.monotonic() + MERGE_FLUSH_INTERVAL
+                    if batch and not put(batch):
+                        return
+                finally:
+                    records.close()
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    threads = [threading.Thread(target=walk_device, args=(device_roots,), name="search-device", daemon=True)
+               for device_roots in devices.values()]
+    for thread in threads:
+        thread.start()
+
+    def merged():
+        remaining = len(threads)
+        while remaining:
+            item = results.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield from item
+
+    try:
+        records = merged()
+        if criteria.uses_capture_time:
+            # 没有提供读取器时拍摄时间不在搜索之间缓存
+            if capture_dates is None:
+                capture_dates = CaptureDateReader()
+            records = filter_capture_time(records, criteria, capture_dates, cancel_event, stats)
+        yield from limit_results(records, limits)
+    finally:
+        stop_event.set()
+
+
+def compile_capture_filter(criteria):
+    """把拍摄时间条件编译为函数 f(元组, 拍摄时间戳或None)，没有拍摄时间的文件按修改时间比较"""
+    capture_from = float("-inf") if criteria.capture_from is None else criteria.capture_from
+    capture_to = float("inf") if criteria.capture_to is None else criteria.capture_to
+
+    def capture_filter(entry, captured):
+        if captured is None:
+            captured = entry[4]
+        return capture_from <= captured <= capture_to
+    return capture_filter
+
+
+def filter_capture_time(entries, criteria, capture_dates, cancel_event=None, stats=None):
+    """按EXIF拍摄时间筛选scan_files格式的元组，没有拍摄时间的文件按修改时间比较"""
+    capture_filter = compile_capture_filter(criteria)
+    for entry, captured in capture_dates.capture_times(entries, cancel_event, stats):
+        if capture_filter(entry, captured):
+            yield entry
+
+
+def refine(rows, row, criteria, previous=None, capture_dates=None, cancel_event=None, stats=None):
+    """在已有的搜索结果中筛选满足criteria的结果，逐个生成行号，不访问目录
+
+    rows: 行号序列；row(行号) 返回scan_files格式的元组
+    previous: 得到这些结果的条件，拍摄时间范围与其相同时不再读取拍摄时间
+    capture_dates: 可选，CaptureDateReader，需要按拍摄时间筛选时使用，未提供时拍摄时间不在多次筛选之间缓存
+    stats: 可选，SearchStats，筛选的耗时计入filter阶段，读取拍摄时间的耗时计入exif阶段
+    """
+    predicate = criteria.compile_predicate()
+    matched = ((index, entry) for index, entry in ((index, row(index)) for index in rows)
+               if predicate(entry[0], entry[2], entry[3]))
+    if stats is not None:
+        matched = stats.timed(matched, "filter")
+
+    same_capture = (previous is not None and previous.capture_from == criteria.capture_from
+                    and previous.capture_to == criteria.capture_to)
+    if not criteria.uses_capture_time or same_capture:
+        for index, _ in matched:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield index
+        return
+
+    # capture_times按输入顺序逐个返回结果，用队列记录对应的行号
+    if capture_dates is None:
+        capture_dates = CaptureDateReader()
+    capture_filter = compile_capture_filter(criteria)
+    indices = deque()
+
+    def entries():
+        for index, entry in matched:
+            indices.append(index)
+            yield entry
+
+    for entry, captured in capture_dates.capture_times(entries(), cancel_event, stats):
+        index = indices.popleft()
+        if capture_filter(entry, captured):
+            yield index
+
+
+def query_index(root, index, criteria, cancel_event=None):
+    """在元数据索引中查询满足条件的文件，大小和时间条件都在SQL中筛选
+
+    文件名查询先用三字符片段索引找出包含其字面片段的文件，再在查询结果上确认。
+    """
+    matcher = criteria.matcher
+    # 只包含扩展名的类型直接在SQL中筛选，其他模式在查询结果上匹配
+    extensions = matcher.extensions if matcher.extensions_only else None
+    index_filter = criteria.compile_name_filter(check_type=not matcher.extensions_only)
+    name_fragments = criteria.name_query.fragments if criteria.name_query is not None else None
+    return index.query(root, index_filter, criteria.size_min, criteria.size_max,
+                       criteria.ctime_from, criteria.ctime_to,
+                       cancel_event=cancel_event, extensions=extensions, name_fragments=name_fragments)
+
+
+def load_snapshot(root, index, snapshots, cancel_event=None):
+    """打开与索引内容一致的快照，过期或不存在时从索引重新生成；失败或取消时返回None
+
+    snapshots.background为True时在后台线程中重新生成并返回None，这次搜索直接查询索引，
+    生成快照（逐个读取索引中的全部文件）不会拖慢索引内容有少量变化之后的搜索。
+    """
+    version = index.changed_time(root)
+    snapshot = snapshots.load(root, version)
+    if snapshot is None and snapshots.background:
+        snapshots.build_in_background(root, lambda: index.query(root), version)
+    elif snapshot is None:
+        try:
+            snapshot = snapshots.build(root, index.query(root, cancel_event=cancel_event), version, cancel_event)
+        except OSError as e:
+            print(f"生成元数据快照失败: {e}")
+            return None
+    return snapshot
+
+
+def load_history_entry(history_file, number):
+    """读取界面保存的第number条历史记录（从1开始，最新的为1），不存在时抛出ValueError"""
+    try:
+        with open(history_file, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"无法读取历史记录: {e}")
+    if not isinstance(history, list) or not 1 <= number <= len(history) or not isinstance(history[number - 1], dict):
+        raise ValueError(f"历史记录中没有第{number}条")
+    return history[number - 1]
+
+
+def main(argv=None):
+    """命令行入口: python search_engine.py 文件夹 [文件夹 ...] [选项]，每行输出一个匹配的文件路径，或导出到文件"""
+    parser = argparse.ArgumentParser(description="按文件类型、大小和创建日期或拍摄日期搜索文件（无界面）")
+    parser.add_argument("root", nargs="*",
+                        help="搜索文件夹，可以指定多个（重复和嵌套的文件夹只搜索一次），使用--history-entry时可省略")
+    parser.add_argument("--type", default="所有文件",
+                        help="文件类型名称（如RAW格式）或通配符模式（如\"*.cr2;*.cr3\"）")
+    parser.add_argument("--name", help="文件名查询，默认匹配包含该文本的文件名（忽略大小写）")
+    parser.add_argument("--name-mode", choices=NAME_MODES, default=NAME_MODE_SUBSTRING,
+                        help="文件名查询的匹配方式：包含子串(substring)、通配符(glob)或正则表达式(regex)")
+    parser.add_argument("--min-size", help="最小大小(KB)")
+    parser.add_argument("--max-size", help="最大大小(KB)")
+    parser.add_argument("--date-from", help="起始日期，格式YYYY-MM-DD")
+    parser.add_argument("--date-to", help="结束日期（包含当天），格式YYYY-MM-DD")
+    parser.add_argument("--date-source", choices=DATE_SOURCES, default=DATE_SOURCE_CTIME,
+                        help="日期条件比较创建时间(ctime)或EXIF拍摄时间(exif)")
+    parser.add_argument("--exif-cache", metavar="DB", help="与--date-source exif一起使用，拍摄时间缓存数据库")
+    parser.add_argument("--workers", type=int, default=1, help="遍历线程数")
+    parser.add_argument("--max-results", type=int, metavar="N", help="找到N个文件后停止搜索")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS", help="搜索超过指定秒数后停止")
+    parser.add_argument("--max-depth", type=int, metavar="N",
+                        help="最多进入N层子目录，0表示只搜索文件夹本身（不使用--index）")
+    parser.add_argument("--breadth-first", action="store_true", help="按层遍历，浅层目录中的文件先输出")
+    parser.add_argument("--index", metavar="DB", help="使用指定的元数据索引数据库")
+    parser.add_argument("--snapshot", metavar="DIR", help="与--index一起使用，在指定文件夹中保存列式快照（需要NumPy）")
+    parser.add_argument("--details", action="store_true", help="同时输出大小(字节)和创建、修改时间")
+    parser.add_argument("--profile", action="store_true", help="使用cProfile分析搜索过程，结果输出到标准错误")
+    parser.add_argument("--stats", action="store_true", help="搜索结束后把各阶段的耗时和计数输出到标准错误")
+    parser.add_argument("--output", metavar="FILE", help="把结果边搜索边导出到文件（.csv或.jsonl），\"-\"表示标准输出")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="导出格式，默认按--output的扩展名判断")
+    parser.add_argument("--history-entry", type=int, metavar="N",
+                        help="使用界面保存的第N条历史记录（最新的为1）的文件夹和搜索条件，忽略其他条件选项")
+    parser.add_argument("--history-file", default=os.path.join(APP_DIR, "search_history.json"),
+                        help="历史记录文件，默认为程序目录中的search_history.json")
+    args = parser.parse_args(argv)
+
+    # 与界面一致，支持自定义文件类型分组
+    file_types = dict(FILE_TYPES)
+    file_types.update(load_custom_file_types(os.path.join(APP_DIR, "custom_file_types.json")))
+
+    try:
+        if args.history_entry is not None:
+            search_criteria = load_history_entry(args.history_file, args.history_entry)
+            roots = args.root or search_criteria.get("roots") or split_roots(search_criteria.get("folder"))
+        else:
+            search_criteria = {
+                "file_type": args.type,
+                "name_query": args.name,
+                "name_mode": args.name_mode,
+                "size_min": args.min_size,
+                "size_max": args.max_size,
+                "date_from": args.date_from,
+                "date_to": args.date_to,
+                "date_source": args.date_source
+            }
+            roots = args.root
+        criteria = criteria_from_dict(search_criteria, file_types)
+    except ValueError as e:
+        parser.error(f"搜索条件格式不正确: {e}")
+    if not roots:
+        parser.error("请指定搜索文件夹")
+    for root in roots:
+        if not os.path.isdir(root):
+            parser.error(f"文件夹不存在: {root}")
+    roots, dropped = normalize_roots(roots)
+    for root, reason in dropped:
+        print(f"忽略文件夹 {root}: {reason}", file=sys.stderr)
+    for name in ("max_results", "time_budget", "max_depth"):
+        value = getattr(args, name)
+        if value is not None and value < 0:
+            parser.error(f"--{name.replace('_', '-')}不能为负数")
+    if args.format and not args.output:
+        parser.error("--format需要与--output一起使用")
+    if args.output and args.output != "-" and not args.format:
+        try:
+            export_format(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+
+    index = None
+    if args.index:
+        from metadata_index import MetadataIndex
+        index = MetadataIndex(args.index)
+    snapshots = None
+    if args.snapshot:
+        if not args.index:
+            parser.error("--snapshot需要与--index一起使用")
+        if not snapshot_available():
+            parser.error("--snapshot需要安装NumPy")
+        from metadata_snapshot import SnapshotStore
+        snapshots = SnapshotStore(args.snapshot)
+
+    capture_dates = CaptureDateReader(args.exif_cache) if criteria.uses_capture_time else None
+    limits = None
+    if args.max_results is not None or args.time_budget is not None or args.max_depth is not None:
+        limits = SearchLimits(args.max_results, args.time_budget, args.max_depth)
+
+    stats = SearchStats() if args.stats else None
+
+    def onerror(e):
+        print(f"无法访问: {e}", file=sys.stderr)
+
+    def run():
+        records = search_roots(roots, criteria, args.workers, index, onerror=onerror, snapshots=snapshots,
+                               capture_dates=capture_dates, limits=limits, breadth_first=args.breadth_first,
+                               stats=stats)
+        if args.output:
+            # 结果直接从遍历写入文件，不在内存中保存
+            return export_records(records, args.output, args.format)
+        count = 0
+        for record in records:
+            if args.details:
+                print(f"{record.size}\t{record.ctime:.0f}\t{record.mtime:.0f}\t{record.path}")
+            else:
+                print(record.path)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        count = profiler.runcall(run)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+    else:
+        count = run()
+    if capture_dates is not None:
+        capture_dates.close()
+    print(f"找到 {count} 个文件，耗时 {time.perf_counter() - start:.2f} 秒", file=sys.stderr)
+    if stats is not None:
+        stats.matches = count
+        for line in format_stats(stats.to_record()):
+            print(line, file=sys.stderr)
+    if limits is not None and limits.stop_reason is not None:
+        print(f"搜索提前结束: {STOP_REASON_NAMES[limits.stop_reason]}，结果不完整", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    # 读取拍摄时间使用进程池，打包为可执行文件后需要
+    freeze_support()
+    sys.exit(main())
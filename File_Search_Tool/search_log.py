@@ -0,0 +1,315 @@
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+# 当前日志文件名，轮转后的文件依次为 search_log.1.jsonl、search_log.2.jsonl ...
+LOG_FILE_NAME = "search_log.jsonl"
+
+# 旧版本每次搜索单独生成的日志文件
+LEGACY_LOG_PATTERN = "search_log_*.txt"
+
+# 迁移后旧日志文件的存放目录（位于日志文件夹内）
+LEGACY_ARCHIVE_FOLDER = "legacy"
+
+# fsync策略：always 每条日志都落盘；interval 最多每隔FSYNC_INTERVAL秒落盘一次；never 交给操作系统
+FSYNC_POLICIES = ("always", "interval", "never")
+FSYNC_INTERVAL = 5.0
+
+# 从文件末尾向前读取日志时每次读取的字节数
+READ_BLOCK_SIZE = 64 * 1024
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class SearchLog:
+    """追加写入的JSON Lines搜索日志，每条搜索一行，按文件大小轮转
+
+    每条记录是一个JSON对象，字段含义见log_abbreviations.md。
+    """
+
+    def __init__(self, log_folder, max_bytes=5 * 1024 * 1024, backup_count=5, fsync_policy="interval"):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"未知的fsync策略: {fsync_policy}")
+        self.log_folder = log_folder
+        self.log_path = os.path.join(log_folder, LOG_FILE_NAME)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.fsync_policy = fsync_policy
+        self.last_fsync = 0.0
+        # 旧日志迁移在后台线程中进行，与界面线程的写入互斥
+        self.lock = threading.Lock()
+
+    def backup_path(self, number):
+        """第number个轮转文件的路径"""
+        base, ext = os.path.splitext(self.log_path)
+        return f"{base}.{number}{ext}"
+
+    def log_files(self):
+        """按从新到旧的顺序返回所有存在的日志文件"""
+        paths = [self.log_path] + [self.backup_path(i) for i in range(1, self.backup_count + 1)]
+        return [path for path in paths if os.path.exists(path)]
+
+    def append(self, record):
+        """追加一条日志记录"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        data = line.encode("utf-8")
+
+        with self.lock:
+            # 写入后超过大小上限时先轮转
+            try:
+                if self.max_bytes and os.path.getsize(self.log_path) + len(data) > self.max_bytes:
+                    self.rotate()
+            except OSError:
+                pass
+
+            with open(self.log_path, "ab") as f:
+                f.write(data)
+                if self.should_fsync():
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def should_fsync(self):
+        if self.fsync_policy == "always":
+            return True
+        if self.fsync_policy == "interval":
+            now = time.monotonic()
+            if now - self.last_fsync >= FSYNC_INTERVAL:
+                self.last_fsync = now
+                return True
+        return False
+
+    def rotate(self):
+        """轮转日志文件，超出保留数量的最旧文件被删除"""
+        if self.backup_count <= 0:
+            os.remove(self.log_path)
+            return
+        oldest = self.backup_path(self.backup_count)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self.backup_path(i)):
+                os.replace(self.backup_path(i), self.backup_path(i + 1))
+        os.replace(self.log_path, self.backup_path(1))
+
+    def iter_records(self, newest_first=False):
+        """依次读取所有日志文件中的记录，默认从最旧到最新；newest_first为True时从文件末尾向前按需读取"""
+        if newest_first:
+            for path in self.log_files():
+                yield from read_log_records_reversed(path)
+            return
+        for path in reversed(self.log_files()):
+            yield from read_log_records(path)
+
+
+def read_log_records(path):
+    """读取一个JSON Lines日志文件，跳过无法解析的行（例如写入中断留下的半行）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = parse_log_line(line)
+                if record is not None:
+                    yield record
+    except OSError as e:
+        print(f"读取日志文件 {path} 失败: {e}")
+
+
+def read_log_records_reversed(path, block_size=READ_BLOCK_SIZE):
+    """从文件末尾向前按块读取JSON Lines日志，逐个生成记录（最新的在前）
+
+    只读取已用到的部分；每块单独打开文件，暂停读取时不占用文件（轮转时可以重命名）。
+    """
+    try:
+        position = os.path.getsize(path)
+        remainder = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            with open(path, "rb") as f:
+                f.seek(position)
+                lines = (f.read(size) + remainder).split(b"\n")
+            # 块的第一行可能不完整，与前一块拼接后再解析
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                record = parse_log_line(line)
+                if record is not None:
+                    yield record
+        record = parse_log_line(remainder)
+        if record is not None:
+            yield record
+    except OSError as e:
+        print(f"读取日志文件 {path} 失败: {e}")
+
+
+def parse_log_line(line):
+    """解析一行日志，空行和无法解析的行（例如写入中断留下的半行）返回None"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def read_first_line(path):
+    """读取日志文件的第一行，轮转只会重命名文件，因此第一行可以用来识别同一个文件"""
+    try:
+        with open(path, "rb") as f:
+            line = f.readline()
+    except OSError:
+        return ""
+    return line.decode("utf-8", errors="replace") if line.endswith(b"\n") else ""
+
+
+def read_log_records_from(path, offset=0):
+    """从指定字节位置开始读取日志记录，返回 (记录列表, 已读取到的位置)
+
+    末尾没有换行符的半行（可能正在写入）不计入已读取的位置，下次会重新读取。
+    """
+    records = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    except OSError as e:
+        print(f"读取日志文件 {path} 失败: {e}")
+    return records, offset
+
+
+def parse_size(value):
+    """把日志中的大小字段转换为数字，空值或"不限制"表示不限制(None)，无法转换时保留原文"""
+    if value in ("", None, "Unlimited", "不限制"):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_legacy_log(content):
+    """解析旧版本的单文件日志，返回新格式的记录，无法解析时返回None
+
+    支持版本2.0的单行CSV格式，以及版本1.0的多行文本格式。
+    """
+    content = content.strip()
+    if not content:
+        return None
+
+    if "\n" not in content:
+        # 版本2.0: 时间戳,状态,文件夹,开始日期,结束日期,文件类型,最小大小,最大大小,结果
+        parts = content.split(",")
+        if len(parts) < 9:
+            return None
+        # 文件夹中可能包含逗号，以其后两个日期字段定位文件夹的结束位置
+        end = 3
+        for i in range(3, len(parts) - 1):
+            if DATE_PATTERN.match(parts[i]) and DATE_PATTERN.match(parts[i + 1]):
+                end = i
+                break
+        rest = parts[end:]
+        if len(rest) < 6:
+            return None
+        record = {
+            "ts": parts[0],
+            "st": parts[1],
+            "folder": ",".join(parts[2:end]),
+            "date_from": rest[0],
+            "date_to": rest[1],
+            "type": rest[2],
+            "size_min": parse_size(rest[3]) or 0,
+            "size_max": parse_size(rest[4])
+        }
+        result = rest[5:]
+        if record["st"] == "S" and len(result) >= 2:
+            try:
+                record["count"] = int(result[0])
+                record["time"] = float(result[1])
+            except ValueError:
+                record["result"] = ",".join(result)
+        else:
+            record["error"] = ",".join(result)
+        return record
+
+    # 版本1.0: 多行文本，支持中英文字段名
+    record = {"st": "S"}
+    for line in content.splitlines():
+        line = line.strip()
+        key, sep, value = line.partition(":")
+        if line.startswith("Search Log - ") or line.startswith("搜索日志 - "):
+            timestamp = line.split(" - ", 1)[1].strip()
+            record["ts"] = timestamp.replace("-", "").replace(":", "").replace(" ", "_")
+        elif not sep:
+            continue
+        elif key in ("Search Folder", "搜索文件夹"):
+            record["folder"] = value.strip()
+        elif key in ("Date Range", "日期范围"):
+            separator = "to" if "to" in value else "至"
+            if separator in value:
+                date_from, date_to = value.split(separator, 1)
+                record["date_from"] = date_from.strip()
+                record["date_to"] = date_to.strip()
+        elif key in ("File Type", "文件类型"):
+            record["type"] = value.strip()
+        elif key in ("Size Range", "大小范围"):
+            separator = "to" if "to" in value else "至"
+            if separator in value:
+                size_min, size_max = value.split(separator, 1)
+                record["size_min"] = parse_size(size_min.replace("KB", "").strip()) or 0
+                record["size_max"] = parse_size(size_max.replace("KB", "").strip())
+    if "ts" not in record or "folder" not in record:
+        return None
+    return record
+
+
+def migrate_legacy_logs(log_folder, search_log):
+    """把旧版本每次搜索一个的.txt日志导入JSON Lines日志，返回导入的记录数
+
+    导入后的旧文件移动到日志文件夹下的legacy目录，之后启动时不会再扫描它们。
+    """
+    legacy_files = sorted(glob.glob(os.path.join(log_folder, LEGACY_LOG_PATTERN)))
+    if not legacy_files:
+        return 0
+
+    archive_folder = os.path.join(log_folder, LEGACY_ARCHIVE_FOLDER)
+    os.makedirs(archive_folder, exist_ok=True)
+
+    # 文件名包含毫秒时间戳，按文件名排序即按时间顺序导入
+    imported = 0
+    for path in legacy_files:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = parse_legacy_log(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"读取旧日志文件 {path} 失败: {e}")
+            continue
+        if record is not None:
+            search_log.append(record)
+            imported += 1
+        try:
+            shutil.move(path, os.path.join(archive_folder, os.path.basename(path)))
+        except OSError as e:
+            print(f"移动旧日志文件 {path} 失败: {e}")
+    return imported
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 手动迁移: python search_log.py [日志文件夹]
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_logs")
+    count = migrate_legacy_logs(folder, SearchLog(folder))
+    print(f"已导入 {count} 条旧日志记录")
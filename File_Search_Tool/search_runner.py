@@ -0,0 +1,70 @@
+import queue
+import threading
+
+
+class SearchRunner:
+    """在后台工作线程中执行搜索，通过队列把匹配结果交给界面线程
+
+    search_func(runner) 需要返回一个结果生成器，它运行在工作线程中，
+    不能访问任何Tk控件；可以通过runner.add_scanned()更新已扫描文件数，
+    并通过runner.cancel_event响应取消。
+    """
+
+    def __init__(self, search_func):
+        self.search_func = search_func
+        self.results = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.thread = None
+        # 已扫描的文件数，由搜索过程更新（可能来自多个遍历线程），界面线程只读
+        self.scanned = 0
+        self.scanned_lock = threading.Lock()
+        # 工作线程中出现的异常
+        self.error = None
+
+    def start(self):
+        """启动工作线程"""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            for row in self.search_func(self):
+                if self.cancel_event.is_set():
+                    break
+                self.results.put(row)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done_event.set()
+
+    def add_scanned(self, count=1):
+        """累加已扫描文件数，可在多个线程中调用"""
+        with self.scanned_lock:
+            self.scanned += count
+
+    def cancel(self):
+        """请求停止搜索，工作线程会在下一个文件或目录处退出"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_done(self):
+        """工作线程是否已经结束（队列中可能仍有未取出的结果）"""
+        return self.done_event.is_set()
+
+    def drain(self, max_items):
+        """取出最多max_items条结果，供界面线程批量显示"""
+        rows = []
+        try:
+            while len(rows) < max_items:
+                rows.append(self.results.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def is_finished(self):
+        """工作线程已结束且所有结果都已取出"""
+        return self.done_event.is_set() and self.results.empty()
@@ -0,0 +1,107 @@
+import threading
+import time
+
+# 搜索的各个阶段，日志和日志解释程序按这个顺序显示
+PHASE_NAMES = {
+    "list": "枚举目录",
+    "stat": "读取属性",
+    "filter": "条件筛选",
+    "index": "索引刷新和查询",
+    "exif": "读取拍摄时间",
+    "render": "显示结果"
+}
+
+
+class SearchStats:
+    """一次搜索的分阶段耗时和计数，遍历线程和界面线程都可以更新
+
+    phases: 阶段 -> 累计秒数。并行遍历时list、stat和filter为各线程的时间之和，可能超过搜索的总耗时；
+        遍历与显示同时进行，各阶段之和也不等于总耗时
+    dirs: 枚举的目录数（包括刷新索引时重新枚举的目录）
+    files: 检查过文件名的文件数
+    matches: 找到的文件数，由调用方在搜索结束后设置
+    errors: 无法访问的目录和文件数，包括没有onerror回调时被忽略的错误；denied为其中因权限不足的数量
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = dict.fromkeys(PHASE_NAMES, 0.0)
+        self.dirs = 0
+        self.files = 0
+        self.matches = 0
+        self.errors = 0
+        self.denied = 0
+        # 遍历时抽样计时的位置，在目录之间延续（多个线程同时更新时只影响抽到哪些文件）
+        self.sample_phase = 0
+
+    def add_time(self, phase, seconds):
+        """把一段耗时计入phase"""
+        with self.lock:
+            self.phases[phase] += seconds
+
+    def add_directory(self, files, list_time=0.0, stat_time=0.0, filter_time=0.0):
+        """记录枚举完的一个目录：检查的文件数，以及枚举目录、读取属性和条件筛选的耗时"""
+        with self.lock:
+            self.dirs += 1
+            self.files += files
+            self.phases["list"] += list_time
+            self.phases["stat"] += stat_time
+            self.phases["filter"] += filter_time
+
+    def add_error(self, error):
+        """记录一个无法访问的目录或文件"""
+        with self.lock:
+            self.errors += 1
+            if isinstance(error, PermissionError):
+                self.denied += 1
+
+    def timed(self, iterable, phase):
+        """逐个生成iterable的元素，把生成元素的耗时计入phase，用于索引查询等位于最上游的生成器"""
+        clock = time.perf_counter
+        elapsed = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += clock() - start
+                    return
+                elapsed += clock() - start
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self.add_time(phase, elapsed)
+
+    def to_record(self):
+        """转换为日志记录中的stats字段：各项计数和用到的阶段的耗时（秒）"""
+        with self.lock:
+            return {
+                "dirs": self.dirs,
+                "files": self.files,
+                "matches": self.matches,
+                "errors": self.errors,
+                "denied": self.denied,
+                "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items() if seconds > 0}
+            }
+
+
+def format_stats(record):
+    """把日志记录中的stats字段格式化为多行文本
+
+    各阶段的比例相对于各阶段耗时之和（阶段之间可能重叠，不是相对于搜索的总耗时）。
+    """
+    lines = [f"目录 {record.get('dirs', 0)} 个，检查文件 {record.get('files', 0)} 个，"
+             f"匹配 {record.get('matches', 0)} 个，无法访问 {record.get('errors', 0)} 个"
+             f"（其中权限不足 {record.get('denied', 0)} 个）"]
+    phases = record.get("phases") or {}
+    total = sum(phases.values())
+    for phase, name in PHASE_NAMES.items():
+        if phase in phases:
+            seconds = phases[phase]
+            share = f"{seconds / total:.0%}" if total else "-"
+            lines.append(f"{name}: {seconds:.3f} 秒 ({share})")
+    return lines
@@ -0,0 +1,370 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import sys
+import time
+from collections import defaultdict
+
+from exif_date import CaptureDateReader
+from file_walker import scan_directory
+from search_engine import filter_capture_time
+
+# 轮询方式检查目录修改时间的间隔（秒）
+POLL_INTERVAL = 2.0
+
+# 收到文件变化事件后等待的时间（秒），相机导入等连续写入合并为一批处理
+SETTLE_DELAY = 0.5
+# 连续不断有事件时，最多等待这么久也要处理一次
+MAX_SETTLE_DELAY = 3.0
+
+# 补上搜索期间的变化时，目录修改时间比较的余量（秒）：文件系统的时间精度有限，FAT只有2秒
+SINCE_MARGIN = 2.0
+
+# inotify事件标志（linux/inotify.h）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+# 监视文件的创建、删除、移动和写入完成，以及属性变化（例如复制后设置修改时间）
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+# inotify_event结构的固定部分：wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """通过ctypes调用Linux的inotify接口，不可用时构造函数抛出OSError"""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify只在Linux下可用")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.add_watch_func = libc.inotify_add_watch
+        self.add_watch_func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.rm_watch_func = libc.inotify_rm_watch
+        self.rm_watch_func.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """监视一个目录，返回监视编号；超过系统监视数量上限(ENOSPC)等情况抛出OSError"""
+        wd = self.add_watch_func(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.rm_watch_func(self.fd, wd)
+
+    def read_events(self, timeout):
+        """等待最多timeout秒，返回 [(监视编号, 标志, 名称)]，没有事件时返回空列表"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+            pos += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def dir_key(path):
+    """目录在已知结果中的键：与结果路径的os.path.dirname一致（去掉末尾的路径分隔符）"""
+    return os.path.dirname(os.path.join(path, "_"))
+
+
+class SearchWatcher:
+    """监视一次已完成搜索的文件夹，只为变化的文件生成结果的新增、更新和删除
+
+    Linux下使用inotify监视每个目录，直接得到变化的文件名；inotify不可用或超过监视数量上限时
+    退回轮询：定期检查每个目录的修改时间，只重新枚举修改时间变化的目录。
+    两种方式都不会重新遍历整个目录树。注意轮询方式无法发现原地修改内容的文件（目录修改时间不变）。
+    """
+
+    def __init__(self, root, criteria, entries, capture_dates=None, since=None, use_inotify=True,
+                 poll_interval=POLL_INTERVAL):
+        """entries为已有的搜索结果（scan_files格式的元组），路径格式需要与root一致；
+        since为搜索开始的时间戳，开始监视时重新枚举在这之后修改过的目录，补上搜索期间发生的变化
+        """
+        self.root = root
+        self.criteria = criteria
+        if capture_dates is None and criteria.uses_capture_time:
+            capture_dates = CaptureDateReader()
+        self.capture_dates = capture_dates
+        self.since = since
+        self.use_inotify = use_inotify
+        self.poll_interval = poll_interval
+        # 条件只编译一次
+        self.name_filter = criteria.compile_name_filter()
+        self.stat_filter = criteria.compile_stat_filter()
+        # 目录键 -> {文件名: (大小, 创建时间戳, 修改时间戳)}，只包含满足条件的文件
+        self.known = defaultdict(dict)
+        for name, path, size, ctime, mtime in entries:
+            self.known[os.path.dirname(path)][name] = (size, ctime, mtime)
+        # 已知目录：目录键 -> (枚举用的路径, 修改时间)
+        self.dirs = {}
+        # 当前使用的监视方式，"inotify"或"polling"
+        self.mode = None
+        self.inotify = None
+        self.wd_dirs = {}
+        self.dir_wds = {}
+
+    def watch(self, cancel_event):
+        """持续监视直到cancel_event被设置，逐个生成变化：
+        ("add", 元组)、("update", 元组) 或 ("remove", 路径)，元组格式与scan_files相同
+        """
+        try:
+            self.mode = "polling"
+            if self.use_inotify:
+                try:
+                    self.inotify = Inotify()
+                    self.mode = "inotify"
+                except (OSError, AttributeError) as e:
+                    print(f"inotify不可用，改为轮询目录: {e}")
+
+            # 登记所有目录并补上搜索期间的变化
+            changed = []
+            for scan_path, mtime in self.add_tree(self.root, cancel_event):
+                if self.since is not None and mtime is not None and mtime >= self.since - SINCE_MARGIN:
+                    changed.append(scan_path)
+            yield from self.process(cancel_event, dirty_dirs=changed)
+
+            while not cancel_event.is_set():
+                if self.mode == "inotify":
+                    batch = self.wait_inotify(cancel_event)
+                else:
+                    batch = self.wait_polling(cancel_event)
+                if batch is not None:
+                    yield from self.process(cancel_event, **batch)
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+                self.inotify = None
+
+    def add_tree(self, scan_path, cancel_event=None):
+        """登记目录及其所有子目录（只枚举目录，不读取文件属性），返回 [(枚举用的路径, 修改时间)]"""
+        added = []
+        stack = [scan_path]
+        while stack:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = None
+            self.dirs[dir_key(path)] = (path, mtime)
+            self.add_watch(path)
+            added.append((path, mtime))
+            _, subdirs, _ = scan_directory(path, lambda name: False, cancel_event)
+            stack.extend(sub_path for sub_path, _ in reversed(subdirs))
+        return added
+
+    def add_watch(self, path):
+        if self.mode != "inotify":
+            return
+        try:
+            wd = self.inotify.add_watch(path)
+        except OSError as e:
+            # 超过fs.inotify.max_user_watches等情况下退回轮询，已登记的目录继续有效
+            print(f"无法监视目录，改为轮询: {e}")
+            self.inotify.close()
+            self.inotify = None
+            self.wd_dirs.clear()
+            self.dir_wds.clear()
+            self.mode = "polling"
+            return
+        self.wd_dirs[wd] = path
+        self.dir_wds[dir_key(path)] = wd
+
+    def remove_tree(self, key):
+        """移除目录及其所有子目录，返回这些目录中已知结果的删除变化"""
+        changes = []
+        prefix = key.rstrip(os.sep) + os.sep
+        for sub_key in [k for k in self.dirs if k == key or k.startswith(prefix)]:
+            del self.dirs[sub_key]
+            wd = self.dir_wds.pop(sub_key, None)
+            if wd is not None:
+                self.wd_dirs.pop(wd, None)
+                if self.inotify is not None:
+                    self.inotify.rm_watch(wd)
+        for sub_key in [k for k in self.known if k == key or k.startswith(prefix)]:
+            for name in self.known.pop(sub_key):
+                changes.append(("remove", os.path.join(sub_key, name)))
+        return changes
+
+    def wait_inotify(self, cancel_event):
+        """等待inotify事件并合并为一批，返回process的参数；没有事件时返回None"""
+        dirty_dirs, dirty_files, new_dirs, removed_dirs = set(), set(), set(), set()
+        first_event = None
+        while not cancel_event.is_set():
+            timeout = 0.5 if first_event is None else SETTLE_DELAY
+            events = self.inotify.read_events(timeout)
+            if not events:
+                if first_event is not None:
+                    break
+                continue
+            if first_event is None:
+                first_event = time.monotonic()
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # 事件队列溢出，丢失的变化无法确定，重新枚举所有已知目录
+                    dirty_dirs.update(path for path, _ in self.dirs.values())
+                    continue
+                if mask & IN_IGNORED:
+                    self.wd_dirs.pop(wd, None)
+                    continue
+                parent = self.wd_dirs.get(wd)
+                if parent is None or not name:
+                    continue
+                path = os.path.join(parent, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        removed_dirs.add(path)
+                        new_dirs.discard(path)
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        new_dirs.add(path)
+                        removed_dirs.discard(path)
+                else:
+                    dirty_files.add(path)
+            if time.monotonic() - first_event >= MAX_SETTLE_DELAY:
+                break
+        if first_event is None:
+            return None
+        return {"dirty_dirs": dirty_dirs, "dirty_files": dirty_files, "new_dirs": new_dirs,
+                "removed_dirs": removed_dirs}
+
+    def wait_polling(self, cancel_event):
+        """等待一个轮询间隔后检查所有已知目录的修改时间，返回process的参数；没有变化时返回None"""
+        if cancel_event.wait(self.poll_interval):
+            return None
+        dirty_dirs, removed_dirs = [], []
+        for key, (path, mtime) in list(self.dirs.items()):
+            if cancel_event.is_set():
+                return None
+            try:
+                dir_stat = os.stat(path)
+            except OSError:
+                dir_stat = None
+            if dir_stat is None or not stat.S_ISDIR(dir_stat.st_mode):
+                removed_dirs.append(path)
+            elif dir_stat.st_mtime != mtime:
+                self.dirs[key] = (path, dir_stat.st_mtime)
+                dirty_dirs.append(path)
+        if not dirty_dirs and not removed_dirs:
+            return None
+        return {"dirty_dirs": dirty_dirs, "removed_dirs": removed_dirs}
+
+    def process(self, cancel_event, dirty_dirs=(), dirty_files=(), new_dirs=(), removed_dirs=()):
+        """根据变化的目录和文件生成结果的变化"""
+        changes = []
+        for path in removed_dirs:
+            changes.extend(self.remove_tree(dir_key(path)))
+
+        # 需要判断的文件路径，以及其中按名称、大小和创建时间满足条件的文件
+        checked = set()
+        candidates = []
+
+        def rescan(path):
+            files, subdirs, errors = scan_directory(path, self.name_filter, cancel_event, stat_filter=self.stat_filter)
+            if any(e.filename == path for e in errors):
+                # 目录无法枚举（可能正在被删除），保留已知结果，下次变化时再处理
+                return
+            key = dir_key(path)
+            checked.update(os.path.join(key, name) for name in self.known.get(key, ()))
+            for entry in files:
+                checked.add(entry[1])
+                candidates.append(entry)
+            # 重新枚举时发现的新子目录（轮询方式或事件队列溢出时）
+            for sub_path, _ in subdirs:
+                if dir_key(sub_path) not in self.dirs:
+                    for added_path, _ in self.add_tree(sub_path, cancel_event):
+                        rescan(added_path)
+            # 已不存在的子目录
+            prefix = key.rstrip(os.sep) + os.sep
+            existing = {dir_key(sub_path) for sub_path, _ in subdirs}
+            for sub_key in [k for k in self.dirs if k.startswith(prefix) and os.sep not in k[len(prefix):]]:
+                if sub_key not in existing:
+                    changes.extend(self.remove_tree(sub_key))
+
+        for path in new_dirs:
+            if dir_key(path) not in self.dirs:
+                for added_path, _ in self.add_tree(path, cancel_event):
+                    rescan(added_path)
+        for path in dirty_dirs:
+            if dir_key(path) in self.dirs:
+                rescan(path)
+
+        for path in dirty_files:
+            if path in checked:
+                continue
+            parent, name = os.path.split(path)
+            if dir_key(parent) not in self.dirs:
+                continue
+            checked.add(path)
+            if self.name_filter is not None and not self.name_filter(name):
+                continue
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            if self.stat_filter is not None and not self.stat_filter(file_stat.st_size, file_stat.st_ctime):
+                continue
+            candidates.append((name, path, file_stat.st_size, file_stat.st_ctime, file_stat.st_mtime))
+
+        if cancel_event.is_set():
+            return changes
+
+        # 拍摄时间需要读取文件头，只对其他条件都满足的文件检查
+        if self.criteria.uses_capture_time and candidates:
+            candidates = list(filter_capture_time(candidates, self.criteria, self.capture_dates, cancel_event))
+        matched = {entry[1]: entry for entry in candidates}
+
+        for path in checked:
+            parent, name = os.path.split(path)
+            files = self.known[parent]
+            old = files.get(name)
+            entry = matched.get(path)
+            if entry is None:
+                if old is not None:
+                    del files[name]
+                    changes.append(("remove", path))
+            elif old is None:
+                files[name] = entry[2:]
+                changes.append(("add", entry))
+            elif old != entry[2:]:
+                files[name] = entry[2:]
+                changes.append(("update", entry))
+        return changes
@@ -0,0 +1,9 @@
+"""测试共用的配置：把程序目录加入模块搜索路径，测试直接导入各模块
+
+用法:
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
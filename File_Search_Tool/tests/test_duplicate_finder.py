@@ -0,0 +1,101 @@
+"""查找重复文件的单元测试：按大小、部分哈希和完整哈希逐步筛选后，只有内容完全相同的文件在同一组"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from duplicate_finder import DuplicateFinder, PARTIAL_BLOCK_SIZE
+
+
+class DuplicateFinderTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_duplicates_")
+        self.items = []
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def add(self, name, data):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.items.append((name, path, len(data)))
+
+    def find(self, **kwargs):
+        finder = DuplicateFinder(workers=3, **kwargs)
+        return finder, sorted(sorted(group) for group in finder.find(self.items))
+
+    def test_same_size_different_content(self):
+        self.add("a", b"x" * 1000)
+        self.add("b", b"x" * 1000)
+        self.add("c", b"x" * 999 + b"y")
+        self.add("d", b"z" * 10)
+        finder, groups = self.find()
+        self.assertEqual(groups, [["a", "b"]])
+        # 大小唯一的文件不读取，小文件不计算完整哈希
+        self.assertEqual(finder.partial_hashed, 3)
+        self.assertEqual(finder.full_hashed, 0)
+
+    def test_same_head_and_tail_different_middle(self):
+        head, tail = b"h" * PARTIAL_BLOCK_SIZE, b"t" * PARTIAL_BLOCK_SIZE
+        self.add("a", head + b"m" * 5000 + tail)
+        self.add("b", head + b"m" * 5000 + tail)
+        self.add("c", head + b"m" * 2500 + b"n" + b"m" * 2499 + tail)
+        finder, groups = self.find()
+        self.assertEqual(groups, [["a", "b"]])
+        self.assertEqual(finder.full_hashed, 3)
+
+    def test_zero_byte_files(self):
+        for name in ("a", "b", "c"):
+            self.add(name, b"")
+        self.assertEqual(self.find()[1], [])
+        self.assertEqual(self.find(min_size=0)[1], [["a", "b", "c"]])
+
+    def test_unreadable_file_goes_to_onerror(self):
+        self.add("a", b"same")
+        self.add("b", b"same")
+        self.add("c", b"same")
+        os.remove(os.path.join(self.folder, "c"))
+        errors = []
+        _, groups = self.find(onerror=errors.append)
+        self.assertEqual(groups, [["a", "b"]])
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], OSError)
+
+    def test_on_hashed_counts_each_file_once(self):
+        data = b"d" * (3 * PARTIAL_BLOCK_SIZE)
+        for name in ("a", "b", "c"):
+            self.add(name, data)
+        self.add("small1", b"s" * 100)
+        self.add("small2", b"s" * 100)
+        counts = []
+        lock = threading.Lock()
+
+        def on_hashed(count):
+            with lock:
+                counts.append(count)
+        finder, groups = self.find(on_hashed=on_hashed)
+        self.assertEqual(groups, [["a", "b", "c"], ["small1", "small2"]])
+        self.assertEqual(sum(counts), 5)
+        self.assertEqual(finder.full_hashed, 3)
+
+    def test_cancel(self):
+        data = b"d" * (3 * PARTIAL_BLOCK_SIZE)
+        for name in ("a", "b"):
+            self.add(name, data)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        finder, groups = self.find(cancel_event=cancel_event)
+        self.assertEqual(groups, [])
+        self.assertEqual(finder.bytes_read, 0)
+
+    def test_cancel_after_partial_hashes(self):
+        data = b"d" * (3 * PARTIAL_BLOCK_SIZE)
+        for name in ("a", "b"):
+            self.add(name, data)
+        cancel_event = threading.Event()
+        finder, groups = self.find(cancel_event=cancel_event, on_hashed=lambda count: cancel_event.set())
+        # 取消后不再计算完整哈希
+        self.assertEqual(groups, [])
+        self.assertEqual(finder.full_hashed, 0)
@@ -0,0 +1,184 @@
+"""EXIF拍摄时间的单元测试：各种文件格式的文件头解析和按 (路径, 大小, 修改时间) 失效的缓存"""
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+
+import exif_date
+from exif_date import CaptureDateReader, read_capture_time
+from file_walker import scan_files
+
+CAPTURED = datetime(2024, 5, 17, 9, 30, 15)
+
+
+def tiff_block(captured, order="<", in_exif_ifd=True, exif_offset=26):
+    """拍摄时间保存在Exif子目录（或直接保存在IFD0）中的TIFF结构，exif_offset为Exif子目录的位置"""
+    value = captured.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\0"
+    header = (b"II" if order == "<" else b"MM") + struct.pack(order + "HI", 42, 8)
+    if not in_exif_ifd:
+        value_offset = 8 + 2 + 12 + 4
+        ifd0 = struct.pack(order + "H", 1) + struct.pack(order + "HHII", 0x9003, 2, len(value), value_offset)
+        return header + ifd0 + b"\0" * 4 + value
+    ifd0 = struct.pack(order + "H", 1) + struct.pack(order + "HHII", 0x8769, 4, 1, exif_offset) + b"\0" * 4
+    padding = b"\0" * (exif_offset - len(header) - len(ifd0))
+    value_offset = exif_offset + 2 + 12 + 4
+    exif_ifd = struct.pack(order + "H", 1) + struct.pack(order + "HHII", 0x9003, 2, len(value), value_offset)
+    return header + ifd0 + padding + exif_ifd + b"\0" * 4 + value
+
+
+def jpeg_bytes(captured):
+    tiff = tiff_block(captured, ">")
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0"
+    app1 = b"\xff\xe1" + struct.pack(">H", 2 + 6 + len(tiff)) + b"Exif\0\0" + tiff
+    return b"\xff\xd8" + app0 + app1 + b"\xff\xda" + b"\0" * 100
+
+
+def raf_bytes(captured):
+    """RAF文件头之后是嵌入的JPEG，第84字节起为它的偏移量"""
+    header = b"FUJIFILMCCD-RAW 0201FF393101" + b"\0" * 56
+    offset = len(header) + 4 + 20
+    return header + struct.pack(">I", offset) + b"\0" * 20 + jpeg_bytes(captured)
+
+
+def cr3_bytes(captured):
+    """ISO基本媒体格式，Exif目录保存在CMT2盒中"""
+    ftyp = struct.pack(">I", 24) + b"ftypcrx " + b"\0\0\0\x01" + b"crx isom"
+    tiff = tiff_block(captured, "<")
+    cmt1 = struct.pack(">I", 8 + 16) + b"CMT1" + tiff_block(CAPTURED, "<", False)[:16]
+    cmt2 = struct.pack(">I", 8 + len(tiff)) + b"CMT2" + tiff
+    return ftyp + struct.pack(">I", 8 + len(cmt1) + len(cmt2)) + b"moov" + cmt1 + cmt2
+
+
+class ParseTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_exif_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def write(self, name, data, size=None):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+            if size is not None:
+                f.truncate(size)
+        return path
+
+    def assertCaptured(self, path, captured=CAPTURED):
+        self.assertEqual(read_capture_time(path), captured.timestamp())
+
+    def test_jpeg(self):
+        self.assertCaptured(self.write("a.jpg", jpeg_bytes(CAPTURED)))
+
+    def test_tiff_both_byte_orders(self):
+        self.assertCaptured(self.write("a.tif", tiff_block(CAPTURED, "<")))
+        self.assertCaptured(self.write("b.tif", tiff_block(CAPTURED, ">")))
+
+    def test_date_in_ifd0(self):
+        self.assertCaptured(self.write("a.cr2", tiff_block(CAPTURED, "<", in_exif_ifd=False)))
+
+    def test_exif_ifd_beyond_header(self):
+        offset = exif_date.HEADER_SIZE + 1000
+        self.assertCaptured(self.write("a.nef", tiff_block(CAPTURED, "<", exif_offset=offset), size=offset + 4096))
+
+    def test_raf(self):
+        self.assertCaptured(self.write("a.raf", raf_bytes(CAPTURED)))
+
+    def test_cr3(self):
+        self.assertCaptured(self.write("a.cr3", cr3_bytes(CAPTURED)))
+
+    def test_without_capture_time(self):
+        for name, data in (("empty.jpg", b""), ("text.jpg", b"not an image"),
+                           ("no_exif.jpg", b"\xff\xd8\xff\xe0" + struct.pack(">H", 4) + b"\0\0\xff\xda"),
+                           ("truncated.jpg", jpeg_bytes(CAPTURED)[:40]),
+                           ("bad_date.tif", tiff_block(CAPTURED).replace(b"2024:05:17", b"2024:13:45")),
+                           ("truncated.raf", raf_bytes(CAPTURED)[:86]),
+                           ("no_cmt2.cr3", cr3_bytes(CAPTURED).replace(b"CMT2", b"CMT3"))):
+            self.assertIsNone(read_capture_time(self.write(name, data)), name)
+        self.assertIsNone(read_capture_time(os.path.join(self.folder, "missing.jpg")))
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_exif_cache_")
+        self.reads = []
+        self.original = exif_date.read_capture_time
+
+        def counting_read(path):
+            self.reads.append(os.path.basename(path))
+            return self.original(path)
+        exif_date.read_capture_time = counting_read
+
+    def tearDown(self):
+        exif_date.read_capture_time = self.original
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def write(self, name, captured, mtime=None):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(jpeg_bytes(captured))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def capture_times(self, reader):
+        self.reads = []
+        return {os.path.basename(entry[1]): captured for entry, captured in
+                reader.capture_times(sorted(scan_files(self.folder)))}
+
+    def check_invalidation(self, reader):
+        self.write("a.jpg", CAPTURED, 1000000)
+        self.write("b.jpg", CAPTURED, 1000000)
+        self.write("notes.txt", CAPTURED)
+        self.assertEqual(self.capture_times(reader), {"a.jpg": CAPTURED.timestamp(), "b.jpg": CAPTURED.timestamp(),
+                                                      "notes.txt": None})
+        self.assertEqual(sorted(self.reads), ["a.jpg", "b.jpg"])
+
+        # 没有变化时全部命中缓存
+        self.capture_times(reader)
+        self.assertEqual(self.reads, [])
+
+        # 修改时间变化
+        later = datetime(2025, 1, 2, 3, 4, 5)
+        self.write("a.jpg", later, 2000000)
+        self.assertEqual(self.capture_times(reader)["a.jpg"], later.timestamp())
+        self.assertEqual(self.reads, ["a.jpg"])
+
+        # 修改时间不变、大小变化
+        with open(os.path.join(self.folder, "b.jpg"), "ab") as f:
+            f.write(b"\0" * 10)
+        os.utime(os.path.join(self.folder, "b.jpg"), (1000000, 1000000))
+        self.capture_times(reader)
+        self.assertEqual(self.reads, ["b.jpg"])
+
+    def test_persistent_cache(self):
+        cache_path = os.path.join(self.folder, "cache.db")
+        self.check_invalidation(CaptureDateReader(cache_path, workers=1))
+        # 新的读取器使用保存的缓存
+        self.capture_times(CaptureDateReader(cache_path, workers=1))
+        self.assertEqual(self.reads, [])
+
+    def test_process_pool(self):
+        count = exif_date.POOL_THRESHOLD + 6
+        for i in range(count):
+            self.write(f"IMG_{i:03d}.jpg", datetime(2024, 1, 1, 0, i % 60))
+        exif_date.read_capture_time = self.original
+        reader = CaptureDateReader(workers=2)
+        try:
+            captured = self.capture_times(reader)
+            self.assertIsNotNone(reader.executor)
+        finally:
+            reader.close()
+        self.assertEqual(captured, {f"IMG_{i:03d}.jpg": datetime(2024, 1, 1, 0, i % 60).timestamp()
+                                    for i in range(count)})
+
+    def test_memory_cache_kept_for_reader_lifetime(self):
+        reader = CaptureDateReader(workers=1)
+        try:
+            self.check_invalidation(reader)
+        finally:
+            reader.close()
+        self.capture_times(CaptureDateReader(workers=1))
+        self.assertEqual(sorted(self.reads), ["a.jpg", "b.jpg"])
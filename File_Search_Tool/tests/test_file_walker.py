@@ -0,0 +1,113 @@
+"""目录遍历的单元测试：并行遍历与逐个遍历的结果和顺序相同，按层遍历的队列有上限，提前提交的目录数有上限"""
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+import file_walker
+from file_walker import PREFETCH_PER_WORKER, parallel_scan_files, scan_files
+
+
+class WalkerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.base = tempfile.mkdtemp(prefix="test_walker_")
+        cls.root = os.path.join(cls.base, "root")
+        rnd = random.Random(0)
+
+        def make(folder, depth):
+            os.makedirs(folder)
+            for i in range(rnd.randint(0, 4)):
+                open(os.path.join(folder, f"file_{depth}_{i}.jpg"), "w").close()
+            if depth < 4:
+                for i in range(rnd.randint(0 if depth else 3, 4)):
+                    make(os.path.join(folder, f"dir_{i}"), depth + 1)
+        make(cls.root, 0)
+        # 很宽的一层，用于检查提前提交的目录数
+        for i in range(200):
+            os.makedirs(os.path.join(cls.root, "wide", f"sub_{i:03d}"))
+            open(os.path.join(cls.root, "wide", f"sub_{i:03d}", "x.jpg"), "w").close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.base, ignore_errors=True)
+
+    def depth(self, path):
+        return os.path.relpath(os.path.dirname(path), self.root).count(os.sep) + (os.path.dirname(path) != self.root)
+
+
+class ParallelWalkTest(WalkerTestCase):
+    def test_same_order_as_serial(self):
+        for breadth_first in (False, True):
+            for max_depth in (None, 0, 1, 2):
+                for max_pending in (1, 3, 10000):
+                    serial = [entry[1] for entry in scan_files(self.root, max_depth=max_depth,
+                                                               breadth_first=breadth_first, max_pending=max_pending)]
+                    self.assertEqual(len(serial), len(set(serial)))
+                    for workers in (1, 2, 8):
+                        parallel = [entry[1] for entry in parallel_scan_files(
+                            self.root, workers, max_depth=max_depth, breadth_first=breadth_first,
+                            max_pending=max_pending)]
+                        self.assertEqual(parallel, serial, (breadth_first, max_depth, max_pending, workers))
+
+    def test_breadth_first_yields_shallow_files_first(self):
+        depths = [self.depth(entry[1]) for entry in parallel_scan_files(self.root, 4, breadth_first=True)]
+        self.assertEqual(depths, sorted(depths))
+
+    def test_prefetch_is_bounded(self):
+        """调用方每取出一个目录的结果时，已开始枚举但尚未取出的目录不超过prefetch个"""
+        workers = 2
+        started = []
+        consumed = []
+        peak = []
+        lock = threading.Lock()
+        original = file_walker.scan_directory
+
+        def counting_scan(*args, **kwargs):
+            with lock:
+                started.append(args[0])
+            return original(*args, **kwargs)
+
+        def on_directory(path, files, subdirs):
+            consumed.append(path)
+            with lock:
+                peak.append(len(started) - len(consumed))
+
+        file_walker.scan_directory = counting_scan
+        try:
+            for breadth_first in (False, True):
+                started.clear()
+                consumed.clear()
+                peak.clear()
+                list(parallel_scan_files(self.root, workers, breadth_first=breadth_first, on_directory=on_directory))
+                self.assertGreater(len(consumed), 200)
+                self.assertEqual(len(started), len(consumed))
+                self.assertLessEqual(max(peak), workers * PREFETCH_PER_WORKER, breadth_first)
+        finally:
+            file_walker.scan_directory = original
+
+    def test_cancel(self):
+        cancel_event = threading.Event()
+        entries = parallel_scan_files(self.root, 4, cancel_event=cancel_event, breadth_first=True)
+        next(entries)
+        cancel_event.set()
+        self.assertLess(len(list(entries)), 200)
+
+
+class BreadthFirstOverflowTest(WalkerTestCase):
+    def test_every_file_once(self):
+        expected = sorted(entry[1] for entry in scan_files(self.root))
+        for max_pending in (1, 2):
+            walked = [entry[1] for entry in scan_files(self.root, breadth_first=True, max_pending=max_pending)]
+            self.assertEqual(sorted(walked), expected)
+
+    def test_max_depth(self):
+        for max_depth in (0, 1, 2, 3):
+            expected = sorted(entry[1] for entry in scan_files(self.root, max_depth=max_depth))
+            walked = [entry[1] for entry in scan_files(self.root, max_depth=max_depth, breadth_first=True,
+                                                       max_pending=1)]
+            self.assertEqual(sorted(walked), expected)
+            self.assertTrue(all(self.depth(path) <= max_depth for path in walked))
+            self.assertTrue(any(self.depth(path) == max_depth for path in walked))
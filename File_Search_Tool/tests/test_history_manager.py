@@ -0,0 +1,182 @@
+"""历史记录的单元测试：搜索条件的规范化去重、数量上限和从日志导入"""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from history_manager import HistoryManager, history_key
+from search_log import SearchLog
+
+
+def criteria(folder, **fields):
+    result = {
+        'folder': folder,
+        'date_from': "2025-01-01",
+        'date_to': "2026-01-01",
+        'date_source': 'ctime',
+        'file_type': "所有文件",
+        'size_min': 0,
+        'size_max': float('inf')
+    }
+    result.update(fields)
+    return result
+
+
+def log_record(folder, st="S", ts=None):
+    """搜索日志记录，默认为当前时间的成功搜索"""
+    ts = ts or datetime.now().strftime("%Y%m%d_%H%M%S")
+    return {"ts": ts, "st": st, "folder": folder, "date_from": "2025-01-01",
+            "date_to": "2026-01-01", "date_source": "ctime", "type": "all_files", "size_min": 0,
+            "size_max": None, "count": 1, "time": 0.1}
+
+
+class HistoryKeyTest(unittest.TestCase):
+    def test_equivalent_criteria_have_same_key(self):
+        base = history_key(criteria("F:/照片"))
+        self.assertEqual(history_key(criteria("F:/照片/")), base)
+        self.assertEqual(history_key(criteria("F:/照片", size_max="")), base)
+        self.assertEqual(history_key(criteria("F:/照片", size_max=" 不限制 ")), base)
+        self.assertEqual(history_key(criteria("F:/照片", size_min="0")), base)
+        # 旧记录没有日期依据和文件名查询
+        old = criteria("F:/照片")
+        del old['date_source']
+        self.assertEqual(history_key(old), base)
+        self.assertEqual(history_key(criteria("F:/照片", name_query="", name_mode="glob")), base)
+
+    def test_different_criteria_have_different_keys(self):
+        base = history_key(criteria("F:/照片"))
+        for changed in (criteria("F:/其他"), criteria("F:/照片", size_min=1), criteria("F:/照片", date_source='exif'),
+                        criteria("F:/照片", file_type="RAW格式"), criteria("F:/照片", name_query="IMG"),
+                        criteria("F:/照片", roots=["F:/照片", "G:/备份"])):
+            self.assertNotEqual(history_key(changed), base)
+        self.assertNotEqual(history_key(criteria("F:/照片", name_query="IMG")),
+                            history_key(criteria("F:/照片", name_query="IMG", name_mode="glob")))
+
+    def test_roots_are_normalized(self):
+        self.assertEqual(history_key(criteria("a;b", roots=["F:/a/", "G:/b"])),
+                         history_key(criteria("F:/a;G:/b", roots=["F:/a", "G:/b/"])))
+
+
+class HistoryManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_history_")
+        self.history_file = os.path.join(self.folder, "history.json")
+        self.log_folder = os.path.join(self.folder, "logs")
+        os.mkdir(self.log_folder)
+        self.search_log = SearchLog(self.log_folder)
+        self.managers = []
+
+    def tearDown(self):
+        # 取消延迟保存的定时器，避免在删除临时目录后写入
+        for manager in self.managers:
+            manager.flush()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def open_manager(self, max_history=20):
+        manager = HistoryManager(self.history_file, self.log_folder, max_history)
+        manager.load_history_from_logs()
+        self.managers.append(manager)
+        return manager
+
+    def folders(self, manager):
+        return [entry['folder'] for entry in manager.get_history()]
+
+    def search(self, manager, folder):
+        """与界面相同：成功的搜索加入历史记录并写入日志"""
+        manager.add_search_history(criteria(folder))
+        self.search_log.append(log_record(folder))
+        manager.log_written()
+
+    def test_duplicate_moves_to_front(self):
+        manager = self.open_manager()
+        for folder in ("/a", "/b", "/a/"):
+            manager.add_search_history(criteria(folder))
+        self.assertEqual(self.folders(manager), ["/a/", "/b"])
+
+    def test_bounded(self):
+        manager = self.open_manager(max_history=3)
+        for i in range(10):
+            manager.add_search_history(criteria(f"/{i}"))
+        self.assertEqual(self.folders(manager), ["/9", "/8", "/7"])
+
+    def test_saved_and_reloaded(self):
+        manager = self.open_manager()
+        for folder in ("/a", "/b"):
+            manager.add_search_history(criteria(folder))
+        manager.flush()
+        self.assertEqual(self.folders(self.open_manager()), ["/b", "/a"])
+
+    def test_import_only_new_successful_records(self):
+        for record in (log_record("/old"), log_record("/failed", st="F")):
+            self.search_log.append(record)
+        manager = self.open_manager()
+        self.assertEqual(self.folders(manager), ["/old"])
+        manager.flush()
+        self.search_log.append(log_record("/new"))
+        manager = self.open_manager()
+        self.assertEqual(self.folders(manager), ["/new", "/old"])
+
+    def test_imported_history_does_not_replace_newer_entry(self):
+        manager = self.open_manager()
+        manager.add_search_history(criteria("/a"))
+        manager.flush()
+        self.search_log.append(log_record("/a"))
+        self.search_log.append(log_record("/b"))
+        self.assertEqual(self.folders(self.open_manager()), ["/b", "/a"])
+
+    def test_older_imports_do_not_evict_session_searches(self):
+        """启动后、日志导入完成前的搜索比导入的记录新，导入的记录从最旧的一端截断"""
+        for i in range(5):
+            self.search_log.append(log_record(f"/old{i}", ts=f"2025010{i + 1}_120000"))
+        manager = HistoryManager(self.history_file, self.log_folder, max_history=4)
+        self.managers.append(manager)
+        self.search(manager, "/s1")
+        self.search(manager, "/s2")
+        manager.load_history_from_logs()
+        self.assertEqual(self.folders(manager), ["/s2", "/s1", "/old4", "/old3"])
+
+    def test_imports_are_merged_by_timestamp(self):
+        manager = self.open_manager()
+        for folder, timestamp in (("/a", "2025-01-01 00:00:00"), ("/c", "2025-03-01 00:00:00"), ("/e", "")):
+            entry = criteria(folder)
+            if timestamp:
+                entry['timestamp'] = timestamp
+            manager.entries[history_key(entry)] = entry
+        manager.flush()
+        for folder, ts in (("/b", "20250201_000000"), ("/d", "20250401_000000"), ("/b", "20250501_000000"),
+                           ("/c", "20250601_000000"), ("/f", "20250101_000000")):
+            self.search_log.append(log_record(folder, ts=ts))
+        manager.load_history_from_logs()
+        # /e没有时间戳，沿用前一条记录（/c）的时间；重复的/b取最新的一次；已有的/c不变
+        self.assertEqual(self.folders(manager), ["/b", "/d", "/e", "/c", "/f", "/a"])
+        self.assertEqual(manager.get_history()[0]['timestamp'], "2025-05-01 00:00:00")
+
+    def test_deleted_entry_stays_deleted_after_restart(self):
+        self.search_log.append(log_record("/old"))
+        manager = self.open_manager()
+        self.search(manager, "/a")
+        self.search(manager, "/b")
+        manager.delete_history(0)
+        manager.flush()
+        self.assertEqual(self.folders(self.open_manager()), ["/a", "/old"])
+
+    def test_cleared_history_stays_empty_after_restart(self):
+        self.search_log.append(log_record("/old"))
+        manager = self.open_manager()
+        self.search(manager, "/a")
+        manager.clear_history()
+        manager.flush()
+        self.assertEqual(self.folders(self.open_manager()), [])
+
+    def test_search_before_import_finishes(self):
+        manager = HistoryManager(self.history_file, self.log_folder)
+        self.managers.append(manager)
+        self.search(manager, "/a")
+        manager.load_history_from_logs()
+        manager.delete_history(0)
+        manager.flush()
+        # 其他程序之后写入的日志仍会导入
+        self.search_log.append(log_record("/external"))
+        self.assertEqual(self.folders(self.open_manager()), ["/external"])
+
@@ -0,0 +1,169 @@
+"""元数据索引的单元测试：增量刷新只重新枚举修改时间变化的目录，删除的子树和文件名索引保持同步"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from file_walker import scan_files
+from metadata_index import MetadataIndex
+
+
+class IndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix="test_index_")
+        self.root = os.path.join(self.base, "root")
+        for folder in ("a/deep/deeper", "b", "c"):
+            os.makedirs(self.path(folder))
+        for folder in ("", "a", "a/deep", "a/deep/deeper", "b", "c"):
+            for i in range(3):
+                self.write(folder, f"file_{i}.jpg", i)
+        self.index = MetadataIndex(os.path.join(self.base, "index.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def write(self, folder, name, size):
+        with open(self.path(folder, name), "wb") as f:
+            f.write(b"x" * size)
+
+    def changed(self, folder):
+        """把目录的修改时间设为明显不同的值，不依赖文件系统的时间精度"""
+        mtime = os.stat(self.path(folder)).st_mtime
+        os.utime(self.path(folder), (mtime + 10, mtime + 10))
+
+    def indexed(self):
+        return sorted(self.index.query(self.root))
+
+    def walked(self):
+        return sorted(scan_files(self.root))
+
+    def count(self, sql):
+        conn = sqlite3.connect(self.index.db_path)
+        try:
+            return conn.execute(sql).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class MetadataIndexTest(IndexTestCase):
+    def test_first_refresh_matches_walk(self):
+        self.assertFalse(self.index.is_indexed(self.root))
+        self.assertEqual(self.index.refresh(self.root), 6)
+        self.assertTrue(self.index.is_indexed(self.root))
+        self.assertEqual(self.indexed(), self.walked())
+
+    def test_unchanged_tree_is_not_rescanned(self):
+        self.index.refresh(self.root)
+        changed = self.index.changed_time(self.root)
+        self.assertEqual(self.index.refresh(self.root), 0)
+        self.assertEqual(self.index.changed_time(self.root), changed)
+
+    def test_rescans_only_directory_whose_mtime_changed(self):
+        self.index.refresh(self.root)
+        changed = self.index.changed_time(self.root)
+        self.write("a/deep", "new.jpg", 10)
+        os.remove(self.path("a/deep", "file_0.jpg"))
+        self.write("a/deep", "file_1.jpg", 500)
+        self.changed("a/deep")
+        self.assertEqual(self.index.refresh(self.root), 1)
+        self.assertEqual(self.indexed(), self.walked())
+        self.assertGreater(self.index.changed_time(self.root), changed)
+
+    def test_new_subdirectory(self):
+        self.index.refresh(self.root)
+        os.makedirs(self.path("c", "new", "sub"))
+        self.write("c/new/sub", "x.jpg", 1)
+        self.changed("c")
+        self.assertEqual(self.index.refresh(self.root), 3)
+        self.assertEqual(self.indexed(), self.walked())
+
+    def test_deleted_subtree(self):
+        self.index.refresh(self.root)
+        dirs = self.count("SELECT COUNT(*) FROM dirs")
+        shutil.rmtree(self.path("a"))
+        self.changed("")
+        self.index.refresh(self.root)
+        self.assertEqual(self.indexed(), self.walked())
+        # 子树中所有目录和文件的记录都已删除
+        self.assertEqual(self.count("SELECT COUNT(*) FROM dirs"), dirs - 3)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM files"), 9)
+
+    def test_deleted_subtree_without_parent_change(self):
+        """父目录的修改时间不变时，第一步stat发现目录已不存在"""
+        self.index.refresh(self.root)
+        mtime = os.stat(self.root).st_mtime
+        shutil.rmtree(self.path("a", "deep"))
+        os.utime(self.path("a"), (1, 1))
+        shutil.rmtree(self.path("a"))
+        os.utime(self.root, (mtime, mtime))
+        self.index.refresh(self.root)
+        self.assertEqual(self.indexed(), self.walked())
+        self.assertEqual(self.count("SELECT COUNT(*) FROM dirs"), 3)
+
+    def test_query_filters(self):
+        self.index.refresh(self.root)
+        self.assertEqual(len(list(self.index.query(self.root, size_min=1))), 12)
+        self.assertEqual(len(list(self.index.query(self.root, size_min=1, size_max=1))), 6)
+        self.assertEqual(len(list(self.index.query(self.root, extensions={".png"}))), 0)
+        self.assertEqual(list(self.index.query(os.path.join(self.base, "other"))), [])
+
+
+class NameIndexSyncTest(IndexTestCase):
+    """文件名的三字符片段索引由触发器与files表同步"""
+
+    def setUp(self):
+        super().setUp()
+        if not self.index.name_index_available():
+            self.skipTest("SQLite不支持FTS5的trigram分词器")
+
+    def by_fragment(self, fragment):
+        return sorted(entry[1] for entry in self.index.query(self.root, name_fragments=(fragment,)))
+
+    def by_scan(self, fragment):
+        return sorted(entry[1] for entry in self.index.query(self.root, lambda name: fragment in name.lower()))
+
+    def check_in_sync(self):
+        self.assertEqual(self.count("SELECT COUNT(*) FROM file_names"), self.count("SELECT COUNT(*) FROM files"))
+        # 'integrity-check'比较外部内容表与索引，不一致时抛出异常
+        conn = sqlite3.connect(self.index.db_path)
+        try:
+            conn.execute("INSERT INTO file_names (file_names) VALUES ('integrity-check')")
+        finally:
+            conn.close()
+        for fragment in ("file", "e_1", "new", "renamed"):
+            self.assertEqual(self.by_fragment(fragment), self.by_scan(fragment), fragment)
+
+    def test_insert_and_delete(self):
+        self.index.refresh(self.root)
+        self.check_in_sync()
+        self.write("b", "new_file.jpg", 1)
+        os.remove(self.path("b", "file_1.jpg"))
+        self.changed("b")
+        shutil.rmtree(self.path("a"))
+        self.changed("")
+        self.index.refresh(self.root)
+        self.check_in_sync()
+        self.assertEqual(self.by_fragment("new_"), [self.path("b", "new_file.jpg")])
+        self.assertEqual(len(self.by_fragment("file_1")), 2)
+
+    def test_update(self):
+        self.index.refresh(self.root)
+        # 大小和时间变化只更新files表
+        self.write("c", "file_2.jpg", 1000)
+        self.changed("c")
+        self.index.refresh(self.root)
+        self.check_in_sync()
+        # 修改文件名时触发器先删除旧文件名再加入新文件名
+        conn = sqlite3.connect(self.index.db_path)
+        try:
+            conn.execute("UPDATE files SET name = 'renamed.jpg' WHERE name = 'file_0.jpg'")
+            conn.commit()
+        finally:
+            conn.close()
+        self.check_in_sync()
+        self.assertEqual(len(self.by_fragment("renamed")), 6)
+        self.assertEqual(self.by_fragment("file_0"), [])
@@ -0,0 +1,98 @@
+"""列式元数据快照的单元测试：向量化筛选的结果与SQL查询索引相同，过期后重新生成并释放旧快照"""
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from metadata_index import MetadataIndex
+from metadata_snapshot import SnapshotStore, snapshot_available
+from name_query import NameQuery
+from search_engine import SearchCriteria, load_snapshot, query_index, search
+
+FILE_TYPES = ["*.*", "*.jpg", "*.JPG;*.png", "*.cr2;*.cr3;*.jpg", "IMG_*", "IMG_*.jpg;*.png", "*.none"]
+
+
+@unittest.skipUnless(snapshot_available(), "需要安装NumPy")
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix="test_snapshot_")
+        self.root = os.path.join(self.base, "photos")
+        rnd = random.Random(0)
+        for d in range(8):
+            folder = os.path.join(self.root, f"roll_{d}", "sub" if d % 2 else "")
+            os.makedirs(folder, exist_ok=True)
+            for i in range(40):
+                name = f"{rnd.choice(['IMG_', 'DSC', '照片_'])}{d}{i:03d}{rnd.choice(['.jpg', '.JPG', '.png', '.cr3', ''])}"
+                with open(os.path.join(folder, name), "wb") as f:
+                    f.write(b"x" * rnd.choice([0, 1, 100, 1000, 5000, 20000]))
+        self.index = MetadataIndex(os.path.join(self.base, "index.db"))
+        self.index.refresh(self.root)
+        self.store = SnapshotStore(os.path.join(self.base, "snapshots"))
+
+    def tearDown(self):
+        for snapshot in self.store.opened.values():
+            snapshot.close()
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def criteria_list(self):
+        ctimes = sorted(entry[3] for entry in self.index.query(self.root))
+        times = [None, ctimes[0], ctimes[len(ctimes) // 3], ctimes[len(ctimes) // 2], ctimes[-1]]
+        rnd = random.Random(1)
+        result = []
+        for file_type in FILE_TYPES:
+            for _ in range(12):
+                size_min, size_max = sorted(rnd.sample([0, 1, 100, 1000, 4999, 5000, 20000], 2))
+                ctime_from, ctime_to = rnd.choice(times), rnd.choice(times)
+                if ctime_from is not None and ctime_to is not None and ctime_from > ctime_to:
+                    ctime_from, ctime_to = ctime_to, ctime_from
+                result.append(SearchCriteria(file_type, size_min, rnd.choice([size_max, None]), ctime_from, ctime_to,
+                                             name_query=rnd.choice([None, NameQuery("img"), NameQuery("照片_3")])))
+        return result
+
+    def test_query_matches_sql(self):
+        snapshot = load_snapshot(self.root, self.index, self.store)
+        self.assertEqual(len(snapshot), len(list(self.index.query(self.root))))
+        matched = 0
+        for criteria in self.criteria_list():
+            expected = sorted(query_index(self.root, self.index, criteria))
+            self.assertEqual(sorted(snapshot.query(criteria)), expected, criteria.walk_key())
+            matched += bool(expected)
+            # 掩码只包含大小、时间和扩展名条件，满足全部条件的文件都在其中
+            mask = snapshot.mask(criteria)
+            self.assertGreaterEqual(int(mask.sum()), len(expected))
+        self.assertGreater(matched, 40)
+
+    def test_search_with_snapshot_matches_walk(self):
+        for criteria in self.criteria_list()[::7]:
+            walked = sorted(search(self.root, criteria))
+            self.assertEqual(sorted(search(self.root, criteria, index=self.index, snapshots=self.store)), walked)
+
+    def test_rebuilt_after_index_change_and_old_snapshot_closed(self):
+        old = load_snapshot(self.root, self.index, self.store)
+        self.assertIs(load_snapshot(self.root, self.index, self.store), old)
+        old_files = set(os.listdir(old.folder))
+
+        os.remove(os.path.join(self.root, "roll_0", os.listdir(os.path.join(self.root, "roll_0"))[0]))
+        os.utime(os.path.join(self.root, "roll_0"), (1, 1))
+        self.index.refresh(self.root)
+        new = load_snapshot(self.root, self.index, self.store)
+        self.assertIsNot(new, old)
+        self.assertEqual(len(new), len(old) - 1)
+        # 旧快照已关闭，它的列文件已删除
+        self.assertEqual(old.columns, {})
+        self.assertFalse(old_files & set(os.listdir(new.folder)) - {"meta.json"})
+
+    def test_background_rebuild(self):
+        store = SnapshotStore(os.path.join(self.base, "background"), background=True)
+        self.assertIsNone(load_snapshot(self.root, self.index, store))
+        # 等待后台生成完成，之后的搜索使用快照
+        for thread in threading.enumerate():
+            if thread.name == "snapshot-build":
+                thread.join(10)
+        snapshot = load_snapshot(self.root, self.index, store)
+        self.assertIsNotNone(snapshot)
+        criteria = SearchCriteria("*.jpg", 100)
+        self.assertEqual(sorted(snapshot.query(criteria)), sorted(query_index(self.root, self.index, criteria)))
+        snapshot.close()
@@ -0,0 +1,143 @@
+"""文件名查询的单元测试：字面片段的提取必须可靠，否则三字符片段索引会漏掉结果"""
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+
+from metadata_index import MetadataIndex
+from name_query import NameQuery, NAME_MODE_GLOB, NAME_MODE_REGEX, NAME_MODE_SUBSTRING, glob_literals, regex_literals
+from search_engine import SearchCriteria, search
+
+# 随机文件名和模式使用的字符和较长的字面片段，字符很少时随机模式才会经常匹配并得到片段
+NAME_CHARS = "abcAB1_."
+CHUNKS = ["abc", "ABc", "b1_a", "a.1"]
+GLOB_TOKENS = list(NAME_CHARS) + CHUNKS + ["*", "*", "?", "[ab]", "[!a]", "[", "]"]
+REGEX_TOKENS = (list("abcAB1_") + CHUNKS + ["\\.", ".", "*", "+", "?", "{1,2}", "{2}", "[ab]", "[^a]", "\\d", "\\w",
+                                            "\\b", "^", "$", "(", ")", "(?:", "|", "(?i)", "(?x)", " ", "#", "\\1",
+                                            "(abc)?", "(?:b1_a)*", "(ABc|a.1)", "abc|"])
+
+
+def random_names(rnd, count):
+    tokens = list(NAME_CHARS) + CHUNKS
+    return [''.join(rnd.choice(tokens) for _ in range(rnd.randint(0, 8))) for _ in range(count)]
+
+
+def random_pattern(rnd, tokens):
+    return ''.join(rnd.choice(tokens) for _ in range(rnd.randint(1, 8)))
+
+
+class LiteralsTest(unittest.TestCase):
+    def test_glob_literals(self):
+        self.assertEqual(glob_literals("IMG_*.jpg"), ["IMG_", ".jpg"])
+        self.assertEqual(glob_literals("a?b[xy]cd"), ["a", "b", "cd"])
+        self.assertEqual(glob_literals("a[b"), ["a[b"])
+        self.assertEqual(glob_literals("x[]]y"), ["x", "y"])
+
+    def test_regex_literals(self):
+        self.assertEqual([literal for literal in regex_literals(r"IMG_\d+\.jpg$") if literal], ["IMG_", ".jpg"])
+        self.assertIn("abc", regex_literals("abcd?"))
+        self.assertNotIn("abcd", regex_literals("abcd?"))
+        self.assertEqual(regex_literals("abc|def"), [])
+        self.assertEqual(regex_literals("(?x) a b c"), [])
+        # 分组中的内容可能整体不出现
+        self.assertEqual(''.join(regex_literals("xy(abc)?z")), "xyz")
+
+    def test_fragments(self):
+        self.assertEqual(NameQuery("IMG_2024").fragments, ("img_2024",))
+        self.assertEqual(NameQuery("ab").fragments, ())
+        self.assertEqual(NameQuery("*IMG*2024*.JPG", NAME_MODE_GLOB).fragments, (".jpg", "2024", "img"))
+        self.assertEqual(NameQuery(r"^DSC\d{4}", NAME_MODE_REGEX).fragments, ("dsc",))
+
+    def test_matching(self):
+        self.assertTrue(NameQuery("img")("Holiday_IMG_1.jpg"))
+        self.assertFalse(NameQuery("img_2")("IMG_1.jpg"))
+        self.assertTrue(NameQuery("img_*.JPG", NAME_MODE_GLOB)("IMG_1.jpg"))
+        self.assertFalse(NameQuery("img_*", NAME_MODE_GLOB)("x_IMG_1.jpg"))
+        self.assertTrue(NameQuery(r"\d{4}\.cr[23]$", NAME_MODE_REGEX)("DSC_1234.CR3"))
+        with self.assertRaises(ValueError):
+            NameQuery("(", NAME_MODE_REGEX)
+        with self.assertRaises(ValueError):
+            NameQuery("x", "unknown")
+
+    def check_fragments_sound(self, mode, tokens, seed):
+        """随机模式和文件名：模式匹配文件名时，每个片段都一定出现在文件名中（忽略大小写）"""
+        rnd = random.Random(seed)
+        names = random_names(rnd, 400)
+        with_fragments = 0
+        for _ in range(3000):
+            pattern = random_pattern(rnd, tokens)
+            try:
+                query = NameQuery(pattern, mode)
+            except ValueError:
+                continue
+            for name in names:
+                if not query(name):
+                    continue
+                with_fragments += bool(query.fragments)
+                for fragment in query.fragments:
+                    self.assertIn(fragment, name.lower(), f"{mode} {pattern!r} 匹配 {name!r}，但不包含片段 {fragment!r}")
+        self.assertGreater(with_fragments, 100)
+
+    def test_substring_fragments_sound(self):
+        self.check_fragments_sound(NAME_MODE_SUBSTRING, list(NAME_CHARS), 0)
+
+    def test_glob_fragments_sound(self):
+        self.check_fragments_sound(NAME_MODE_GLOB, GLOB_TOKENS, 1)
+
+    def test_regex_fragments_sound(self):
+        self.check_fragments_sound(NAME_MODE_REGEX, REGEX_TOKENS, 2)
+
+
+class NameIndexTest(unittest.TestCase):
+    """通过索引（包括三字符片段索引）查询与遍历的结果相同"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.base = tempfile.mkdtemp(prefix="test_name_")
+        cls.root = os.path.join(cls.base, "photos")
+        rnd = random.Random(3)
+        for d in range(10):
+            folder = os.path.join(cls.root, f"roll_{d}")
+            os.makedirs(folder)
+            for i in range(60):
+                prefix = rnd.choice(["IMG_", "img_", "DSC", "dsc_", "Holiday IMG ", "P"])
+                ext = rnd.choice([".jpg", ".JPG", ".cr3", ".png", ".txt"])
+                open(os.path.join(folder, f"{prefix}{rnd.randint(2020, 2025)}{rnd.randint(0, 999):03d}{ext}"),
+                     "w").close()
+        cls.index = MetadataIndex(os.path.join(cls.base, "index.db"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.base, ignore_errors=True)
+
+    def test_index_matches_walk(self):
+        queries = [("img", NAME_MODE_SUBSTRING), ("IMG_2024", NAME_MODE_SUBSTRING), ("g_20", NAME_MODE_SUBSTRING),
+                   ("im", NAME_MODE_SUBSTRING), ("img_*.jpg", NAME_MODE_GLOB), ("*2023*", NAME_MODE_GLOB),
+                   ("dsc?20*", NAME_MODE_GLOB), (r"^img_\d{4}5", NAME_MODE_REGEX), (r"holiday img 202[34]", NAME_MODE_REGEX),
+                   (r"(dsc|img)_2021", NAME_MODE_REGEX), (r"\.cr3$", NAME_MODE_REGEX)]
+        matched = 0
+        for text, mode in queries:
+            for file_type in ("*.*", "*.jpg", "*.jpg;*.cr3"):
+                criteria = SearchCriteria(file_type, name_query=NameQuery(text, mode))
+                walked = sorted(os.path.abspath(record.path) for record in search(self.root, criteria))
+                indexed = sorted(os.path.abspath(record.path) for record in search(self.root, criteria, index=self.index))
+                self.assertEqual(indexed, walked, f"{mode} {text!r} {file_type}")
+                matched += bool(walked)
+        # 大部分查询都有结果，比较才有意义
+        self.assertGreater(matched, len(queries) * 2)
+
+    def test_fragments_query_equals_full_scan(self):
+        if not self.index.name_index_available():
+            self.skipTest("SQLite不支持FTS5的trigram分词器")
+        self.index.refresh(self.root)
+        for text in ("IMG_20", "img 202", "2024", "DSC"):
+            for query in (NameQuery(text), NameQuery(f"*{text}*", NAME_MODE_GLOB),
+                          NameQuery(re.escape(text), NAME_MODE_REGEX)):
+                self.assertTrue(query.fragments)
+                scanned = sorted(entry[1] for entry in self.index.query(self.root, query))
+                indexed = sorted(entry[1] for entry in self.index.query(self.root, query, name_fragments=query.fragments))
+                self.assertTrue(scanned, f"{query.mode} {query.text!r} 没有匹配的文件")
+                self.assertEqual(indexed, scanned, f"{query.mode} {query.text!r}")
+
@@ -0,0 +1,157 @@
+"""搜索结果缓存的单元测试：按目录修改时间判断是否重新枚举、LRU内存上限和取消时不保存"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import query_cache
+from file_walker import scan_directory, scan_files
+from query_cache import QueryCache
+from search_engine import SearchCriteria, search
+
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix="test_cache_")
+        for folder in ("a/deep", "b", "c"):
+            os.makedirs(self.path(folder))
+        for folder in ("", "a", "a/deep", "b", "c"):
+            for i in range(3):
+                self.touch(folder, f"file_{i}.jpg")
+        # 测试中的目录都是刚创建的，不等待修改时间的安全间隔
+        self.racy_margin = query_cache.RACY_MARGIN
+        query_cache.RACY_MARGIN = 0
+        self.walked = []
+        self.scanned = []
+
+    def tearDown(self):
+        query_cache.RACY_MARGIN = self.racy_margin
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.base, *parts)
+
+    def touch(self, folder, name):
+        open(self.path(folder, name), "w").close()
+
+    def changed(self, folder):
+        """把目录的修改时间设为明显不同的值，不依赖文件系统的时间精度"""
+        stat = os.stat(self.path(folder))
+        os.utime(self.path(folder), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def walk(self, folder, on_directory=None):
+        self.walked.append(folder)
+        return scan_files(folder, on_directory=on_directory)
+
+    def scan(self, path):
+        self.scanned.append(path)
+        return scan_directory(path)
+
+    def search(self, cache, key="key", cancel_event=None):
+        self.walked, self.scanned = [], []
+        return sorted(os.path.relpath(entry[1], self.base) for entry in
+                      cache.search(key, self.base, self.walk, self.scan, cancel_event=cancel_event))
+
+    def expected(self):
+        return sorted(os.path.relpath(entry[1], self.base) for entry in scan_files(self.base))
+
+    def test_hit_when_nothing_changed(self):
+        cache = QueryCache()
+        first = self.search(cache)
+        self.assertEqual(first, self.expected())
+        self.assertEqual(self.walked, [self.base])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        self.assertEqual(self.search(cache), first)
+        self.assertEqual((self.walked, self.scanned), ([], []))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_rescans_only_changed_directory(self):
+        cache = QueryCache()
+        self.search(cache)
+        self.touch("a", "new.jpg")
+        os.remove(self.path("b", "file_0.jpg"))
+        self.changed("a")
+        self.changed("b")
+        self.assertEqual(self.search(cache), self.expected())
+        self.assertEqual(sorted(self.scanned), [self.path("a"), self.path("b")])
+        self.assertEqual(self.walked, [])
+
+    def test_new_subdirectory_is_walked(self):
+        cache = QueryCache()
+        self.search(cache)
+        os.makedirs(self.path("c", "new", "deeper"))
+        self.touch("c/new/deeper", "x.jpg")
+        self.changed("c")
+        self.assertEqual(self.search(cache), self.expected())
+        self.assertEqual(self.scanned, [self.path("c")])
+        self.assertEqual(self.walked, [self.path("c", "new")])
+
+    def test_removed_directory(self):
+        cache = QueryCache()
+        self.search(cache)
+        size = cache.total_bytes
+        shutil.rmtree(self.path("a"))
+        self.changed("")
+        result = self.search(cache)
+        self.assertEqual(result, self.expected())
+        self.assertFalse(any(path.startswith("a" + os.sep) for path in result))
+        self.assertEqual(self.scanned, [self.base])
+        # 删除的子树不再占用缓存
+        self.assertLess(cache.total_bytes, size)
+        self.assertFalse(any(path.startswith(self.path("a")) for path in cache.entries["key"].dirs))
+
+    def test_lru_eviction_by_bytes(self):
+        probe = QueryCache()
+        self.search(probe)
+        size = probe.total_bytes
+        cache = QueryCache(max_bytes=size * 2 + size // 2)
+        for key in ("k1", "k2", "k3"):
+            self.search(cache, key)
+        self.assertEqual(list(cache.entries), ["k2", "k3"])
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        # 使用过的条目变为最新
+        self.search(cache, "k2")
+        self.search(cache, "k1")
+        self.assertEqual(list(cache.entries), ["k2", "k1"])
+        # 单条超过上限时不保存
+        small = QueryCache(max_bytes=size - 1)
+        self.search(small)
+        self.assertEqual(len(small.entries), 0)
+        self.assertEqual(small.total_bytes, 0)
+
+    def test_no_store_on_cancel(self):
+        cache = QueryCache()
+        cancel_event = threading.Event()
+        results = cache.search("key", self.base, self.walk, self.scan, cancel_event=cancel_event)
+        next(results)
+        cancel_event.set()
+        list(results)
+        self.assertEqual(len(cache.entries), 0)
+
+        # 命中的条目在取消时也不放回
+        self.search(cache)
+        self.assertEqual(len(cache.entries), 1)
+        self.changed("a")
+        cancel_event.set()
+        self.search(cache, cancel_event=cancel_event)
+        self.assertEqual(len(cache.entries), 0)
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_no_store_when_iteration_stops_early(self):
+        cache = QueryCache()
+        results = cache.search("key", self.base, self.walk, self.scan)
+        next(results)
+        results.close()
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_on_scanned_on_hit(self):
+        cache = QueryCache()
+        criteria = SearchCriteria("*.jpg")
+        counts = []
+        first = sorted(record.path for record in search(self.base, criteria, cache=cache))
+        second = sorted(record.path for record in search(self.base, criteria, cache=cache, on_scanned=counts.append))
+        self.assertEqual(second, first)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(sum(counts), len(first))
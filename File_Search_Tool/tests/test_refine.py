@@ -0,0 +1,103 @@
+"""在结果中筛选的单元测试：条件收窄的判断必须可靠，否则筛选会漏掉结果"""
+import random
+import unittest
+
+from name_query import NameQuery, NAME_MODE_GLOB, NAME_MODE_SUBSTRING
+from search_engine import SearchCriteria, refine
+
+FILE_TYPES = ["*.*", "*.jpg", "*.JPG;*.png", "*.jpg;*.png;*.cr2", "*.cr2", "IMG_*", "IMG_*.jpg"]
+NAMES = ["IMG_0001.jpg", "IMG_0002.JPG", "dsc_0003.png", "DSC_0004.cr2", "img_0005.cr2", "notes.txt",
+         "IMG_0006", "photo.jpeg", "holiday IMG.png"]
+NAME_QUERIES = [None, NameQuery("img"), NameQuery("IMG"), NameQuery("IMG_*", NAME_MODE_GLOB),
+                NameQuery("000", NAME_MODE_SUBSTRING)]
+BOUNDS = [None, 0, 100, 500, 1000]
+
+
+def random_range(rnd):
+    low, high = rnd.choice(BOUNDS), rnd.choice(BOUNDS)
+    if low is not None and high is not None and low > high:
+        low, high = high, low
+    return low, high
+
+
+def random_criteria(rnd):
+    size = random_range(rnd)
+    ctime = random_range(rnd)
+    capture = random_range(rnd) if rnd.random() < 0.2 else (None, None)
+    return SearchCriteria(rnd.choice(FILE_TYPES), size[0], size[1], ctime[0], ctime[1], capture[0], capture[1],
+                          rnd.choice(NAME_QUERIES))
+
+
+def random_entries(rnd, count):
+    """scan_files格式的合成元组，大小和时间取边界附近的值"""
+    values = [0, 1, 99, 100, 101, 499, 500, 501, 999, 1000, 1001, 5000]
+    return [(name, "/x/" + name, rnd.choice(values), rnd.choice(values), rnd.choice(values))
+            for name in (rnd.choice(NAMES) for _ in range(count))]
+
+
+def matches(criteria, entries):
+    predicate = criteria.compile_predicate()
+    return [i for i, entry in enumerate(entries) if predicate(entry[0], entry[2], entry[3])]
+
+
+class NarrowsTest(unittest.TestCase):
+    def test_same_criteria_narrows(self):
+        criteria = SearchCriteria("*.jpg", 100, 1000, 5, 10, name_query=NameQuery("img"))
+        self.assertTrue(criteria.narrows(criteria))
+
+    def test_examples(self):
+        wide = SearchCriteria("*.jpg;*.png", 100, None)
+        self.assertTrue(SearchCriteria("*.JPG", 200, 300).narrows(wide))
+        self.assertFalse(SearchCriteria("*.cr2", 200, 300).narrows(wide))
+        self.assertFalse(SearchCriteria("*.jpg", 50, 300).narrows(wide))
+        self.assertFalse(SearchCriteria("*.jpg").narrows(wide))
+        self.assertTrue(SearchCriteria("*.jpg", 100).narrows(SearchCriteria()))
+        # 上一次按拍摄时间筛选，新条件不按拍摄时间时不收窄
+        self.assertFalse(SearchCriteria().narrows(SearchCriteria(capture_from=1)))
+        # 文件名查询必须相同
+        self.assertTrue(SearchCriteria(name_query=NameQuery("img")).narrows(SearchCriteria()))
+        self.assertFalse(SearchCriteria().narrows(SearchCriteria(name_query=NameQuery("img"))))
+        self.assertFalse(SearchCriteria(name_query=NameQuery("IMG")).narrows(
+            SearchCriteria(name_query=NameQuery("img"))))
+
+    def test_narrower_results_are_subset(self):
+        """随机条件：narrows为True时，新条件的每个结果都在上一次的结果中"""
+        rnd = random.Random(0)
+        entries = random_entries(rnd, 300)
+        checked = 0
+        for _ in range(20000):
+            narrow, wide = random_criteria(rnd), random_criteria(rnd)
+            if not narrow.narrows(wide):
+                continue
+            checked += 1
+            wide_matches = set(matches(wide, entries))
+            missing = set(matches(narrow, entries)) - wide_matches
+            self.assertFalse(missing, f"{narrow.walk_key()} 收窄了 {wide.walk_key()}，但漏掉了 "
+                                      f"{[entries[i] for i in missing]}")
+        self.assertGreater(checked, 100)
+
+
+class RefineTest(unittest.TestCase):
+    def test_refine_equals_fresh_search(self):
+        """在上一次结果中筛选得到的行与直接按新条件筛选全部文件相同（不涉及拍摄时间）"""
+        rnd = random.Random(1)
+        entries = random_entries(rnd, 300)
+        checked = 0
+        for _ in range(20000):
+            narrow, wide = random_criteria(rnd), random_criteria(rnd)
+            if narrow.uses_capture_time or wide.uses_capture_time or not narrow.narrows(wide):
+                continue
+            checked += 1
+            previous = matches(wide, entries)
+            refined = list(refine(previous, entries.__getitem__, narrow, wide))
+            self.assertEqual(refined, matches(narrow, entries))
+        self.assertGreater(checked, 100)
+
+    def test_cancel(self):
+        class Cancelled:
+            def is_set(self):
+                return True
+        entries = random_entries(random.Random(2), 10)
+        self.assertEqual(list(refine(range(10), entries.__getitem__, SearchCriteria(),
+                                     cancel_event=Cancelled())), [])
+
@@ -0,0 +1,95 @@
+"""导出结果的单元测试：CSV和JSON Lines的内容，取消或出错时不留下不完整的导出"""
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import result_export
+from result_export import EXPORT_FIELDS, export_format, export_records, format_time
+
+RECORDS = [("IMG_0001.jpg", "F:/照片/IMG_0001.jpg", 1024, 1700000000.5, 1700000100.0),
+           ("报告, 最终版.txt", "F:/文档/报告, 最终版.txt", 0, 1600000000.0, 1600000000.0),
+           ('引号"名.cr3', 'F:/照片/引号"名.cr3', 25 * 1024 * 1024, 1650000000.0, 1650000001.0)]
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_export_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def write_existing(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("上一次的导出")
+
+    def assert_existing_kept(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "上一次的导出")
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_format(self):
+        self.assertEqual(export_format("a.CSV"), "csv")
+        self.assertEqual(export_format("a.jsonl"), "jsonl")
+        self.assertEqual(export_format("a.txt", "csv"), "csv")
+        for path, fmt in (("a.txt", None), ("a.csv", "xml")):
+            with self.assertRaises(ValueError):
+                export_format(path, fmt)
+
+    def test_csv(self):
+        path = self.path("结果.csv")
+        self.assertEqual(export_records(iter(RECORDS), path), len(RECORDS))
+        with open(path, "rb") as f:
+            self.assertTrue(f.read().startswith(b"\xef\xbb\xbf" + ",".join(EXPORT_FIELDS).encode() + b"\r\n"))
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(rows[1:], [[name, file_path, str(size), format_time(ctime), format_time(mtime)]
+                                    for name, file_path, size, ctime, mtime in RECORDS])
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_jsonl_round_trip(self):
+        path = self.path("结果.jsonl")
+        self.assertEqual(export_records(iter(RECORDS), path), len(RECORDS))
+        with open(path, "rb") as f:
+            self.assertFalse(f.read().startswith(b"\xef\xbb\xbf"))
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(lines, [{"name": name, "path": file_path, "size": size, "created": format_time(ctime),
+                                  "modified": format_time(mtime)} for name, file_path, size, ctime, mtime in RECORDS])
+
+    def test_cancel_keeps_existing_target(self):
+        path = self.path("结果.csv")
+        self.write_existing(path)
+        cancel_event = threading.Event()
+        progress = []
+
+        def records():
+            for i in range(result_export.PROGRESS_INTERVAL * 3):
+                yield (f"{i}.jpg", f"/x/{i}.jpg", i, 0.0, 0.0)
+
+        def on_written(count):
+            progress.append(count)
+            cancel_event.set()
+
+        export_records(records(), path, cancel_event=cancel_event, on_written=on_written)
+        self.assertEqual(progress, [result_export.PROGRESS_INTERVAL])
+        self.assert_existing_kept(path)
+
+    def test_error_keeps_existing_target(self):
+        path = self.path("结果.jsonl")
+        self.write_existing(path)
+
+        def records():
+            yield RECORDS[0]
+            raise OSError("无法读取文件夹")
+
+        with self.assertRaises(OSError):
+            export_records(records(), path)
+        self.assert_existing_kept(path)
@@ -0,0 +1,96 @@
+"""搜索结果存储的单元测试：按列保存、目录前缀共用、按列排序、排序缓存的失效和删除的结果（不需要显示界面）"""
+import os
+import random
+import unittest
+
+from result_view import ResultStore
+from search_engine import SearchCriteria, refine
+
+
+def random_rows(rnd, count):
+    folders = [os.path.join("/data", f"folder_{i}") + os.sep for i in range(5)]
+    return [(name, rnd.choice(folders) + name, rnd.randint(0, 10000), rnd.uniform(0, 1e9), rnd.uniform(0, 1e9))
+            for name in (f"{rnd.choice(['IMG', 'img', 'DSC'])}_{rnd.randint(0, 999)}.jpg" for _ in range(count))]
+
+
+class ResultStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.rnd = random.Random(0)
+        self.rows = random_rows(self.rnd, 300)
+        self.store = ResultStore()
+        self.store.extend(self.rows)
+
+    def expected_order(self, column, rows=None):
+        """直接比较完整结果得到的升序行号，排序稳定"""
+        rows = range(len(self.rows)) if rows is None else rows
+        key = {"name": lambda row: row[0].lower(), "path": lambda row: row[1].lower(), "size": lambda row: row[2],
+               "created": lambda row: row[3], "modified": lambda row: row[4]}[column]
+        return sorted(rows, key=lambda index: key(self.rows[index]))
+
+    def test_rows_round_trip(self):
+        self.assertEqual(len(self.store), 300)
+        self.assertEqual([self.store.row(i) for i in range(len(self.store))], self.rows)
+
+    def test_directory_prefixes_are_shared(self):
+        self.assertEqual(len(self.store.dirs), 5)
+        for index, row in enumerate(self.rows):
+            prefix = self.store.dirs[self.store.dir_ids[index]]
+            self.assertEqual(prefix, os.path.dirname(row[1]) + os.sep)
+            self.assertEqual(prefix + self.store.names[index], row[1])
+        self.assertEqual(self.store.path_overrides, {})
+
+    def test_paths_that_cannot_be_split(self):
+        store = ResultStore()
+        store.append("a.jpg", "/x/a.jpg", 1, 2, 3)
+        store.append("", "/x/", 1, 2, 3)
+        store.append("b.jpg", "/x/B.JPG", 1, 2, 3)
+        store.append("c.jpg", "c.jpg", 1, 2, 3)
+        self.assertEqual([store.path(i) for i in range(4)], ["/x/a.jpg", "/x/", "/x/B.JPG", "c.jpg"])
+
+    def test_sort_each_column(self):
+        for column in ("name", "path", "size", "created", "modified"):
+            self.assertEqual(list(self.store.sorted_order(column)), self.expected_order(column), column)
+            self.assertEqual(list(self.store.sorted_order(column, reverse=True)),
+                             self.expected_order(column)[::-1], column)
+        with self.assertRaises(ValueError):
+            self.store.sorted_order("unknown")
+
+    def test_sort_cache_invalidated_by_new_rows(self):
+        self.store.sorted_order("size")
+        self.assertIn("size", self.store.sort_cache)
+        more = random_rows(self.rnd, 50)
+        self.store.extend(more)
+        self.rows.extend(more)
+        self.assertEqual(list(self.store.sorted_order("size")), self.expected_order("size"))
+
+    def test_sort_cache_invalidated_by_update(self):
+        self.store.sorted_order("name")
+        self.store.sorted_order("modified")
+        self.store.update(5, 999999, 0, 1e10)
+        self.rows[5] = self.rows[5][:2] + (999999, 0, 1e10)
+        # 文件名没有变化，缓存保留
+        self.assertIn("name", self.store.sort_cache)
+        self.assertEqual(list(self.store.sorted_order("modified")), self.expected_order("modified"))
+        self.assertEqual(self.store.sorted_order("size")[-1], 5)
+
+    def test_removed_rows_excluded(self):
+        self.store.sorted_order("size")
+        removed = set(self.rnd.sample(range(300), 40))
+        for index in removed:
+            self.store.remove(index)
+        live = [i for i in range(300) if i not in removed]
+        self.assertEqual(self.store.live_count(), 260)
+        self.assertEqual(list(self.store.live_rows()), live)
+        for column in ("name", "size"):
+            self.assertEqual(list(self.store.sorted_order(column)), self.expected_order(column, live))
+        # 在结果中筛选只使用未删除的行
+        criteria = SearchCriteria(size_min=5000)
+        refined = list(refine(self.store.live_rows(), self.store.row, criteria))
+        self.assertEqual(refined, [i for i in live if self.rows[i][2] >= 5000])
+
+    def test_clear(self):
+        self.store.sorted_order("size")
+        self.store.remove(0)
+        self.store.clear()
+        self.assertEqual((len(self.store), self.store.removed, self.store.sort_cache, self.store.dirs),
+                         (0, set(), {}, []))
@@ -0,0 +1,136 @@
+"""搜索日志的单元测试：旧日志解析、增量读取、从末尾向前读取和轮转"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_log import (SearchLog, migrate_legacy_logs, parse_legacy_log, read_log_records, read_log_records_from,
+                        read_log_records_reversed)
+
+
+class ParseLegacyLogTest(unittest.TestCase):
+    def test_csv_success(self):
+        record = parse_legacy_log("20260113_013138,S,F:/照片,2025-01-02,2026-01-13,all_files,0,,45,0.01\n")
+        self.assertEqual(record, {
+            "ts": "20260113_013138", "st": "S", "folder": "F:/照片", "date_from": "2025-01-02",
+            "date_to": "2026-01-13", "type": "all_files", "size_min": 0, "size_max": None,
+            "count": 45, "time": 0.01
+        })
+
+    def test_csv_folder_with_commas(self):
+        record = parse_legacy_log("20260113_013138,S,F:/a,b,c,2025-01-02,2026-01-13,raw,10,2048,3,1.5")
+        self.assertEqual(record["folder"], "F:/a,b,c")
+        self.assertEqual(record["type"], "raw")
+        self.assertEqual((record["size_min"], record["size_max"]), (10.0, 2048.0))
+        self.assertEqual((record["count"], record["time"]), (3, 1.5))
+
+    def test_csv_failure_keeps_error(self):
+        record = parse_legacy_log("20260113_013200,F,,2025-01-02,2026-01-13,all_files,0,不限制,请选择有效的文件夹")
+        self.assertEqual(record["st"], "F")
+        self.assertEqual(record["folder"], "")
+        self.assertIsNone(record["size_max"])
+        self.assertEqual(record["error"], "请选择有效的文件夹")
+
+    def test_csv_too_short(self):
+        self.assertIsNone(parse_legacy_log("20260113_013138,S,F:/照片"))
+
+    def test_multiline_chinese(self):
+        content = ("搜索日志 - 2026-01-13 01:31:38\n"
+                   "搜索文件夹: F:/照片\n"
+                   "日期范围: 2025-01-02 至 2026-01-13\n"
+                   "文件类型: 所有图片\n"
+                   "大小范围: 100 KB 至 不限制\n")
+        record = parse_legacy_log(content)
+        self.assertEqual(record["ts"], "20260113_013138")
+        self.assertEqual(record["folder"], "F:/照片")
+        self.assertEqual((record["date_from"], record["date_to"]), ("2025-01-02", "2026-01-13"))
+        self.assertEqual(record["type"], "所有图片")
+        self.assertEqual((record["size_min"], record["size_max"]), (100.0, None))
+
+    def test_multiline_english(self):
+        content = ("Search Log - 2026-01-13 01:31:38\n"
+                   "Search Folder: D:/data\n"
+                   "Date Range: 2025-01-02 to 2026-01-13\n"
+                   "Size Range: 0 KB to 500 KB\n")
+        record = parse_legacy_log(content)
+        self.assertEqual(record["folder"], "D:/data")
+        self.assertEqual(record["date_to"], "2026-01-13")
+        self.assertEqual((record["size_min"], record["size_max"]), (0, 500.0))
+
+    def test_multiline_without_folder(self):
+        self.assertIsNone(parse_legacy_log("搜索日志 - 2026-01-13 01:31:38\n文件类型: 所有图片"))
+
+    def test_empty(self):
+        self.assertIsNone(parse_legacy_log("  \n"))
+
+
+class SearchLogTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="test_log_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_read_from_offset_skips_partial_line(self):
+        log = SearchLog(self.folder)
+        log.append({"ts": "1"})
+        records, offset = read_log_records_from(log.log_path)
+        self.assertEqual(records, [{"ts": "1"}])
+
+        log.append({"ts": "2"})
+        with open(log.log_path, "ab") as f:
+            f.write(b'{"ts":"3"')
+        records, offset = read_log_records_from(log.log_path, offset)
+        self.assertEqual(records, [{"ts": "2"}])
+
+        # 写完的半行在下次读取时完整读出
+        with open(log.log_path, "ab") as f:
+            f.write(b'}\n')
+        records, _ = read_log_records_from(log.log_path, offset)
+        self.assertEqual(records, [{"ts": "3"}])
+
+    def test_read_reversed(self):
+        log = SearchLog(self.folder)
+        for i in range(30):
+            log.append({"ts": str(i), "folder": "照片" * i})
+        with open(log.log_path, "ab") as f:
+            f.write(b'\n{"ts":"partial"')
+        expected = list(reversed(list(read_log_records(log.log_path))))
+        self.assertEqual([record["ts"] for record in expected], [str(i) for i in reversed(range(30))])
+        # 块的大小不影响结果，块边界可以落在一行（或一个多字节字符）中间
+        for block_size in (1, 7, 64, 1 << 20):
+            self.assertEqual(list(read_log_records_reversed(log.log_path, block_size)), expected)
+
+    def test_rotation_keeps_all_records_in_order(self):
+        log = SearchLog(self.folder, max_bytes=200, backup_count=100)
+        for i in range(50):
+            log.append({"ts": str(i), "folder": "x" * 20})
+        self.assertGreater(len(log.log_files()), 1)
+        self.assertEqual([record["ts"] for record in log.iter_records()], [str(i) for i in range(50)])
+        self.assertEqual([record["ts"] for record in log.iter_records(newest_first=True)],
+                         [str(i) for i in reversed(range(50))])
+
+    def test_rotation_drops_oldest_beyond_backup_count(self):
+        log = SearchLog(self.folder, max_bytes=100, backup_count=2)
+        for i in range(30):
+            log.append({"ts": str(i)})
+        self.assertLessEqual(len(log.log_files()), 3)
+        timestamps = [record["ts"] for record in log.iter_records()]
+        self.assertEqual(timestamps[-1], "29")
+        self.assertEqual(timestamps, sorted(timestamps, key=int))
+
+    def test_migrate_legacy_logs(self):
+        for name, content in (("search_log_20260113_013138_001.txt",
+                               "20260113_013138,S,F:/a,2025-01-02,2026-01-13,raw,0,,1,0.5"),
+                              ("search_log_20260113_013139_002.txt", "无法解析的内容")):
+            with open(os.path.join(self.folder, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        log = SearchLog(self.folder)
+        migrate_legacy_logs(self.folder, log)
+        self.assertEqual([record["folder"] for record in log.iter_records()], ["F:/a"])
+        # 旧文件已移走，再次迁移不会重复导入
+        migrate_legacy_logs(self.folder, log)
+        self.assertEqual(len(list(log.iter_records())), 1)
+        with open(log.log_path, encoding="utf-8") as f:
+            self.assertTrue(all(json.loads(line) for line in f))
@@ -0,0 +1,110 @@
+"""同时搜索多个文件夹的单元测试：根目录的去重和嵌套判断、合并的结果"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from search_engine import SearchCriteria, SearchLimits, is_inside, normalize_roots, search, search_roots, split_roots
+
+
+class RootsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix="test_roots_")
+        for folder in ("a/sub/deep", "b", "ab", "c"):
+            os.makedirs(self.path(folder))
+        for i, folder in enumerate(("a", "a/sub", "a/sub/deep", "b", "ab", "c")):
+            for j in range(3):
+                open(self.path(folder, f"file_{i}_{j}.jpg"), "w").close()
+            open(self.path(folder, f"other_{i}.txt"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.base, *parts)
+
+
+class NormalizeRootsTest(RootsTestCase):
+    def test_keeps_distinct_roots_in_order(self):
+        roots = [self.path("c"), self.path("a"), self.path("b")]
+        self.assertEqual(normalize_roots(roots), (roots, []))
+
+    def test_duplicates(self):
+        kept, dropped = normalize_roots([self.path("a"), self.path("a") + os.sep, self.path("b", "..", "a")])
+        self.assertEqual(kept, [self.path("a")])
+        self.assertEqual([root for root, _ in dropped], [self.path("a") + os.sep, self.path("b", "..", "a")])
+
+    def test_nested_in_either_order(self):
+        for roots in ([self.path("a"), self.path("a", "sub", "deep")], [self.path("a", "sub", "deep"), self.path("a")]):
+            kept, dropped = normalize_roots(roots)
+            self.assertEqual(kept, [self.path("a")])
+            self.assertEqual([root for root, _ in dropped], [self.path("a", "sub", "deep")])
+
+    def test_common_prefix_is_not_nesting(self):
+        roots = [self.path("a"), self.path("ab")]
+        self.assertEqual(normalize_roots(roots), (roots, []))
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "不支持符号链接")
+    def test_symlink_to_same_folder(self):
+        link = self.path("link_to_a")
+        try:
+            os.symlink(self.path("a"), link)
+        except OSError:
+            self.skipTest("无法创建符号链接")
+        kept, dropped = normalize_roots([self.path("a"), link, self.path("a", "sub")])
+        self.assertEqual(kept, [self.path("a")])
+        self.assertEqual(sorted(root for root, _ in dropped), sorted([link, self.path("a", "sub")]))
+
+    def test_is_inside(self):
+        self.assertTrue(is_inside(self.path("a", "sub"), self.path("a")))
+        self.assertTrue(is_inside(self.path("a"), self.path("a")))
+        self.assertFalse(is_inside(self.path("ab"), self.path("a")))
+
+    def test_split_roots(self):
+        self.assertEqual(split_roots(" F:/a ; G:/b;; "), ["F:/a", "G:/b"])
+        self.assertEqual(split_roots(""), [])
+        # 整个输入是存在的文件夹时不拆分
+        folder = self.path("x;y")
+        os.mkdir(folder)
+        self.assertEqual(split_roots(folder), [folder])
+
+
+class SearchRootsTest(RootsTestCase):
+    def roots(self):
+        return [self.path("a"), self.path("b"), self.path("c")]
+
+    def test_same_results_as_separate_searches(self):
+        criteria = SearchCriteria("*.jpg")
+        expected = sorted(record.path for root in self.roots() for record in search(root, criteria))
+        self.assertEqual(len(expected), 15)
+        for workers in (1, 3):
+            merged = [record.path for record in search_roots(self.roots(), criteria, workers)]
+            self.assertEqual(sorted(merged), expected)
+
+    def test_max_results_applies_to_merged_stream(self):
+        limits = SearchLimits(max_results=4)
+        records = list(search_roots(self.roots(), SearchCriteria(), limits=limits))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(limits.stop_reason, "max_results")
+
+    def test_max_depth_applies_to_each_root(self):
+        records = list(search_roots(self.roots(), SearchCriteria("*.jpg"), limits=SearchLimits(max_depth=0)))
+        self.assertEqual(sorted(os.path.dirname(record.path) for record in records),
+                         sorted(root for root in self.roots() for _ in range(3)))
+
+    def test_closing_early_stops_threads(self):
+        before = threading.active_count()
+        records = search_roots(self.roots(), SearchCriteria())
+        next(records)
+        records.close()
+        for thread in threading.enumerate():
+            if thread.name == "search-device":
+                thread.join(5)
+        self.assertLessEqual(threading.active_count(), before)
+
+    def test_cancel(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        self.assertEqual(list(search_roots(self.roots(), SearchCriteria(), cancel_event=cancel_event)), [])
+
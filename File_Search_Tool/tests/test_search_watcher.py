@@ -0,0 +1,120 @@
+"""监视搜索结果的单元测试：轮询方式下文件的新增、修改和删除按搜索条件生成结果的变化"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from file_walker import scan_directory
+from search_engine import SearchCriteria
+from search_watcher import SearchWatcher
+
+# 等待监视线程报告变化的最长时间（秒）
+TIMEOUT = 5.0
+
+
+class PollingWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test_watch_")
+        self.folder = os.path.join(self.root, "roll")
+        os.mkdir(self.folder)
+        self.write("roll", "IMG_1.jpg", 10)
+        self.write("roll", "IMG_small.jpg", 1)
+        self.write("roll", "notes.txt", 10)
+        # 只包含大小至少5字节的jpg文件
+        self.criteria = SearchCriteria("*.jpg", 5)
+        entries, _, _ = scan_directory(self.folder, self.criteria.compile_name_filter(),
+                                       stat_filter=self.criteria.compile_stat_filter())
+        self.assertEqual([entry[0] for entry in entries], ["IMG_1.jpg"])
+
+        self.changes = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.watcher = SearchWatcher(self.root, self.criteria, entries, use_inotify=False, poll_interval=0.05)
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+        # 等待监视开始：登记目录后才能发现之后的变化
+        deadline = time.monotonic() + TIMEOUT
+        while self.watcher.mode is None or len(self.watcher.dirs) < 2:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.mtime = os.stat(self.folder).st_mtime
+
+    def tearDown(self):
+        self.cancel_event.set()
+        self.thread.join(TIMEOUT)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def watch(self):
+        for change in self.watcher.watch(self.cancel_event):
+            self.changes.put(change)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def write(self, folder, name, size):
+        """写入临时文件后改名替换，轮询方式通过目录修改时间发现变化"""
+        temp_path = self.path(folder, name + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(b"x" * size)
+        os.replace(temp_path, self.path(folder, name))
+
+    def touch_folder(self):
+        """文件系统的时间精度有限，手动改变目录修改时间，保证下一次轮询能发现变化"""
+        self.mtime += 10
+        os.utime(self.folder, (self.mtime, self.mtime))
+
+    def collect(self, count):
+        """等待count个变化，再等待几个轮询间隔确认没有多余的变化；返回 {(类型, 路径): 大小}"""
+        collected = {}
+
+        def add(change):
+            kind, value = change
+            if kind == "remove":
+                collected[(kind, value)] = None
+            else:
+                collected[(kind, value[1])] = value[2]
+
+        deadline = time.monotonic() + TIMEOUT
+        while len(collected) < count and time.monotonic() < deadline:
+            try:
+                add(self.changes.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        time.sleep(0.3)
+        while not self.changes.empty():
+            add(self.changes.get())
+        return collected
+
+    def test_create_modify_delete(self):
+        self.write("roll", "IMG_2.jpg", 20)
+        self.write("roll", "IMG_tiny.jpg", 2)
+        self.write("roll", "other.txt", 20)
+        self.touch_folder()
+        self.assertEqual(self.collect(1), {("add", self.path("roll", "IMG_2.jpg")): 20})
+
+        # 修改后不再满足条件的文件从结果中删除，满足条件的文件更新，新满足条件的文件加入
+        self.write("roll", "IMG_1.jpg", 30)
+        self.write("roll", "IMG_2.jpg", 3)
+        self.write("roll", "IMG_small.jpg", 8)
+        self.touch_folder()
+        self.assertEqual(self.collect(3), {("update", self.path("roll", "IMG_1.jpg")): 30,
+                                           ("remove", self.path("roll", "IMG_2.jpg")): None,
+                                           ("add", self.path("roll", "IMG_small.jpg")): 8})
+
+        os.remove(self.path("roll", "IMG_1.jpg"))
+        os.remove(self.path("roll", "notes.txt"))
+        self.touch_folder()
+        self.assertEqual(self.collect(1), {("remove", self.path("roll", "IMG_1.jpg")): None})
+
+    def test_new_and_removed_subfolder(self):
+        os.mkdir(self.path("roll", "new"))
+        self.write(os.path.join("roll", "new"), "IMG_3.jpg", 10)
+        self.write(os.path.join("roll", "new"), "IMG_4.txt", 10)
+        self.touch_folder()
+        self.assertEqual(self.collect(1), {("add", self.path("roll", "new", "IMG_3.jpg")): 10})
+
+        shutil.rmtree(self.path("roll", "new"))
+        self.touch_folder()
+        self.assertEqual(self.collect(1), {("remove", self.path("roll", "new", "IMG_3.jpg")): None})